@@ -0,0 +1,72 @@
+"""
+بنچمارک هزینه مرحله حذف تکرار سیگنال‌های مستر.
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_dedup --signals 200000 --dup-ratio 0.05
+
+هزینه هر بررسی (ساخت کلید از پیام خام + جستجو/ثبت در LRU) بر حسب میکروثانیه
+گزارش می‌شود و با هزینه json.loads همان پیام مقایسه می‌شود.
+"""
+import argparse
+import json
+import random
+import time
+
+from core import server
+from core.dedup import SignalDeduplicator, peek_signal_key, signal_key
+
+
+def _frames(count: int, sources: int, dup_ratio: float) -> list[bytes]:
+    frames = []
+    for i in range(count):
+        n = i
+        if frames and random.random() < dup_ratio:
+            n = random.randrange(max(0, i - 500), i)  # ارسال مجدد یک سیگنال اخیر
+        frames.append((
+            '{"event":"TRADE_OPEN","source_id_str":"S%d","timestamp_ms":%d,"deal_ticket":%d,'
+            '"order_ticket":%d,"position_id":%d,"symbol":"EURUSD","magic":0,"volume":0.10,'
+            '"price":1.08512,"profit":0.00,"position_sl":0.0,"position_tp":0.0,"position_type":0}'
+            % (n % sources + 1, 1700000000000 + n, 5000000 + n, 6000000 + n, 7000000 + n)
+        ).encode())
+    return frames
+
+
+def _per_op_us(fn, frames: list[bytes]) -> float:
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    return (time.perf_counter() - start) / len(frames) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", type=int, default=200000)
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--dup-ratio", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    frames = _frames(args.signals, args.sources, args.dup_ratio)
+
+    raw_index = SignalDeduplicator(capacity=args.capacity)
+    parsed_index = SignalDeduplicator(capacity=args.capacity)
+    parsed = [json.loads(f) for f in frames]
+    parsed_iter = iter(parsed)
+
+    headers = {f: server._peek_master_header(f) for f in frames}
+    raw_us = _per_op_us(lambda f: raw_index.is_duplicate(peek_signal_key(f, *headers[f])), frames)
+    parsed_us = _per_op_us(lambda f: parsed_index.is_duplicate(signal_key(next(parsed_iter))), frames)
+    loads_us = _per_op_us(json.loads, frames)
+
+    dropped = sum(raw_index.duplicates.values())
+    print(f"{'check':>22} {'us/signal':>10}")
+    print(f"{'fast-path (raw peek)':>22} {raw_us:>10.2f}")
+    print(f"{'parsed dict':>22} {parsed_us:>10.2f}")
+    print(f"{'json.loads (ref)':>22} {loads_us:>10.2f}")
+    print(f"duplicates dropped: {dropped} / {args.signals}, index entries: {raw_index.get_stats()['entries']}"
+          f" (cap {args.capacity})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+بنچمارک ذخیره تاریخچه: مسیر تک‌ردیفی (save_trade_history) در برابر
+بافر write-behind با group commit (TradeHistoryWriter).
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_history_writer --reports 5000
+
+از یک دیتابیس SQLite موقت استفاده می‌شود و trade_copier.db دست نمی‌خورد.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from core import database
+from core.history_writer import TradeHistoryWriter
+
+
+def _use_temp_database(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    database.engine = engine
+    database.session_factory.remove()
+    database.session_factory.configure(bind=engine)
+    database.Base.metadata.create_all(bind=engine)
+
+
+def _seed(copies: int, sources: int):
+    with database.get_db_session() as db:
+        for i in range(1, sources + 1):
+            db.add(database.SourceAccount(name=f"src{i}", source_id_str=f"S{i}"))
+        for i in range(1, copies + 1):
+            db.add(database.CopyAccount(name=f"copy{i}", copy_id_str=f"C{i}", is_active=True))
+
+
+def _reports(count: int, copies: int, sources: int) -> list[dict]:
+    return [
+        {
+            "copy_id_str": f"C{i % copies + 1}",
+            "source_id_str": f"S{i % sources + 1}",
+            "symbol": "EURUSD",
+            "profit": 1.5,
+            "source_ticket": 100000 + i,
+        }
+        for i in range(count)
+    ]
+
+
+async def _per_row(reports: list[dict]) -> float:
+    start = time.perf_counter()
+    for r in reports:
+        await asyncio.to_thread(database.save_trade_history, **r)
+    return time.perf_counter() - start
+
+
+async def _group_commit(reports: list[dict], batch_size: int, flush_ms: int) -> float:
+    writer = TradeHistoryWriter(batch_size=batch_size, flush_interval_ms=flush_ms)
+    task = asyncio.create_task(writer.run())
+    start = time.perf_counter()
+    for r in reports:
+        await writer.submit(**r)
+    await writer._queue.join()
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--copies", type=int, default=300)
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_database(os.path.join(tmp, "bench.db"))
+        _seed(args.copies, args.sources)
+        reports = _reports(args.reports, args.copies, args.sources)
+
+        per_row = await _per_row(reports)
+        grouped = await _group_commit(reports, args.batch_size, args.flush_ms)
+        database.engine.dispose()
+
+    print(f"{'path':>14} {'seconds':>9} {'rows/sec':>10}")
+    print(f"{'per-row':>14} {per_row:>9.3f} {len(reports) / per_row:>10.0f}")
+    print(f"{'group-commit':>14} {grouped:>9.3f} {len(reports) / grouped:>10.0f}")
+    print(f"speedup: {per_row / grouped:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+بنچمارک توان نوشتن ژورنال سیگنال‌ها.
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_journal --records 200000 --fsync-ms 20
+
+هزینه هر append روی حلقه (کپی در حافظه نگاشت شده) و توان کل با fsync دسته‌ای
+در ترد پس‌زمینه گزارش می‌شود تا با نرخ اوج سیگنال‌ها مقایسه شود.
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+from core.journal import SignalJournal, KIND_ACCEPTED, KIND_PUBLISHED, read_journal
+
+_PAYLOAD = (
+    b'{"event":"TRADE_OPEN","source_id_str":"S1","timestamp_ms":1700000000000,"deal_ticket":5000000,'
+    b'"order_ticket":6000000,"position_id":7000000,"symbol":"EURUSD","magic":0,"volume":0.10,'
+    b'"price":1.08512,"profit":0.00,"position_sl":0.0,"position_tp":0.0,"position_type":0}'
+)
+
+
+async def _run(journal: SignalJournal, records: int, batch: int) -> float:
+    sync_task = asyncio.create_task(journal.run())
+    start = time.perf_counter()
+    for i in range(0, records, 2):
+        ref = journal.append(KIND_ACCEPTED, b"S1", _PAYLOAD)
+        journal.append(KIND_PUBLISHED, b"S1", _PAYLOAD, ref)
+        if i % batch == 0:
+            await asyncio.sleep(0)  # مثل حلقه واقعی، ترد fsync فرصت اجرا پیدا کند
+    elapsed = time.perf_counter() - start
+    sync_task.cancel()
+    await asyncio.gather(sync_task, return_exceptions=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--fsync-ms", type=int, default=20)
+    parser.add_argument("--segment-mb", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=100, help="تعداد append بین دو بار واگذاری حلقه")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        journal = SignalJournal(directory=directory, segment_bytes=args.segment_mb * 1024 * 1024,
+                                fsync_ms=args.fsync_ms, max_bytes=1 << 40)
+        journal.open()
+        elapsed = asyncio.run(_run(journal, args.records, args.batch))
+        stats = journal.get_stats()
+        scan_start = time.perf_counter()
+        scanned = sum(1 for _ in read_journal(directory))
+        scan_elapsed = time.perf_counter() - scan_start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"appended: {stats['appended']}  syncs: {stats['syncs']}  (fsync every {args.fsync_ms}ms)")
+    print(f"append: {elapsed / stats['appended'] * 1_000_000:.2f} us/record, "
+          f"{stats['appended'] / elapsed:,.0f} records/s")
+    print(f"replay scan: {scanned} records in {scan_elapsed:.2f}s ({scanned / scan_elapsed:,.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
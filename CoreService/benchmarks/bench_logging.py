@@ -0,0 +1,85 @@
+"""
+بنچمارک سربار لاگ هر سیگنال روی ترد فراخوان (حلقه asyncio): هندلرهای همزمان در برابر QueueHandler.
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_logging --signals 20000
+
+برای هر سیگنال همان خطوط INFO مسیر سیگنال نوشته می‌شود ("Processing Master signal" با log_extra
+و "Publishing on topic" با کل دیکشنری سیگنال). سناریوها:
+  sync:   هندلرهای فایل و کنسول مستقیم روی root و پیام f-string (رفتار قبلی)
+  queued: LazyQueueHandler با فرمت تنبل (%) و نوشتن در ترد شنونده
+خروجی کنسول به /dev/null هدایت می‌شود. «caller» زمان دیواری و «caller cpu» زمان CPU ترد فراخوان است
+(روی ماشین تک‌هسته‌ای ترد شنونده در زمان دیواری فراخوان هم سهم دارد)، «drained» زمان تا نوشته شدن همه
+رکوردها و «dropped» رکوردهای دور ریخته به دلیل پر شدن صف (LOG_QUEUE_SIZE).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from core import logging_config
+
+logger = logging.getLogger("core.server")
+
+
+def _signal(n: int) -> dict:
+    return {
+        "event": "TRADE_OPEN", "source_id_str": "S12", "timestamp_ms": 1700000000000 + n,
+        "deal_ticket": 500000000 + n, "order_ticket": 400000000 + n, "position_id": 300000000 + n,
+        "symbol": "EURUSD", "magic": 0, "volume": 0.1, "price": 1.08123, "profit": 0.0,
+        "position_sl": 0.0, "position_tp": 0.0, "position_type": 0,
+    }
+
+
+def _run(signals: int, queued: bool) -> tuple[float, float, float, int]:
+    directory = tempfile.mkdtemp(prefix="bench_logging_")
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        logging_config.setup_logging(log_file=os.path.join(directory, "bench.log"), queued=queued, console=True)
+        data = [_signal(n) for n in range(signals)]
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        for signal_data in data:
+            log_extra = {
+                "event_type": signal_data["event"],
+                "source_id": signal_data["source_id_str"],
+                "copy_id": None,
+                "position_id": signal_data["position_id"],
+                "symbol": signal_data["symbol"],
+            }
+            logger.info(f"Processing Master signal: {signal_data['event']}", extra=log_extra)
+            if queued:
+                logger.info("Publishing on topic '%s': %s", signal_data["source_id_str"], signal_data)
+            else:
+                logger.info(f"Publishing on topic '{signal_data['source_id_str']}': {signal_data}")
+        caller = time.perf_counter() - started
+        caller_cpu = time.thread_time() - cpu_started
+        dropped = sum(getattr(h, "dropped", 0) for h in logging.getLogger().handlers)
+        logging_config.stop_logging()
+        for handler in logging.getLogger().handlers:
+            handler.close()
+        logging.getLogger().handlers.clear()
+        drained = time.perf_counter() - started
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return caller, caller_cpu, drained, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.signals} signals, 2 records each (us per signal)")
+    print(f"{'mode':>7} {'caller':>8} {'caller cpu':>11} {'drained':>8} {'dropped':>8}")
+    for name, queued in (("sync", False), ("queued", True)):
+        caller, caller_cpu, drained, dropped = _run(args.signals, queued)
+        print(f"{name:>7} {caller / args.signals * 1e6:>8.1f} {caller_cpu / args.signals * 1e6:>11.1f} "
+              f"{drained / args.signals * 1e6:>8.1f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+بنچمارک backendهای حلقه رویداد روی مسیر کامل collector → processor → publisher.
+
+اجرا (از پوشه CoreService، بدون اجرای همزمان سرور اصلی چون پورت‌های 5555/5556 استفاده می‌شوند):
+    python -m benchmarks.bench_loop_backends --signals 20000 --rate 2000
+
+هر backend در یک پروسه جداگانه اجرا می‌شود و اکسپرت‌های سورس/کپی شبیه‌سازی شده (PUSH و SUB)
+در پروسه دیگری هستند. دو مرحله اندازه‌گیری می‌شود: توان (ارسال بدون محدودیت، msgs/sec)
+و تاخیر (ارسال با نرخ ثابت، p50/p99 از ارسال تا دریافت روی SUB).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import zmq
+
+from core import loop_backend
+
+# مسیر کند پیام را با json.dumps دوباره می‌سازد (با فاصله بعد از دونقطه)
+_SENT_RE = re.compile(rb'"sent_ns": ?(\d+)')
+
+
+def _signal(i: int, sources: int) -> bytes:
+    return (
+        '{"event":"TRADE_OPEN","source_id_str":"S%d","timestamp_ms":%d,"deal_ticket":%d,'
+        '"order_ticket":%d,"position_id":%d,"symbol":"EURUSD","magic":0,"volume":0.10,'
+        '"price":1.08512,"profit":0.00,"position_sl":0.0,"position_tp":0.0,"position_type":0,"sent_ns":%d}'
+        % (i % sources + 1, 1700000000000 + i, 5000000 + i, 6000000 + i, 7000000 + i, time.monotonic_ns())
+    ).encode()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def _peers(args, results):
+    """اکسپرت‌های شبیه‌سازی شده: یک PUSH (سورس) و یک SUB (کپی) در دو ترد."""
+    ctx = zmq.Context()
+    sub = ctx.socket(zmq.SUB)
+    sub.setsockopt(zmq.RCVHWM, 0)
+    sub.connect("tcp://127.0.0.1:5556")
+    sub.setsockopt(zmq.SUBSCRIBE, b"S")
+    push = ctx.socket(zmq.PUSH)
+    push.connect("tcp://127.0.0.1:5555")
+
+    latencies = []
+    received = threading.Semaphore(0)
+
+    def receive():
+        while True:
+            frames = sub.recv_multipart()
+            match = _SENT_RE.search(frames[1])
+            if match is not None:
+                latencies.append((time.monotonic_ns() - int(match.group(1))) / 1e6)
+            received.release()
+
+    receiver = threading.Thread(target=receive, daemon=True)
+    receiver.start()
+
+    # انتظار برای برقراری اشتراک (slow joiner)
+    while True:
+        push.send(_signal(0, args.sources))
+        if received.acquire(timeout=0.2):
+            break
+    time.sleep(0.2)
+    while received.acquire(blocking=False):
+        pass
+
+    def phase(count: int, rate: float) -> tuple[float, int, list[float]]:
+        latencies.clear()
+        start = time.perf_counter()
+        for i in range(count):
+            if rate:
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            push.send(_signal(i + 1, args.sources))
+        got = 0
+        for _ in range(count):
+            if not received.acquire(timeout=10):
+                break
+            got += 1
+        return got / (time.perf_counter() - start), got, list(latencies)
+
+    throughput, _, _ = phase(args.signals, 0)
+    _, got, paced = phase(args.paced_signals, args.rate)
+    results.put({
+        "msgs_per_sec": throughput,
+        "p50_ms": _percentile(paced, 50),
+        "p99_ms": _percentile(paced, 99),
+        "lost": args.paced_signals - got,
+    })
+    push.close(0)
+    sub.close(0)
+    ctx.term()
+
+
+async def _serve(args) -> dict:
+    from core import server
+    server.FAST_PATH_ENABLED = args.fast_path
+    zmq_server = server.ZMQServer(alert_queue=asyncio.Queue(), num_shards=args.shards)
+    zmq_server.journal = None
+    zmq_server.deduplicator = None
+    tasks = [asyncio.create_task(c) for c in (
+        zmq_server.start_signal_collector(),
+        *(zmq_server.start_signal_processor(i) for i in range(zmq_server.num_shards)),
+        *(zmq_server.start_side_effects_worker(i) for i in range(zmq_server.num_shards)),
+        zmq_server.start_signal_publisher(),
+    )]
+    # خالی کردن صف هشدار تا حافظه در طول بنچمارک رشد نکند
+    async def drain_alerts():
+        while True:
+            await server.telegram_alert_queue.get()
+    tasks.append(asyncio.create_task(drain_alerts()))
+
+    mp = multiprocessing.get_context("spawn")
+    results = mp.Queue()
+    peers = mp.Process(target=_peers, args=(args, results))
+    peers.start()
+    result = await asyncio.to_thread(results.get)
+    await asyncio.to_thread(peers.join)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    zmq_server.context.destroy(0)
+    result["loop"] = type(asyncio.get_running_loop()).__name__
+    return result
+
+
+def _worker(args):
+    logging.disable(logging.CRITICAL)
+    installed = loop_backend.install(args.worker)
+    result = asyncio.run(_serve(args))
+    result["backend"] = installed
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", type=int, default=20000, help="تعداد پیام مرحله توان")
+    parser.add_argument("--paced-signals", type=int, default=5000, help="تعداد پیام مرحله تاخیر")
+    parser.add_argument("--rate", type=float, default=2000, help="نرخ ارسال مرحله تاخیر (پیام بر ثانیه)")
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--fast-path", action="store_true", help="انتشار از مسیر سریع collector")
+    parser.add_argument("--backends", nargs="+", default=None)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    backends = args.backends or loop_backend.available_backends()
+    print(f"{'backend':>9} {'loop':>22} {'msgs/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'lost':>5}")
+    for backend in backends:
+        cmd = [sys.executable, "-m", "benchmarks.bench_loop_backends", "--worker", backend,
+               "--signals", str(args.signals), "--paced-signals", str(args.paced_signals),
+               "--rate", str(args.rate), "--sources", str(args.sources), "--shards", str(args.shards)]
+        if args.fast_path:
+            cmd.append("--fast-path")
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend:>9} failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:>9} {r['loop']:>22} {r['msgs_per_sec']:>10.0f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['lost']:>5}")
+
+
+if __name__ == "__main__":
+    main()
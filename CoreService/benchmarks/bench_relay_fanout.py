@@ -0,0 +1,235 @@
+"""
+بنچمارک fan-out مستقیم از PUB هسته در برابر انتشار از طریق نودهای رله (core/relay.py).
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_relay_fanout --subscribers 5000 --relays 0 2 4
+
+PUB هسته در یک پروسه جداگانه شبیه‌سازی می‌شود و رله‌ها با همان نقطه ورود relay.py اجرا می‌شوند.
+مشترکین (SUB) بین چند پروسه کارگر پخش شده و در سناریوی رله به صورت چرخشی به رله‌ها وصل می‌شوند.
+برای هر سناریو تحویل بر ثانیه، p50/p99 تاخیر از انتشار تا دریافت و مصرف CPU پروسه هسته و رله‌ها
+گزارش می‌شود.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import struct
+import subprocess
+import sys
+import time
+
+import zmq
+
+_CORE_PORT = 5656
+_RELAY_BASE_PORT = 5700
+_WARMUP = b"W"
+_MEASURE = b"M"
+
+
+def _raise_fd_limit():
+    """هر اتصال TCP و هر سوکت ZMQ یک فایل‌دیسکریپتور مصرف می‌کند."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _cpu_seconds(pid: int) -> float:
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def _publisher(args, commands, results):
+    """PUB هسته: پیام‌های گرم‌کردن تا آماده شدن مشترکین، سپس ارسال با نرخ ثابت."""
+    _raise_fd_limit()
+    ctx = zmq.Context()
+    pub = ctx.socket(zmq.PUB)
+    pub.setsockopt(zmq.SNDHWM, 0)
+    # هزاران مشترک همزمان وصل می‌شوند؛ صف پیش‌فرض 100 اتصال SYN ها را دور می‌ریزد
+    pub.setsockopt(zmq.BACKLOG, 8192)
+    pub.bind(f"tcp://127.0.0.1:{_CORE_PORT}")
+    topics = [b"S%04d" % t for t in range(args.topics)]
+
+    while not commands.poll(0.5):
+        for topic in topics:
+            pub.send_multipart([topic, _WARMUP + struct.pack("=q", time.monotonic_ns())])
+    commands.recv()
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for i in range(args.messages):
+        delay = start + i / args.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pub.send_multipart([topics[i % args.topics], _MEASURE + struct.pack("=q", time.monotonic_ns())])
+    elapsed = time.perf_counter() - start
+    results.put({"core_cpu_sec": time.process_time() - cpu_start, "publish_sec": elapsed})
+    commands.recv()
+    pub.close(0)
+    ctx.term()
+
+
+def _subscribers(worker: int, endpoints: list[str], indices: list[int], args, ready, results):
+    """پروسه کارگر با چند صد سوکت SUB که با Poller خوانده می‌شوند."""
+    _raise_fd_limit()
+    ctx = zmq.Context()
+    ctx.set(zmq.MAX_SOCKETS, len(indices) + 64)
+    poller = zmq.Poller()
+    sockets = {}
+    for i in indices:
+        sub = ctx.socket(zmq.SUB)
+        sub.setsockopt(zmq.RCVHWM, 0)
+        sub.connect(endpoints[i % len(endpoints)])
+        sub.setsockopt(zmq.SUBSCRIBE, b"S%04d" % (i % args.topics))
+        poller.register(sub, zmq.POLLIN)
+        sockets[sub] = i
+
+    warm = set()
+    expected = {i: len(range(i % args.topics, args.messages, args.topics)) for i in indices}
+    remaining = sum(expected.values())
+    latencies = []
+    deliveries = 0
+    first = last = None
+    announced = False
+    idle_deadline = None
+    while remaining > 0:
+        events = poller.poll(200)
+        now = time.monotonic_ns()
+        if not events:
+            if idle_deadline is not None and time.monotonic() > idle_deadline:
+                break
+            continue
+        for sub, _ in events:
+            while True:
+                try:
+                    _, body = sub.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                if body[:1] == _WARMUP:
+                    warm.add(sockets[sub])
+                    continue
+                latencies.append((now - struct.unpack("=q", body[1:9])[0]) / 1e6)
+                deliveries += 1
+                remaining -= 1
+                first = first or now
+                last = now
+        if not announced and len(warm) == len(indices):
+            ready.put(worker)
+            announced = True
+            idle_deadline = time.monotonic() + args.warmup_timeout
+        if deliveries:
+            idle_deadline = time.monotonic() + args.timeout
+
+    results.put({"deliveries": deliveries, "latencies": latencies, "first": first, "last": last})
+    for sub in sockets:
+        sub.close(0)
+    ctx.term()
+
+
+def _start_relays(count: int) -> tuple[list[subprocess.Popen], list[str]]:
+    relays, endpoints = [], []
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for r in range(count):
+        base = _RELAY_BASE_PORT + r * 3
+        env = dict(os.environ,
+                   RELAY_UPSTREAM="127.0.0.1",
+                   RELAY_UPSTREAM_PUBLISH_PORT=str(_CORE_PORT),
+                   RELAY_UPSTREAM_SIGNAL_PORT=str(_CORE_PORT + 1),
+                   RELAY_UPSTREAM_CONFIG_PORT=str(_CORE_PORT + 2),
+                   RELAY_BIND="127.0.0.1",
+                   RELAY_PUBLISH_PORT=str(base),
+                   RELAY_SIGNAL_PORT=str(base + 1),
+                   RELAY_CONFIG_PORT=str(base + 2),
+                   RELAY_SNDHWM="0")
+        relays.append(subprocess.Popen(
+            [sys.executable, "relay.py"], cwd=here, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=_raise_fd_limit))
+        endpoints.append(f"tcp://127.0.0.1:{base}")
+    time.sleep(0.5)
+    return relays, endpoints
+
+
+def _scenario(args, relay_count: int) -> dict:
+    mp = multiprocessing.get_context("spawn")
+    relays, endpoints = _start_relays(relay_count)
+    if not relays:
+        endpoints = [f"tcp://127.0.0.1:{_CORE_PORT}"]
+
+    commands, publisher_commands = mp.Pipe()
+    publisher_results = mp.Queue()
+    publisher = mp.Process(target=_publisher, args=(args, publisher_commands, publisher_results), daemon=True)
+    publisher.start()
+
+    ready, results = mp.Queue(), mp.Queue()
+    workers = []
+    for w in range(args.workers):
+        indices = list(range(w, args.subscribers, args.workers))
+        worker = mp.Process(target=_subscribers, args=(w, endpoints, indices, args, ready, results), daemon=True)
+        worker.start()
+        workers.append(worker)
+    for _ in workers:
+        ready.get(timeout=args.warmup_timeout)
+
+    relay_cpu = [_cpu_seconds(r.pid) for r in relays]
+    commands.send("go")
+    published = publisher_results.get()
+    collected = [results.get() for _ in workers]
+    relay_cpu = sum(_cpu_seconds(r.pid) - before for r, before in zip(relays, relay_cpu))
+    commands.send("stop")
+    publisher.join()
+    for worker in workers:
+        worker.join()
+    for relay in relays:
+        relay.terminate()
+        relay.wait()
+
+    latencies = [v for c in collected for v in c["latencies"]]
+    deliveries = sum(c["deliveries"] for c in collected)
+    firsts = [c["first"] for c in collected if c["first"]]
+    lasts = [c["last"] for c in collected if c["last"]]
+    span = (max(lasts) - min(firsts)) / 1e9 if firsts else 0.0
+    return {
+        "relays": relay_count,
+        "deliveries": deliveries,
+        "expected": sum(len(range(i % args.topics, args.messages, args.topics)) for i in range(args.subscribers)),
+        "per_sec": deliveries / span if span else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "core_cpu": published["core_cpu_sec"] / published["publish_sec"] * 100,
+        "relay_cpu": relay_cpu / published["publish_sec"] * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--relays", type=int, nargs="+", default=[0, 2, 4], help="تعداد رله در هر سناریو (0 یعنی مستقیم)")
+    parser.add_argument("--topics", type=int, default=50, help="تعداد سورس‌ها (تاپیک‌ها)")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=200, help="نرخ انتشار هسته (پیام بر ثانیه)")
+    parser.add_argument("--workers", type=int, default=8, help="تعداد پروسه‌های مشترک")
+    parser.add_argument("--warmup-timeout", type=float, default=60)
+    parser.add_argument("--timeout", type=float, default=3, help="توقف کارگر پس از این مدت بدون پیام")
+    args = parser.parse_args()
+    _raise_fd_limit()
+
+    print(f"{args.subscribers} subscribers, {args.topics} topics, {args.messages} messages at {args.rate:.0f}/s")
+    print(f"{'relays':>6} {'delivered':>15} {'deliv/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'core CPU%':>9} {'relay CPU%':>10}")
+    for relay_count in args.relays:
+        r = _scenario(args, relay_count)
+        print(f"{r['relays']:>6} {r['deliveries']:>7}/{r['expected']:<7} {r['per_sec']:>10.0f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['core_cpu']:>9.1f} {r['relay_cpu']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+بنچمارک مقیاس‌پذیری پردازشگر شارد شده سیگنال‌ها.
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_sharded_processor --signals 2000 --db-delay-ms 2
+
+ذخیره گزارش TRADE_CLOSED_COPY با یک تاخیر ثابت (در ترد) شبیه‌سازی می‌شود تا اثر شاخه کند
+(TRADE_CLOSED_COPY) بر بقیه سیگنال‌ها و مقیاس‌پذیری با تعداد شاردها دیده شود.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from core import server
+
+
+def _make_signals(count: int, sources: int) -> list[dict]:
+    signals = []
+    for i in range(count):
+        if i % 2 == 0:
+            signals.append({
+                "event": "TRADE_OPEN",
+                "source_id_str": f"S{i % sources + 1}",
+                "position_id": 100000 + i,
+                "symbol": "EURUSD",
+                "position_type": 0,
+            })
+        else:
+            signals.append({
+                "event": "TRADE_CLOSED_COPY",
+                "copy_id_str": f"C{i % sources + 1}",
+                "source_id_str": f"S{i % sources + 1}",
+                "source_ticket": 100000 + i,
+                "symbol": "EURUSD",
+                "profit": 1.0,
+            })
+    return signals
+
+
+async def _run_once(shards: int, signals: list[dict], delay: float) -> float:
+    zmq_server = server.ZMQServer(alert_queue=asyncio.Queue(), num_shards=shards)
+
+    async def slow_submit(**kwargs):
+        await asyncio.to_thread(time.sleep, delay)
+
+    zmq_server.history_writer.submit = slow_submit
+
+    async def drain_publish_queue():
+        while True:
+            await zmq_server.publish_queue.get()
+            zmq_server.publish_queue.task_done()
+
+    tasks = [asyncio.create_task(zmq_server.start_signal_processor(i)) for i in range(shards)]
+    tasks += [asyncio.create_task(zmq_server.start_side_effects_worker(i)) for i in range(shards)]
+    tasks.append(asyncio.create_task(drain_publish_queue()))
+
+    start = time.perf_counter()
+    for signal_data in signals:
+        await zmq_server._dispatch(dict(signal_data))
+    for queue in zmq_server.processing_queues + zmq_server.side_effect_queues:
+        await queue.join()
+    elapsed = time.perf_counter() - start
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    zmq_server.context.term()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", type=int, default=2000)
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--db-delay-ms", type=float, default=2.0)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    delay = args.db_delay_ms / 1000.0
+    logging.disable(logging.CRITICAL)
+
+    signals = _make_signals(args.signals, args.sources)
+    baseline = None
+    print(f"{'shards':>6} {'seconds':>9} {'msgs/sec':>10} {'speedup':>8}")
+    for shards in args.shards:
+        elapsed = await _run_once(shards, signals, delay)
+        rate = len(signals) / elapsed
+        baseline = baseline or rate
+        print(f"{shards:>6} {elapsed:>9.3f} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
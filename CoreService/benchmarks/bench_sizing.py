@@ -0,0 +1,58 @@
+"""
+بنچمارک محاسبه مرکزی حجم کپی‌ها (core/sizing.py): حلقه پایتون در برابر گذر برداری numpy.
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_sizing --copies 10 100 1000 5000
+
+برای هر تعداد کپی یک سورس با اتصالات تصادفی (ضریب/ثابت و سقف لات) ساخته می‌شود و زمان محاسبه
+حجم همه کپی‌های یک سیگنال TRADE_OPEN گزارش می‌شود. بدون numpy فقط ستون پایتون اندازه‌گیری می‌شود.
+"""
+import argparse
+import random
+import time
+
+from core import sizing
+from core.routing import RoutingTable
+
+
+def _table(copies: int) -> RoutingTable:
+    rng = random.Random(copies)
+    rows = [
+        (f"C{c}", "S1", "ALL", None, rng.choice(("MULTIPLIER", "FIXED")),
+         rng.choice((0.5, 1.0, 2.0, 0.33)), rng.choice((0.0, 1.0, 5.0)))
+        for c in range(copies)
+    ]
+    table = RoutingTable()
+    table.apply(rows)
+    return table
+
+
+def _measure(table: RoutingTable, specs: sizing.SymbolSpecRegistry, numpy_min: int, signals: int) -> float:
+    sizing.SIZING_NUMPY_MIN_ROUTES = numpy_min
+    sizer = sizing.LotSizer(table, specs)
+    _, indices = table.resolve(b"S1", b"EURUSD")
+    sizer.lots(b"S1", b"EURUSD", 0.1, indices)
+    start = time.perf_counter()
+    for i in range(signals):
+        sizer.lots(b"S1", b"EURUSD", 0.01 * (i % 100 + 1), indices)
+    return (time.perf_counter() - start) / signals * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--signals", type=int, default=2000)
+    args = parser.parse_args()
+
+    specs = sizing.SymbolSpecRegistry(path="")
+    specs.update("EURUSD", 0.01, 0.01, 100.0)
+    print(f"{'copies':>7} {'python us':>10} {'numpy us':>10}")
+    for copies in args.copies:
+        table = _table(copies)
+        python_us = _measure(table, specs, copies + 1, args.signals)
+        numpy_us = _measure(table, specs, 1, args.signals) if sizing.np is not None else float("nan")
+        print(f"{copies:>7} {python_us:>10.1f} {numpy_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+اندازه‌گیری بایت‌های هدر رفته روی گذرگاه سیگنال: تاپیک ساده سورس در برابر تاپیک‌های قاب‌بندی شده (FRAMED_TOPICS).
+
+اجرا (از پوشه CoreService):
+    python -m benchmarks.bench_topic_framing --sources 200 --copies 500 --messages 5000
+
+ناوگانی از حساب‌های کپی با شناسه‌های سورس واقعی add_source_account (S1، S2، ...) و ترکیبی از حالت‌های
+ALL/GOLD_ONLY/SYMBOLS ساخته می‌شود. هر سناریو روی یک PUB و SUB های واقعی ZMQ (فیلتر پیشوندی خود ZMQ)
+اجرا و برای هر پیام تحویل شده مشخص می‌شود که کپی به آن نیاز داشته یا خیر:
+  - سورس اشتباه: تطبیق پیشوندی (مثلاً مشترک S1 پیام‌های S10 تا S19 و S100 تا S199 را هم می‌گیرد)
+  - نماد فیلتر شده: پیام سورس درست که فیلتر copy_mode/allowed_symbols اکسپرت آن را کنار می‌گذارد
+"""
+import argparse
+import random
+import time
+
+import zmq
+
+from core import routing
+
+_PORT = 5660
+_SYNC = b"SYNC"
+_SYMBOLS = ("EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "XAUEUR", "BTCUSD", "US30", "AUDUSD")
+
+
+def _fleet(args) -> list[list[tuple]]:
+    """برای هر کپی لیست (source_id_str، copy_mode، allowed_symbols) اتصالاتش."""
+    rng = random.Random(args.seed)
+    sources = [f"S{n}" for n in range(1, args.sources + 1)]
+    fleet = []
+    for _ in range(args.copies):
+        mappings = []
+        for source in rng.sample(sources, min(args.sources_per_copy, len(sources))):
+            mode = rng.choices(("ALL", "GOLD_ONLY", "SYMBOLS"), weights=(0.6, 0.1, 0.3))[0]
+            allowed = ";".join(rng.sample(_SYMBOLS, rng.randint(1, 3))) if mode == "SYMBOLS" else None
+            mappings.append((source, mode, allowed))
+        fleet.append(mappings)
+    return fleet
+
+
+def _subscriptions(mappings: list[tuple], framed: bool) -> set[bytes]:
+    """همان اشتراک‌های UpdateSubscriptions اکسپرت کپی."""
+    topics = set()
+    for source, mode, allowed in mappings:
+        if not framed:
+            topics.add(source.encode())
+        elif mode == "SYMBOLS":
+            topics.update(f"{source}|{symbol.strip()}|".encode() for symbol in allowed.split(";") if symbol.strip())
+        else:
+            topics.add(f"{source}|".encode())
+    return topics
+
+
+def _payload(source: str, symbol: str, n: int) -> bytes:
+    """پیام TRADE_OPEN با ترتیب کلیدهای CJsonBuilder اکسپرت سورس و مهر seq سرور."""
+    return (
+        f'{{"event":"TRADE_OPEN","source_id_str":"{source}","timestamp_ms":{1700000000000 + n},'
+        f'"deal_ticket":{500000000 + n},"order_ticket":{400000000 + n},"position_id":{300000000 + n},'
+        f'"symbol":"{symbol}","magic":0,"volume":0.10000,"price":1.08123,"deal_type":0,"position_type":0,'
+        f'"position_sl":0.00000,"position_tp":0.00000,"seq_epoch":1700000000,"seq":{n + 1}}}'
+    ).encode()
+
+
+def _drain_until_sync(poller: zmq.Poller, subs: list, counts: list | None, timeout: float):
+    """خواندن همه SUB ها تا هر کدام یک پیام SYNC بگیرد (پیام‌های قبل از آن در counts ثبت می‌شوند)."""
+    pending = set(range(len(subs)))
+    index = {sub: i for i, sub in enumerate(subs)}
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for sub, _ in poller.poll(100):
+            i = index[sub]
+            while True:
+                try:
+                    topic, body = sub.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                if topic == _SYNC:
+                    pending.discard(i)
+                elif counts is not None:
+                    counts[i].append((topic, body))
+    return not pending
+
+
+def _run(args, fleet: list[list[tuple]], messages: list[tuple], framed: bool) -> dict:
+    routing.FRAMED_TOPICS = framed
+    ctx = zmq.Context()
+    pub = ctx.socket(zmq.PUB)
+    pub.setsockopt(zmq.SNDHWM, 0)
+    pub.bind(f"tcp://127.0.0.1:{_PORT}")
+    subs, poller = [], zmq.Poller()
+    for mappings in fleet:
+        sub = ctx.socket(zmq.SUB)
+        sub.setsockopt(zmq.RCVHWM, 0)
+        sub.connect(f"tcp://127.0.0.1:{_PORT}")
+        for topic in _subscriptions(mappings, framed) | {_SYNC}:
+            sub.setsockopt(zmq.SUBSCRIBE, topic)
+        poller.register(sub, zmq.POLLIN)
+        subs.append(sub)
+
+    # صبر تا رسیدن اشتراک همه SUB ها به PUB
+    ready = False
+    for _ in range(100):
+        pub.send_multipart([_SYNC, b""])
+        if _drain_until_sync(poller, subs, None, 0.2):
+            ready = True
+            break
+    if not ready:
+        raise RuntimeError("subscribers did not become ready")
+    # پیام‌های SYNC اضافه مرحله آماده‌سازی
+    _drain_until_sync(poller, subs, None, 0.5)
+
+    counts = [[] for _ in subs]
+    started = time.perf_counter()
+    for source, symbol, body in messages:
+        pub.send_multipart([routing.source_topic(source.encode(), symbol.encode()), body])
+    pub.send_multipart([_SYNC, b""])
+    if not _drain_until_sync(poller, subs, counts, 60):
+        raise RuntimeError("not all deliveries arrived")
+    elapsed = time.perf_counter() - started
+
+    result = {"delivered": 0, "bytes": 0, "wrong_source": 0, "wrong_source_bytes": 0,
+              "filtered": 0, "filtered_bytes": 0, "seconds": elapsed}
+    for mappings, received in zip(fleet, counts):
+        configs = {source: (mode, allowed) for source, mode, allowed in mappings}
+        for topic, body in received:
+            size = len(topic) + len(body)
+            result["delivered"] += 1
+            result["bytes"] += size
+            source, symbol = messages[int(body.rsplit(b'"seq":', 1)[1][:-1]) - 1][:2]
+            if source not in configs:
+                result["wrong_source"] += 1
+                result["wrong_source_bytes"] += size
+            elif not routing.symbol_allowed(configs[source][0], configs[source][1], symbol):
+                result["filtered"] += 1
+                result["filtered_bytes"] += size
+    for sub in subs:
+        sub.close(0)
+    pub.close(0)
+    ctx.term()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=500)
+    parser.add_argument("--sources-per-copy", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fleet = _fleet(args)
+    rng = random.Random(args.seed + 1)
+    messages = []
+    for n in range(args.messages):
+        source, symbol = f"S{rng.randint(1, args.sources)}", rng.choice(_SYMBOLS)
+        messages.append((source, symbol, _payload(source, symbol, n)))
+
+    print(f"{args.copies} copies x {args.sources_per_copy} sources (of {args.sources}), {args.messages} signals")
+    print(f"{'scheme':>8} {'delivered':>10} {'MB':>8} {'wrong src':>10} {'filtered':>10} {'wasted MB':>10} {'wasted':>7}")
+    for name, framed in (("bare", False), ("framed", True)):
+        r = _run(args, fleet, messages, framed)
+        wasted = r["wrong_source_bytes"] + r["filtered_bytes"]
+        print(f"{name:>8} {r['delivered']:>10} {r['bytes'] / 1e6:>8.2f} {r['wrong_source']:>10} {r['filtered']:>10} "
+              f"{wasted / 1e6:>10.2f} {wasted / max(1, r['bytes']):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+تولیدکننده بار: شبیه‌سازی هزاران اکسپرت سورس و کپی با همان پروتکل سیمی اکسپرت‌های MQL5.
+
+اجرا (از پوشه CoreService، با سرور در حال اجرا):
+    python -m benchmarks.loadgen --sources 200 --copies 2000 --rate 0.5 --duration 60 --processes 4
+
+اکسپرت سورس (TradeCopier_Source.mq5): PUSH پیام‌های TRADE_* با همان ترتیب کلیدهای CJsonBuilder
+و PING دوره‌ای. اکسپرت کپی (TradeCopier_Copy.mq5): REQ برای GET_CONFIG، SUB روی تاپیک سورس‌ها
+و CFG|، و PUSH گزارش TRADE_CLOSED_COPY پس از بسته شدن پوزیشن مستر و PING_COPY دوره‌ای.
+
+برای اندازه‌گیری تاخیر سرتاسری یک فیلد اضافه lg_sent_ns (زمان ارسال) در انتهای پیام‌های سورس
+قرار می‌گیرد که سرور و اکسپرت کپی آن را نادیده می‌گیرند (با --no-probe حذف می‌شود).
+گزارش نهایی: صدک‌های تاخیر، پیام‌های از دست رفته (شمارش و شکاف seq) و مصرف CPU پروسه سرور.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import time
+
+import zmq
+import zmq.asyncio
+
+_PROBE_RE = re.compile(rb'"lg_sent_ns": ?(\d+)')
+_SEQ_RE = re.compile(rb'"seq_epoch": ?(\d+), ?"seq": ?(\d+)}$')
+_POSITION_RE = re.compile(rb'"position_id": ?(\d+)')
+_EVENT_RE = re.compile(rb'"event": ?"(\w+)"')
+_SOURCE_RE = re.compile(rb'"source_id_str": ?"([^"]*)"')
+_SYMBOLS = ("EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "BTCUSD")
+
+
+def source_id(n: int) -> str:
+    # شناسه‌های هم‌طول تا اشتراک پیشوندی ZMQ (S1 و S10) پیام اضافه تحویل ندهد
+    return f"LGS{n:05d}"
+
+
+def copy_id(n: int) -> str:
+    return f"LGC{n:05d}"
+
+
+def _raise_fd_limit():
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class _SourceEA:
+    """اکسپرت سورس شبیه‌سازی شده با چرخه ساده باز/اصلاح/بستن پوزیشن‌ها."""
+
+    def __init__(self, ctx, n: int, args, stats: dict):
+        self.id = source_id(n)
+        self.args = args
+        self.stats = stats
+        self.socket = ctx.socket(zmq.PUSH)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(f"tcp://{args.server}:{args.signal_port}")
+        self.rng = random.Random(n)
+        self.positions: dict[int, dict] = {}
+        self.next_ticket = n * 10_000_000
+
+    def _message(self, event: str, pos: dict, deal_ticket: int, timestamp_ms: int, extra: str = "") -> bytes:
+        # ترتیب و قالب کلیدها مطابق SendTradeEvent و CJsonBuilder (اعشار با ۵ رقم)
+        body = (
+            f'{{"event":"{event}","source_id_str":"{self.id}","timestamp_ms":{timestamp_ms},'
+            f'"deal_ticket":{deal_ticket},"order_ticket":{deal_ticket + 1},"position_id":{pos["id"]},'
+            f'"symbol":"{pos["symbol"]}","magic":0,"volume":{pos["volume"]:.5f},"price":{pos["price"]:.5f},'
+            f'"profit":{pos["profit"]:.5f},"position_sl":{pos["sl"]:.5f},"position_tp":{pos["tp"]:.5f},'
+            f'"position_type":{pos["type"]}{extra}'
+        )
+        if self.args.probe:
+            body += f',"lg_sent_ns":{time.time_ns()}'
+        return (body + "}").encode("utf-8")
+
+    def _next_signal(self) -> bytes:
+        rng = self.rng
+        roll = rng.random()
+        if not self.positions or (roll < 0.35 and len(self.positions) < 20):
+            self.next_ticket += 2
+            pos = {
+                "id": self.next_ticket, "symbol": rng.choice(_SYMBOLS), "volume": rng.choice((0.01, 0.1, 0.5, 1.0)),
+                "price": 1.0 + rng.random(), "profit": 0.0, "sl": 0.0, "tp": 0.0, "type": rng.randint(0, 1),
+                "entry_deal": self.next_ticket, "entry_ms": int(time.time() * 1000),
+            }
+            self.positions[pos["id"]] = pos
+            return self._message("TRADE_OPEN", pos, pos["entry_deal"], pos["entry_ms"])
+        pos = self.positions[rng.choice(list(self.positions))]
+        if roll < 0.75:
+            # اکسپرت سورس برای TRADE_MODIFY تیکت و زمان معامله ورودی را می‌فرستد
+            pos["sl"] = pos["price"] - 0.001 * rng.randint(1, 50)
+            pos["tp"] = pos["price"] + 0.001 * rng.randint(1, 50)
+            return self._message("TRADE_MODIFY", pos, pos["entry_deal"], pos["entry_ms"], ',"modified_fields":"sl_tp"')
+        self.next_ticket += 2
+        pos["profit"] = rng.uniform(-50, 50)
+        if roll < 0.85 and pos["volume"] >= 0.1:
+            closed = round(pos["volume"] / 2, 2)
+            pos["volume"] -= closed
+            return self._message("TRADE_PARTIAL_CLOSE_MASTER", pos, self.next_ticket, int(time.time() * 1000),
+                                 f',"volume_closed":{closed:.5f}')
+        del self.positions[pos["id"]]
+        return self._message("TRADE_CLOSE_MASTER", pos, self.next_ticket, int(time.time() * 1000))
+
+    async def _send(self, frame: bytes):
+        try:
+            # مانند اکسپرت: ZMQ_DONTWAIT؛ ارسال ناموفق شمرده می‌شود
+            await self.socket.send(frame, zmq.DONTWAIT)
+            # اصلاحات جدا شمرده می‌شوند چون سرور ممکن است آن‌ها را ادغام کند (MODIFY_CONFLATION_MS)
+            counter = self.stats["sent_modify" if frame.startswith(b'{"event":"TRADE_MODIFY"') else "sent"]
+            counter[self.id] = counter.get(self.id, 0) + 1
+        except zmq.Again:
+            self.stats["send_failed"] += 1
+
+    async def run_signals(self, stop_at: float):
+        args = self.args
+        next_burst = time.time() + args.burst_every if args.burst_every else None
+        while time.time() < stop_at:
+            if next_burst is not None and time.time() >= next_burst:
+                next_burst += args.burst_every
+                for _ in range(args.burst_size):
+                    await self._send(self._next_signal())
+            await self._send(self._next_signal())
+            # فاصله نمایی بین سیگنال‌ها (فرایند پواسون با نرخ rate)
+            await asyncio.sleep(self.rng.expovariate(args.rate) if args.rate > 0 else 3600)
+
+    async def run_pings(self, stop_at: float):
+        await asyncio.sleep(self.rng.uniform(0, self.args.ping_interval))
+        while time.time() < stop_at:
+            ping = f'{{"event":"PING","source_id_str":"{self.id}","timestamp":{int(time.time())}}}'
+            await self._send_control(ping.encode("utf-8"))
+            await asyncio.sleep(self.args.ping_interval)
+
+    async def _send_control(self, frame: bytes):
+        try:
+            await self.socket.send(frame, zmq.DONTWAIT)
+        except zmq.Again:
+            self.stats["send_failed"] += 1
+
+    def close(self):
+        self.socket.close(0)
+
+
+class _CopyEA:
+    """اکسپرت کپی شبیه‌سازی شده."""
+
+    def __init__(self, ctx, n: int, topics: list[str], args, stats: dict):
+        self.id = copy_id(n)
+        self.ctx = ctx
+        self.args = args
+        self.stats = stats
+        self.topics = topics
+        self.rng = random.Random(-n - 1)
+        self.sub = ctx.socket(zmq.SUB)
+        self.sub.setsockopt(zmq.LINGER, 0)
+        self.sub.connect(f"tcp://{args.server}:{args.publish_port}")
+        self.push = ctx.socket(zmq.PUSH)
+        self.push.setsockopt(zmq.LINGER, 0)
+        self.push.connect(f"tcp://{args.server}:{args.signal_port}")
+        self.last_seq: dict[bytes, tuple[int, int]] = {}
+        # تاپیک اختصاصی در حالت مسیریابی سرور (ROUTED_TOPICS)
+        self.routed: bytes | None = None
+        # تاپیک‌های قاب‌بندی شده <source>|<symbol>| (FRAMED_TOPICS)
+        self.framed = args.framed_topics
+        self.next_deal = 900_000_000 + n * 1_000_000
+
+    async def fetch_config(self) -> list[str]:
+        """GET_CONFIG روی یک سوکت REQ تازه (مانند FetchConfiguration)؛ سورس‌های mappings برگردانده می‌شوند."""
+        req = self.ctx.socket(zmq.REQ)
+        req.setsockopt(zmq.LINGER, 0)
+        req.connect(f"tcp://{self.args.server}:{self.args.config_port}")
+        started = time.perf_counter()
+        try:
+            await req.send_string(json.dumps({"command": "GET_CONFIG", "copy_id_str": self.id}, separators=(",", ":")))
+            if not await req.poll(5000):
+                self.stats["config_timeouts"] += 1
+                return []
+            reply = json.loads(await req.recv())
+            self.stats["config_ms"].append((time.perf_counter() - started) * 1000)
+            if reply.get("status") != "OK":
+                self.stats["config_errors"] += 1
+                return []
+            config = reply.get("config", {})
+            if config.get("routed_topic"):
+                self.routed = config["routed_topic"].encode("utf-8")
+            self.framed = bool(config.get("framed_topics", self.framed))
+            return [m["source_topic_id"] for m in config.get("mappings", [])]
+        finally:
+            req.close(0)
+
+    async def subscribe(self):
+        if self.args.use_config:
+            configured = await self.fetch_config()
+            if configured:
+                self.topics = configured
+        suffix = b"|" if self.framed else b""
+        for topic in ([self.routed] if self.routed else [t.encode("utf-8") + suffix for t in self.topics]):
+            self.sub.setsockopt(zmq.SUBSCRIBE, topic)
+        self.sub.setsockopt(zmq.SUBSCRIBE, f"CFG|{self.id}|".encode("utf-8"))
+
+    async def run_receive(self):
+        topics = {t.encode("utf-8") for t in self.topics}
+        stats = self.stats
+        while True:
+            topic, payload = await self.sub.recv_multipart()
+            if topic.startswith(b"CFG|"):
+                stats["config_notices"] += 1
+                continue
+            source = topic
+            if topic == self.routed:
+                match = _SOURCE_RE.search(payload)
+                source = match.group(1) if match is not None else b""
+            elif self.framed:
+                source = topic.split(b"|", 1)[0]
+            if source not in topics:
+                stats["unexpected"] += 1
+                continue
+            now = time.time_ns()
+            event = _EVENT_RE.search(payload)
+            event = event.group(1) if event is not None else b""
+            counter = stats["received_modify" if event == b"TRADE_MODIFY" else "received"]
+            counter[source] = counter.get(source, 0) + 1
+            probe = _PROBE_RE.search(payload)
+            if probe is not None:
+                stats["latency_ms"].append((now - int(probe.group(1))) / 1e6)
+            seq = _SEQ_RE.search(payload)
+            if seq is not None:
+                epoch, number = int(seq.group(1)), int(seq.group(2))
+                last = self.last_seq.get(topic)
+                if last is not None and last[0] == epoch and number > last[1] + 1:
+                    stats["seq_gaps"] += 1
+                    stats["seq_missing"] += number - last[1] - 1
+                self.last_seq[topic] = (epoch, number)
+            if event == b"TRADE_CLOSE_MASTER" and self.rng.random() < self.args.close_report_ratio:
+                await self._report_close(source.decode("utf-8"), payload)
+
+    async def _report_close(self, source: str, payload: bytes):
+        position = _POSITION_RE.search(payload)
+        self.next_deal += 1
+        report = (
+            f'{{"event":"TRADE_CLOSED_COPY","copy_id_str":"{self.id}","source_id_str":"{source}",'
+            f'"source_ticket":{int(position.group(1)) if position else 0},"symbol":"EURUSD",'
+            f'"profit":{self.rng.uniform(-50, 50):.5f},"volume":0.10000,"deal_ticket":{self.next_deal}}}'
+        )
+        try:
+            await self.push.send(report.encode("utf-8"), zmq.DONTWAIT)
+            self.stats["close_reports"] += 1
+        except zmq.Again:
+            self.stats["send_failed"] += 1
+
+    async def run_pings(self, stop_at: float):
+        await asyncio.sleep(self.rng.uniform(0, self.args.ping_interval))
+        while time.time() < stop_at:
+            ping = f'{{"event":"PING_COPY","copy_id_str":"{self.id}","timestamp":{int(time.time())}}}'
+            try:
+                await self.push.send(ping.encode("utf-8"), zmq.DONTWAIT)
+            except zmq.Again:
+                self.stats["send_failed"] += 1
+            await asyncio.sleep(self.args.ping_interval)
+
+    def close(self):
+        self.sub.close(0)
+        self.push.close(0)
+
+
+async def _run_worker(args, source_ns: list[int], copies: list[tuple[int, list[str]]], start_at: float) -> dict:
+    ctx = zmq.asyncio.Context()
+    ctx.set(zmq.MAX_SOCKETS, 3 * (len(source_ns) + len(copies)) + 64)
+    stats = {
+        "sent": {}, "received": {}, "sent_modify": {}, "received_modify": {}, "latency_ms": [], "config_ms": [], "send_failed": 0, "unexpected": 0,
+        "seq_gaps": 0, "seq_missing": 0, "close_reports": 0, "config_notices": 0,
+        "config_errors": 0, "config_timeouts": 0, "subscriptions": {},
+    }
+    copy_eas = [_CopyEA(ctx, n, topics, args, stats) for n, topics in copies]
+    # درخواست‌های GET_CONFIG با همزمانی محدود (مانند راه‌اندازی تدریجی ترمینال‌ها)
+    gate = asyncio.Semaphore(100)
+
+    async def subscribe(ea):
+        async with gate:
+            await ea.subscribe()
+    await asyncio.gather(*(subscribe(ea) for ea in copy_eas))
+    for ea in copy_eas:
+        for topic in ea.topics:
+            stats["subscriptions"][topic] = stats["subscriptions"].get(topic, 0) + 1
+    receivers = [asyncio.create_task(ea.run_receive()) for ea in copy_eas]
+
+    source_eas = [_SourceEA(ctx, n, args, stats) for n in source_ns]
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    stop_at = start_at + args.duration
+    await asyncio.gather(
+        *(ea.run_signals(stop_at) for ea in source_eas),
+        *(ea.run_pings(stop_at) for ea in source_eas),
+        *(ea.run_pings(stop_at) for ea in copy_eas),
+    )
+    # فرصت تحویل پیام‌های در راه
+    await asyncio.sleep(args.drain)
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    for ea in source_eas + copy_eas:
+        ea.close()
+    ctx.term()
+    return stats
+
+
+def _worker(args, source_ns, copies, start_at, results):
+    _raise_fd_limit()
+    if os.name == "nt":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    results.put(asyncio.run(_run_worker(args, source_ns, copies, start_at)))
+
+
+class _CpuSampler:
+    """نمونه‌برداری مصرف CPU پروسه سرور (psutil در صورت نصب، در غیر این صورت /proc روی لینوکس)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.samples: list[float] = []
+        try:
+            import psutil
+            self._proc = psutil.Process(pid)
+        except ImportError:
+            self._proc = None
+            self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def _cpu_seconds(self) -> float:
+        if self._proc is not None:
+            times = self._proc.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    async def run(self, interval: float = 1.0):
+        last_cpu, last_at = self._cpu_seconds(), time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            cpu, at = self._cpu_seconds(), time.perf_counter()
+            self.samples.append((cpu - last_cpu) / (at - last_at) * 100)
+            last_cpu, last_at = cpu, at
+
+
+def _find_server_pid(port: int) -> int | None:
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        for conn in psutil.net_connections(kind="tcp"):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+                return conn.pid
+    except (psutil.AccessDenied, PermissionError):
+        return None
+    return None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def _report(args, stats_list: list[dict], cpu: list[float] | None):
+    sent, received, sent_modify, received_modify, subscriptions = {}, {}, {}, {}, {}
+    latency, config_ms = [], []
+    totals = {k: 0 for k in ("send_failed", "unexpected", "seq_gaps", "seq_missing", "close_reports",
+                             "config_notices", "config_errors", "config_timeouts")}
+    for stats in stats_list:
+        for src, dst in ((stats["sent"], sent), (stats["received"], received), (stats["sent_modify"], sent_modify),
+                         (stats["received_modify"], received_modify), (stats["subscriptions"], subscriptions)):
+            for key, value in src.items():
+                key = key.decode("utf-8") if isinstance(key, bytes) else key
+                dst[key] = dst.get(key, 0) + value
+        latency.extend(stats["latency_ms"])
+        config_ms.extend(stats["config_ms"])
+        for key in totals:
+            totals[key] += stats[key]
+    signals = sum(sent.values()) + sum(sent_modify.values())
+    expected = sum(count * subscriptions.get(topic, 0) for topic, count in sent.items())
+    delivered = sum(received.values())
+    expected_modify = sum(count * subscriptions.get(topic, 0) for topic, count in sent_modify.items())
+    delivered_modify = sum(received_modify.values())
+
+    print(f"sources={args.sources} copies={args.copies} duration={args.duration}s "
+          f"rate={args.rate}/s/source burst={args.burst_size}/{args.burst_every}s")
+    print(f"signals sent: {signals} ({signals / args.duration:,.0f}/s)  send failures: {totals['send_failed']}")
+    print(f"deliveries: {delivered}/{expected} expected  dropped: {max(0, expected - delivered)}  "
+          f"seq gaps: {totals['seq_gaps']} ({totals['seq_missing']} msgs)  unexpected topic: {totals['unexpected']}")
+    print(f"TRADE_MODIFY deliveries: {delivered_modify}/{expected_modify} (the rest conflated by the server)")
+    if latency:
+        print("end-to-end latency ms: " + "  ".join(
+            f"p{p}={_percentile(latency, p):.2f}" for p in (50, 90, 99, 99.9)) + f"  max={max(latency):.2f}")
+    if config_ms:
+        print(f"GET_CONFIG ms: p50={_percentile(config_ms, 50):.2f} p99={_percentile(config_ms, 99):.2f}  "
+              f"errors={totals['config_errors']} timeouts={totals['config_timeouts']}")
+    print(f"close reports sent: {totals['close_reports']}  config notices: {totals['config_notices']}")
+    if cpu:
+        print(f"server CPU %: avg={sum(cpu) / len(cpu):.1f} p90={_percentile(cpu, 90):.1f} max={max(cpu):.1f}")
+    elif cpu is None:
+        print("server CPU: not measured (pass --server-pid, or install psutil for auto-detection)")
+
+
+async def _supervise(args):
+    n_workers = max(1, args.processes)
+    all_sources = list(range(1, args.sources + 1))
+    rng = random.Random(0)
+    per_copy = min(args.sources_per_copy, args.sources)
+    assignments = [([], []) for _ in range(n_workers)]
+    for i, n in enumerate(all_sources):
+        assignments[i % n_workers][0].append(n)
+    for n in range(1, args.copies + 1):
+        topics = [source_id(s) for s in rng.sample(all_sources, per_copy)]
+        assignments[n % n_workers][1].append((n, topics))
+
+    pid = args.server_pid or _find_server_pid(int(args.signal_port))
+    sampler = _CpuSampler(pid) if pid else None
+    sampler_task = asyncio.create_task(sampler.run()) if sampler else None
+
+    mp = multiprocessing.get_context("spawn")
+    results = mp.Queue()
+    start_at = time.time() + args.warmup
+    workers = [mp.Process(target=_worker, args=(args, s, c, start_at, results)) for s, c in assignments]
+    for w in workers:
+        w.start()
+    stats_list = [await asyncio.to_thread(results.get) for _ in workers]
+    for w in workers:
+        await asyncio.to_thread(w.join)
+    if sampler_task:
+        sampler_task.cancel()
+    _report(args, stats_list, sampler.samples if sampler else None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default="127.0.0.1")
+    parser.add_argument("--signal-port", default="5555")
+    parser.add_argument("--publish-port", default="5556")
+    parser.add_argument("--config-port", default="5557")
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--copies", type=int, default=500)
+    parser.add_argument("--sources-per-copy", type=int, default=3,
+                        help="تعداد سورس‌های هر کپی وقتی mappings از GET_CONFIG در دسترس نیست")
+    parser.add_argument("--no-config", dest="use_config", action="store_false",
+                        help="بدون GET_CONFIG؛ فقط اشتراک شبیه‌سازی شده")
+    parser.add_argument("--framed-topics", action="store_true",
+                        help="اشتراک <source>| (سرور با FRAMED_TOPICS=1)؛ با GET_CONFIG خودکار تشخیص داده می‌شود")
+    parser.add_argument("--rate", type=float, default=1.0, help="میانگین سیگنال در ثانیه برای هر سورس")
+    parser.add_argument("--burst-size", type=int, default=0, help="تعداد سیگنال پشت سر هم در هر انفجار")
+    parser.add_argument("--burst-every", type=float, default=0, help="فاصله انفجارها (ثانیه)؛ صفر یعنی بدون انفجار")
+    parser.add_argument("--ping-interval", type=float, default=30)
+    parser.add_argument("--close-report-ratio", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3, help="زمان برقراری اشتراک‌ها پیش از شروع سیگنال‌ها")
+    parser.add_argument("--drain", type=float, default=2)
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--server-pid", type=int)
+    parser.add_argument("--no-probe", dest="probe", action="store_false",
+                        help="پیام‌های دقیقاً هم‌شکل اکسپرت (بدون اندازه‌گیری تاخیر)")
+    args = parser.parse_args()
+    asyncio.run(_supervise(args))
+
+
+if __name__ == "__main__":
+    main()
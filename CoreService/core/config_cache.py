@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from . import database
+from . import metrics
+from . import routing
+
+# مدت اعتبار پاسخ‌های منفی (شناسه ناشناخته یا غیرفعال) بر حسب ثانیه
+CONFIG_NEGATIVE_TTL = float(os.getenv("CONFIG_NEGATIVE_TTL", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigCache:
+    """
+    کش درون‌حافظه‌ای پاسخ‌های آماده ارسال GET_CONFIG به ازای هر copy_id_str.
+    هر تابع نوشتن در database.py پس از commit، ورودی‌های مربوطه را باطل می‌کند؛
+    بنابراین مسیر داغ پاسخگویی به SQLite دسترسی ندارد.
+    """
+    def __init__(self, negative_ttl: float = CONFIG_NEGATIVE_TTL):
+        self.negative_ttl = negative_ttl
+        # copy_id_str -> (payload, one_shot, expires_at)
+        self._entries: dict[str, tuple[bytes, bool, float | None]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        # درخواست‌های در حال اجرا برای هر copy_id_str (ادغام درخواست‌های همزمان)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _build(self, copy_id_str: str, consume_reset: bool = True) -> tuple[bytes, bool, bool]:
+        """ساخت پاسخ از دیتابیس (در ترد جداگانه اجرا می‌شود)."""
+        try:
+            config_data = database.get_config_for_copy_ea(copy_id_str, consume_reset=consume_reset)
+        except ValueError as e:
+            payload = json.dumps({"status": "ERROR", "message": str(e)}, separators=(",", ":")).encode("utf-8")
+            return payload, False, True
+        if routing.ROUTED_TOPICS:
+            config_data["routed_topic"] = routing.routed_topic(copy_id_str)
+        elif routing.FRAMED_TOPICS:
+            config_data["framed_topics"] = True
+        payload = json.dumps({"status": "OK", "config": config_data}, separators=(",", ":")).encode("utf-8")
+        # reset_dd_flag یک‌بار مصرف است؛ پاسخ حاوی آن فقط یک بار ارسال می‌شود
+        one_shot = bool(config_data.get("global_settings", {}).get("reset_dd_flag"))
+        return payload, one_shot, False
+
+    def _store(self, copy_id_str: str, payload: bytes, one_shot: bool, negative: bool):
+        expires_at = time.monotonic() + self.negative_ttl if negative else None
+        self._entries[copy_id_str] = (payload, one_shot, expires_at)
+
+    def lookup(self, copy_id_str: str) -> bytes | None:
+        """برگرداندن پاسخ کش شده یا None."""
+        entry = self._entries.get(copy_id_str)
+        if entry is None:
+            return None
+        payload, one_shot, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self._entries.pop(copy_id_str, None)
+            return None
+        if one_shot:
+            self._entries.pop(copy_id_str, None)
+        return payload
+
+    async def get(self, copy_id_str: str) -> bytes:
+        """دریافت پاسخ آماده ارسال؛ در صورت نبود در کش از دیتابیس ساخته می‌شود."""
+        payload = self.lookup(copy_id_str)
+        if payload is not None:
+            self.hits += 1
+            return payload
+        inflight = self._inflight.get(copy_id_str)
+        if inflight is not None:
+            # [بهبود عملکرد] درخواست‌های همزمان یک شناسه فقط یک کوئری دیتابیس ایجاد می‌کنند
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[copy_id_str] = future
+        try:
+            generation = self._generation
+            started = time.perf_counter()
+            payload, one_shot, negative = await asyncio.to_thread(self._build, copy_id_str)
+            metrics.DB_CALL_SECONDS.observe(time.perf_counter() - started, operation="get_config_for_copy_ea")
+            # اگر در حین ساخت تغییری رخ داده یا پاسخ یک‌بار مصرف است، ذخیره نمی‌شود
+            if generation == self._generation and not one_shot:
+                self._store(copy_id_str, payload, one_shot, negative)
+            future.set_result(payload)
+            return payload
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # جلوگیری از هشدار «exception never retrieved» در نبود منتظر
+            raise
+        finally:
+            self._inflight.pop(copy_id_str, None)
+
+    def invalidate(self, copy_id_strs=None):
+        """باطل کردن ورودی‌های مشخص شده (None یعنی همه)."""
+        self._generation += 1
+        self.invalidations += 1
+        if copy_id_strs is None:
+            self._entries.clear()
+        else:
+            for copy_id_str in copy_id_strs:
+                self._entries.pop(copy_id_str, None)
+        logger.debug(f"Config cache invalidated: {copy_id_strs if copy_id_strs is not None else 'ALL'}")
+
+    def warm(self) -> int:
+        """
+        پیش‌گرم کردن کش برای تمام حساب‌های کپی فعال (در ترد جداگانه اجرا شود).
+        حساب‌هایی که reset_dd_flag در انتظار دارند کش نمی‌شوند و پرچم برای اولین GET_CONFIG واقعی می‌ماند.
+        """
+        count = 0
+        for copy_id_str in database.get_active_copy_id_strs():
+            generation = self._generation
+            payload, one_shot, negative = self._build(copy_id_str, consume_reset=False)
+            if one_shot:
+                continue
+            if generation == self._generation:
+                self._store(copy_id_str, payload, one_shot, negative)
+                count += 1
+        logger.info(f"Config cache pre-warmed for {count} active copy accounts.")
+        return count
+
+    def get_stats(self) -> dict:
+        """آمار کش تنظیمات."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "coalesced": self.coalesced,
+        }
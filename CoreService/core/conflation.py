@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+
+# پنجره ادغام TRADE_MODIFY هر پوزیشن (میلی‌ثانیه)؛ صفر یعنی غیرفعال
+MODIFY_CONFLATION_MS = int(os.getenv("MODIFY_CONFLATION_MS", "250"))
+
+CONFLATED_EVENT = "TRADE_MODIFY"
+# رویدادهایی که پس از آن‌ها پوزیشن دیگر اصلاحی نخواهد داشت (وضعیت کلید آزاد می‌شود)
+CLOSING_EVENTS = ("TRADE_CLOSE_MASTER",)
+
+# بازه ابتدای پیام خام برای یافتن position_id (ترتیب ثابت کلیدها در CJsonBuilder اکسپرت سورس)
+CONFLATION_PEEK_BYTES = 256
+_POSITION_ID_RE = re.compile(rb'"position_id":(\d+)[,}]')
+
+logger = logging.getLogger(__name__)
+
+
+def peek_conflation_key(buf, source_id: bytes) -> tuple | None:
+    """کلید ادغام (سورس، پوزیشن) از پیام خام بدون json.loads."""
+    match = _POSITION_ID_RE.search(buf, 0, CONFLATION_PEEK_BYTES)
+    return (source_id, match.group(1)) if match is not None else None
+
+
+def conflation_key(signal_data: dict) -> tuple | None:
+    """کلید ادغام (سورس، پوزیشن) از سیگنال پارس شده (هم‌شکل با peek_conflation_key)."""
+    source_id = signal_data.get("source_id_str")
+    position_id = signal_data.get("position_id")
+    if not source_id or position_id is None:
+        return None
+    return source_id.encode("utf-8"), str(position_id).encode("utf-8")
+
+
+class _KeyState:
+    __slots__ = ("pending", "deadline", "last_emit")
+
+    def __init__(self):
+        self.pending = None
+        self.deadline = 0.0
+        self.last_emit = 0.0
+
+
+class ModifyConflator:
+    """
+    ادغام TRADE_MODIFYهای پشت سر هم یک پوزیشن (مثلاً حد ضرر متحرک).
+    اولین اصلاح بلافاصله ارسال می‌شود؛ اصلاحات بعدی داخل پنجره نگه داشته شده و هر کدام
+    جایگزین قبلی می‌شود تا در پایان پنجره فقط آخرین SL/TP ارسال شود.
+    پیش از ارسال هر رویداد دیگر همان پوزیشن (باز/بسته شدن) اصلاح معلق آن با barrier تخلیه
+    می‌شود، بنابراین ترتیب رویدادهای یک پوزیشن هرگز تغییر نمی‌کند.
+    """
+    def __init__(self, emit, window_ms: int = MODIFY_CONFLATION_MS):
+        self.emit = emit
+        self.window = window_ms / 1000.0
+        self._keys: dict[tuple, _KeyState] = {}
+        self._heap: list[tuple[float, tuple]] = []
+        self._wakeup = asyncio.Event()
+        # ارسال‌های یک کلید (تخلیه پنجره و barrier) هرگز همپوشانی ندارند
+        self._lock = asyncio.Lock()
+        self.submitted = 0
+        self.conflated = 0
+        self.conflated_by_source: dict[bytes, int] = {}
+        self._last_purge = time.monotonic()
+        self._reported_conflated = 0
+
+    async def submit(self, key: tuple, item, now: float | None = None):
+        """دریافت یک TRADE_MODIFY: ارسال فوری یا نگهداری به عنوان آخرین اصلاح معلق پوزیشن."""
+        now = time.monotonic() if now is None else now
+        self.submitted += 1
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState()
+        if state.pending is not None:
+            state.pending = item
+            self.conflated += 1
+            self.conflated_by_source[key[0]] = self.conflated_by_source.get(key[0], 0) + 1
+            return
+        if now - state.last_emit >= self.window:
+            state.last_emit = now
+            async with self._lock:
+                await self.emit(item)
+            return
+        state.pending = item
+        state.deadline = state.last_emit + self.window
+        heapq.heappush(self._heap, (state.deadline, key))
+        self._wakeup.set()
+
+    async def barrier(self, key: tuple, closing: bool = False):
+        """ارسال اصلاح معلق پوزیشن پیش از رویداد دیگری از همان پوزیشن."""
+        state = self._keys.get(key)
+        if state is None:
+            return
+        async with self._lock:
+            if state.pending is not None:
+                item, state.pending = state.pending, None
+                state.last_emit = time.monotonic()
+                await self.emit(item)
+        if closing:
+            self._keys.pop(key, None)
+
+    def pending(self) -> int:
+        return sum(1 for s in self._keys.values() if s.pending is not None)
+
+    def get_stats(self) -> dict:
+        """آمار مرحله ادغام اصلاحات."""
+        return {
+            "window_ms": self.window * 1000,
+            "submitted": self.submitted,
+            "conflated": self.conflated,
+            "pending": self.pending(),
+            "tracked_positions": len(self._keys),
+        }
+
+    async def _flush_due(self, now: float):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            state = self._keys.get(key)
+            # ورودی کهنه heap (کلید از قبل با barrier تخلیه شده)
+            if state is None or state.pending is None or state.deadline != deadline:
+                continue
+            async with self._lock:
+                if state.pending is None:
+                    continue
+                item, state.pending = state.pending, None
+                state.last_emit = now
+                await self.emit(item)
+
+    def _purge_idle(self, now: float):
+        """حذف کلیدهای بیکار تا حافظه با تعداد پوزیشن‌های بسته نشده رشد نکند."""
+        idle = [k for k, s in self._keys.items() if s.pending is None and now - s.last_emit >= self.window]
+        for key in idle:
+            del self._keys[key]
+
+    async def run(self):
+        """حلقه تخلیه اصلاحات معلق در پایان پنجره هر پوزیشن."""
+        logger.info(f"TRADE_MODIFY conflation started (window={self.window * 1000:.0f}ms).")
+        while True:
+            if self._heap:
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            else:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+            now = time.monotonic()
+            try:
+                await self._flush_due(now)
+            except Exception as e:
+                logger.error(f"Error emitting conflated TRADE_MODIFY: {e}", exc_info=True)
+            if now - self._last_purge >= 60:
+                self._last_purge = now
+                self._purge_idle(now)
+                if self.conflated != self._reported_conflated:
+                    self._reported_conflated = self.conflated
+                    logger.info(f"TRADE_MODIFY conflation: {self.conflated} of {self.submitted} modifies conflated.",
+                                extra={"details": self.get_stats()})
@@ -1,3 +1,4 @@
+import sqlalchemy
 from sqlalchemy import create_engine, func
 from sqlalchemy.orm import sessionmaker, scoped_session, joinedload
 from contextlib import contextmanager
@@ -16,6 +17,32 @@ engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 session_factory = scoped_session(SessionLocal)
 
+# شنونده‌هایی که پس از commit موفق تغییرات تنظیمات حساب‌های کپی فراخوانی می‌شوند
+_config_change_listeners = []
+
+def register_config_change_listener(listener):
+    """
+    ثبت تابعی که پس از commit هر تغییر در حساب‌ها، تنظیمات یا اتصالات
+    با مجموعه copy_id_str های متاثر فراخوانی می‌شود.
+    ممکن است از ترد غیر از حلقه asyncio فراخوانی شود.
+    """
+    _config_change_listeners.append(listener)
+
+def _mark_config_changed(db, *copy_id_strs):
+    """علامت‌گذاری حساب‌های کپی که تنظیماتشان در این session تغییر کرده است."""
+    db.info.setdefault("config_changed", set()).update(c for c in copy_id_strs if c)
+
+def notify_config_changed(copy_id_strs: set):
+    """
+    فراخوانی شنونده‌های تغییر تنظیمات با copy_id_str های متاثر؛ برای تغییراتی که در پروسه
+    دیگری commit شده‌اند (پروسه ذخیره‌سازی در حالت چندپروسه‌ای) هم استفاده می‌شود.
+    """
+    for listener in _config_change_listeners:
+        try:
+            listener(copy_id_strs)
+        except Exception as e:
+            logger.error(f"Config change listener failed: {e}", exc_info=True)
+
 @contextmanager
 def get_db_session():
     """مدیریت session دیتابیس با commit/rollback خودکار."""
@@ -23,8 +50,12 @@ def get_db_session():
     try:
         yield db
         db.commit()
+        changed = db.info.pop("config_changed", None)
+        if changed:
+            notify_config_changed(changed)
     except Exception as e:
         logger.error(f"Database Error: {e}")
+        db.info.pop("config_changed", None)
         db.rollback()
         raise
     finally:
@@ -80,6 +111,7 @@ def delete_source_account(source_id: int) -> bool:
         if source_to_delete:
             source_name = source_to_delete.name
             source_str_id = source_to_delete.source_id_str
+            _mark_config_changed(db, *(m.copy_account.copy_id_str for m in source_to_delete.mappings if m.copy_account))
             db.delete(source_to_delete)
             logger.info(f"Source account '{source_name}' (ID: {source_id}, StrID: {source_str_id}) deleted successfully.", 
                         extra={'entity_id': source_id})
@@ -149,6 +181,7 @@ def add_copy_account(name: str, copy_id_str: str, dd_percent: float = 5.0, alert
         )
         db.add(new_settings)
         db.flush() # flush نهایی برای اطمینان از ذخیره settings
+        _mark_config_changed(db, copy_id_str)
         logger.info(f"New copy account '{name}' (ID Str: {copy_id_str}) added with settings (DD: {dd_percent}%, Alert: {alert_percent}%).",
                     extra={'entity_id': new_copy.id, 'details': {'name': name, 'copy_id_str': copy_id_str, 'dd': dd_percent}})
         # refresh برای بارگذاری رابطه settings (اختیاری، اگر نیاز به دسترسی فوری باشد)
@@ -166,6 +199,7 @@ def delete_copy_account(copy_id: int) -> bool:
             copy_name = copy_to_delete.name
             copy_str_id = copy_to_delete.copy_id_str
             db.delete(copy_to_delete)
+            _mark_config_changed(db, copy_str_id)
             # cascade حذف CopySettings و SourceCopyMapping را انجام می‌دهد
             logger.info(f"Copy account '{copy_name}' (ID: {copy_id}, StrID: {copy_str_id}) deleted successfully.",
                         extra={'entity_id': copy_id})
@@ -184,6 +218,7 @@ def update_copy_account_name(copy_id: int, new_name: str) -> CopyAccount | None:
         if copy_to_update:
             old_name = copy_to_update.name
             copy_to_update.name = new_name
+            _mark_config_changed(db, copy_to_update.copy_id_str)
             logger.info(f"Copy account name updated (ID: {copy_id}) from '{old_name}' to '{new_name}'.",
                         extra={'entity_id': copy_id, 'details': {'old_name': old_name, 'new_name': new_name}})
             return copy_to_update
@@ -229,6 +264,7 @@ def update_copy_settings(copy_id: int, settings_data: dict) -> bool:
         if settings_to_update:
             for key, value in update_values.items():
                 setattr(settings_to_update, key, value)
+            _mark_config_changed(db, settings_to_update.copy_account.copy_id_str)
             logger.info(f"Copy settings updated for ID {copy_id}.",
                         extra={'entity_id': copy_id, 'details': log_details})
             return True
@@ -306,7 +342,7 @@ def create_mapping_by_ids(copy_id: int, source_id: int, **kwargs) -> SourceCopyM
     """ایجاد اتصال جدید با استفاده از ID عددی کپی و منبع، با تنظیمات پیش‌فرض."""
     with get_db_session() as db:
         # بررسی وجود کپی و منبع
-        copy_exists = db.query(CopyAccount.id).filter(CopyAccount.id == copy_id).first()
+        copy_exists = db.query(CopyAccount.copy_id_str).filter(CopyAccount.id == copy_id).first()
         source_exists = db.query(SourceAccount.id).filter(SourceAccount.id == source_id).first()
         if not copy_exists or not source_exists:
             logger.error(f"Cannot create mapping: Copy (ID:{copy_id}) or Source (ID:{source_id}) not found.")
@@ -336,6 +372,7 @@ def create_mapping_by_ids(copy_id: int, source_id: int, **kwargs) -> SourceCopyM
         )
         db.add(new_mapping)
         db.flush()
+        _mark_config_changed(db, copy_exists.copy_id_str)
         logger.info(f"New mapping created between Copy ID {copy_id} and Source ID {source_id} (Mapping ID: {new_mapping.id}).")
         return new_mapping
 
@@ -346,6 +383,7 @@ def delete_mapping(mapping_id: int) -> bool:
         if mapping_to_delete:
             copy_id = mapping_to_delete.copy_account_id
             source_id = mapping_to_delete.source_account_id
+            _mark_config_changed(db, mapping_to_delete.copy_account.copy_id_str)
             db.delete(mapping_to_delete)
             logger.info(f"Mapping (ID: {mapping_id}) between Copy ID {copy_id} and Source ID {source_id} deleted successfully.",
                         extra={'entity_id': mapping_id})
@@ -407,6 +445,7 @@ def update_mapping_settings(mapping_id: int, settings_data: dict) -> bool:
         if mapping_to_update:
             for key, value in update_values.items():
                 setattr(mapping_to_update, key, value)
+            _mark_config_changed(db, mapping_to_update.copy_account.copy_id_str)
             logger.info(f"Mapping settings updated for ID {mapping_id}.",
                         extra={'entity_id': mapping_id, 'details': log_details})
             return True
@@ -445,6 +484,7 @@ def create_mapping(copy_id_str: str, source_id_str: str, volume_type: str, volum
         )
         db.add(new_mapping)
         db.flush()
+        _mark_config_changed(db, copy_account.copy_id_str)
         return new_mapping
 
 def get_full_status_report():
@@ -545,8 +585,11 @@ def get_statistics_summary(time_filter: str = "all") -> list[dict]:
         return summary_list
 
 
-def get_config_for_copy_ea(copy_id_str: str) -> dict:
-    """تهیه تنظیمات کامل برای اکسپرت کپی."""
+def get_config_for_copy_ea(copy_id_str: str, consume_reset: bool = True) -> dict:
+    """
+    تهیه تنظیمات کامل برای اکسپرت کپی.
+    reset_dd_flag یک‌بار مصرف است و فقط با consume_reset (پاسخ واقعی به اکسپرت) پاک می‌شود.
+    """
     config = {
         "copy_id_str": copy_id_str,
         "global_settings": {},
@@ -572,7 +615,7 @@ def get_config_for_copy_ea(copy_id_str: str) -> dict:
                 "alert_drawdown_percent": copy_account.settings.alert_drawdown_percent,
                 "reset_dd_flag": copy_account.settings.reset_dd_flag
             }
-            if copy_account.settings.reset_dd_flag:
+            if consume_reset and copy_account.settings.reset_dd_flag:
                 copy_account.settings.reset_dd_flag = False
         for mapping in copy_account.mappings:
             if mapping.is_enabled and mapping.source_account:
@@ -588,6 +631,29 @@ def get_config_for_copy_ea(copy_id_str: str) -> dict:
                 })
     return config
 
+def get_active_copy_id_strs() -> list[str]:
+    """لیست شناسه‌های تمام حساب‌های کپی فعال."""
+    with get_db_session() as db:
+        return [row[0] for row in db.query(CopyAccount.copy_id_str).filter(CopyAccount.is_active == True).all()]
+
+def get_routing_rows(copy_id_strs=None) -> list[tuple]:
+    """
+    ردیف‌های جدول مسیریابی سرور: (copy_id_str, source_id_str, copy_mode, allowed_symbols, volume_type,
+    volume_value, max_lot_size) برای اتصالات فعال حساب‌های کپی فعال (همان اتصالاتی که
+    get_config_for_copy_ea برمی‌گرداند). None یعنی همه حساب‌ها.
+    """
+    with get_db_session() as db:
+        query = db.query(CopyAccount.copy_id_str, SourceAccount.source_id_str,
+                         SourceCopyMapping.copy_mode, SourceCopyMapping.allowed_symbols,
+                         SourceCopyMapping.volume_type, SourceCopyMapping.volume_value,
+                         SourceCopyMapping.max_lot_size)\
+                  .join(SourceCopyMapping, SourceCopyMapping.copy_account_id == CopyAccount.id)\
+                  .join(SourceAccount, SourceCopyMapping.source_account_id == SourceAccount.id)\
+                  .filter(CopyAccount.is_active == True, SourceCopyMapping.is_enabled == True)
+        if copy_id_strs is not None:
+            query = query.filter(CopyAccount.copy_id_str.in_(list(copy_id_strs)))
+        return [tuple(row) for row in query.order_by(SourceCopyMapping.id).all()]
+
 def save_trade_history(copy_id_str: str, source_id_str: str, symbol: str, profit: float, source_ticket: int):
     """ذخیره تاریخچه معامله از اکسپرت کپی."""
     with get_db_session() as db:
@@ -605,6 +671,72 @@ def save_trade_history(copy_id_str: str, source_id_str: str, symbol: str, profit
         )
         db.add(new_trade)
 
+def is_transient_error(error: Exception) -> bool:
+    """آیا خطای دیتابیس گذرا است (قفل یا مشغول بودن SQLite) و تلاش مجدد همان تراکنش منطقی است."""
+    if not isinstance(error, sqlalchemy.exc.OperationalError):
+        return False
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+def save_trade_history_batch(records: list[dict]) -> tuple[int, list[dict]]:
+    """
+    ذخیره گروهی تاریخچه معاملات در یک تراکنش (group commit).
+    شناسه‌ها با دو کوئری IN برای کل دسته پیدا شده و ردیف‌ها با bulk insert درج می‌شوند.
+    اگر bulk insert به دلیل یک ردیف نامعتبر شکست بخورد، ردیف‌ها هر کدام در یک SAVEPOINT جداگانه درج
+    می‌شوند تا فقط ردیف معیوب کنار گذاشته شود. خطاهای گذرا (is_transient_error) به فراخوان برمی‌گردند.
+    (تعداد ردیف‌های ذخیره شده، ردیف‌های رد شده) را برمی‌گرداند.
+    """
+    if not records:
+        return 0, []
+    with get_db_session() as db:
+        copy_ids = dict(
+            db.query(CopyAccount.copy_id_str, CopyAccount.id)
+            .filter(CopyAccount.copy_id_str.in_({r["copy_id_str"] for r in records}))
+            .all()
+        )
+        source_ids = dict(
+            db.query(SourceAccount.source_id_str, SourceAccount.id)
+            .filter(SourceAccount.source_id_str.in_({r["source_id_str"] for r in records}))
+            .all()
+        )
+        rows, kept = [], []
+        for r in records:
+            copy_account_id = copy_ids.get(r["copy_id_str"])
+            if not copy_account_id:
+                logger.warning(f"Could not save history. Copy account '{r['copy_id_str']}' not found.")
+                continue
+            kept.append(r)
+            rows.append({
+                "timestamp": r.get("timestamp") or datetime.datetime.utcnow(),
+                "copy_account_id": copy_account_id,
+                "source_account_id": source_ids.get(r["source_id_str"]),
+                "symbol": r["symbol"],
+                "profit": r["profit"],
+                "source_ticket": r["source_ticket"],
+            })
+        if not rows:
+            return 0, []
+        try:
+            with db.begin_nested():
+                db.execute(TradeHistory.__table__.insert(), rows)
+            return len(rows), []
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            if is_transient_error(e):
+                raise
+            logger.warning(f"Bulk insert of trade history failed, retrying row by row: {e}")
+        failed = []
+        for record, row in zip(kept, rows):
+            try:
+                with db.begin_nested():
+                    db.execute(TradeHistory.__table__.insert(), [row])
+            except sqlalchemy.exc.SQLAlchemyError as e:
+                if is_transient_error(e):
+                    raise
+                logger.error(f"Discarding invalid trade history row for copy '{record['copy_id_str']}': {e}",
+                             extra={"details": {"row": record}})
+                failed.append(record)
+        return len(rows) - len(failed), failed
+
 if __name__ == "__main__":
     """تست عملکرد توابع دیتابیس."""
     logger.info("Initializing DB...")
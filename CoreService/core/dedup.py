@@ -0,0 +1,107 @@
+import collections
+import logging
+import os
+import re
+import time
+
+# حداکثر کلیدهای نگهداری شده و مدت اعتبار هر کلید (ثانیه)؛ حافظه مستقل از نرخ سیگنال ثابت می‌ماند
+DEDUP_CAPACITY = int(os.getenv("DEDUP_CAPACITY", "20000"))
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", "300"))
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+
+# رویدادهایی که deal_ticket یکتا دارند. TRADE_MODIFY شامل نمی‌شود چون اکسپرت سورس برای
+# همه اصلاحات یک پوزیشن، تیکت و زمان معامله ورودی را می‌فرستد و کلید آن یکتا نیست.
+DEDUP_EVENTS = ("TRADE_OPEN", "TRADE_CLOSE_MASTER", "TRADE_PARTIAL_CLOSE_MASTER")
+DEDUP_EVENTS_BYTES = frozenset(e.encode() for e in DEDUP_EVENTS)
+
+# بازه ابتدای پیام خام که فیلدهای کلید در آن جستجو می‌شوند. CJsonBuilder اکسپرت سورس
+# این فیلدها را همیشه با همین ترتیب و بدون فاصله می‌نویسد (SendTradeEvent)
+DEDUP_PEEK_BYTES = 256
+_KEY_FIELDS_RE = re.compile(
+    rb'"timestamp_ms":(\d+),"deal_ticket":(\d+),"order_ticket":\d+,"position_id":(\d+)[,}]'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def peek_signal_key(buf, event: bytes, source_id: bytes) -> tuple | None:
+    """ساخت کلید تکرار از پیام خام (بدون json.loads)؛ در صورت نیافتن فیلدها None."""
+    if event not in DEDUP_EVENTS_BYTES:
+        return None
+    match = _KEY_FIELDS_RE.search(buf, 0, DEDUP_PEEK_BYTES)
+    if match is None:
+        return None
+    timestamp, deal_ticket, position_id = match.groups()
+    return source_id, event, position_id, deal_ticket, timestamp
+
+
+def _as_key_part(value) -> bytes | None:
+    return str(value).encode("utf-8") if value is not None else None
+
+
+def signal_key(signal_data: dict) -> tuple | None:
+    """ساخت کلید تکرار از سیگنال پارس شده (هم‌شکل با peek_signal_key)."""
+    event = signal_data.get("event")
+    if event not in DEDUP_EVENTS:
+        return None
+    deal_ticket = signal_data.get("deal_ticket")
+    position_id = signal_data.get("position_id")
+    if deal_ticket is None or position_id is None:
+        return None
+    return (_as_key_part(signal_data.get("source_id_str") or ""), event.encode("ascii"),
+            _as_key_part(position_id), _as_key_part(deal_ticket), _as_key_part(signal_data.get("timestamp_ms")))
+
+
+class SignalDeduplicator:
+    """
+    ایندکس تکرار با حافظه محدود: LRU با سقف ثابت و مدت اعتبار.
+    بررسی و ثبت هر کلید O(1) است؛ با رسیدن به سقف، قدیمی‌ترین کلید حذف می‌شود.
+    """
+    def __init__(self, capacity: int = DEDUP_CAPACITY, window: float = DEDUP_WINDOW):
+        self.capacity = max(1, capacity)
+        self.window = window
+        self._seen: collections.OrderedDict = collections.OrderedDict()
+        self.checked = 0
+        self.duplicates: dict[bytes, int] = {}
+
+    def is_duplicate(self, key: tuple, now: float | None = None) -> bool:
+        """اگر کلید در پنجره اخیر دیده شده True، در غیر این صورت آن را ثبت کرده و False برمی‌گرداند."""
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        seen = self._seen
+        first_seen = seen.get(key)
+        if first_seen is not None:
+            if now - first_seen < self.window:
+                source = key[0]
+                self.duplicates[source] = self.duplicates.get(source, 0) + 1
+                return True
+            seen.move_to_end(key)
+        seen[key] = now
+        # کلیدهای منقضی تنها با فشار سقف حذف می‌شوند؛ حافظه هرگز از capacity بیشتر نمی‌شود
+        if len(seen) > self.capacity:
+            seen.popitem(last=False)
+        return False
+
+    def seed(self, key: tuple, first_seen: float | None = None):
+        """
+        ثبت کلید بدون شمارش تکرار (بازسازی ایندکس از ژورنال هنگام راه‌اندازی).
+        first_seen زمان monotonic اولین دریافت است؛ کلید موجود با زمان قبلی‌اش باقی می‌ماند.
+        """
+        seen = self._seen
+        if key in seen:
+            return
+        seen[key] = time.monotonic() if first_seen is None else first_seen
+        if len(seen) > self.capacity:
+            seen.popitem(last=False)
+
+    def duplicates_by_source(self) -> dict[str, int]:
+        return {source.decode("utf-8", "replace"): n for source, n in self.duplicates.items()}
+
+    def get_stats(self) -> dict:
+        """آمار ایندکس تکرار و تعداد تکراری‌های دور ریخته شده به تفکیک سورس."""
+        return {
+            "entries": len(self._seen),
+            "capacity": self.capacity,
+            "checked": self.checked,
+            "duplicates_by_source": self.duplicates_by_source(),
+        }
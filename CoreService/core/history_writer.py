@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from . import database
+from .latency import LatencyRecorder
+from . import metrics
+
+# هر دسته حداکثر چند ردیف و حداکثر چند میلی‌ثانیه منتظر پر شدن می‌ماند
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+HISTORY_FLUSH_MS = int(os.getenv("HISTORY_FLUSH_MS", "50"))
+# سقف گزارش‌های در انتظار ذخیره (حافظه محدود؛ در صورت پر شدن، ارسال‌کننده منتظر می‌ماند)
+HISTORY_MAX_PENDING = int(os.getenv("HISTORY_MAX_PENDING", "10000"))
+# تلاش مجدد دسته در خطاهای گذرا (database is locked) با فاصله نمایی از HISTORY_RETRY_BACKOFF_MS
+HISTORY_RETRY_ATTEMPTS = int(os.getenv("HISTORY_RETRY_ATTEMPTS", "5"))
+HISTORY_RETRY_BACKOFF_MS = int(os.getenv("HISTORY_RETRY_BACKOFF_MS", "50"))
+
+logger = logging.getLogger(__name__)
+
+
+class TradeHistoryWriter:
+    """
+    بافر write-behind برای گزارش‌های TRADE_CLOSED_COPY.
+    گزارش‌ها در صف محدود جمع شده و هر N ردیف یا T میلی‌ثانیه در یک تراکنش
+    واحد (group commit) با bulk insert در دیتابیس نوشته می‌شوند.
+    """
+    def __init__(self, alert_queue: asyncio.Queue = None,
+                 latency: LatencyRecorder | None = None,
+                 batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval_ms: int = HISTORY_FLUSH_MS,
+                 max_pending: int = HISTORY_MAX_PENDING):
+        self.alert_queue = alert_queue
+        self.latency = latency
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.rows_failed = 0
+        self.batches_written = 0
+
+    async def submit(self, copy_id_str: str, source_id_str: str, symbol: str, profit: float, source_ticket: int,
+                     received_at: float | None = None, timestamp: datetime.datetime | None = None):
+        """افزودن یک گزارش به بافر (زمان ثبت، در صورت عدم تعیین، همان لحظه دریافت است)."""
+        await self._queue.put({
+            "received_at": received_at,
+            "copy_id_str": copy_id_str,
+            "source_id_str": source_id_str,
+            "symbol": symbol,
+            "profit": profit,
+            "source_ticket": source_ticket,
+            "timestamp": timestamp or datetime.datetime.utcnow(),
+        })
+
+    def pending(self) -> int:
+        """تعداد گزارش‌های در انتظار ذخیره."""
+        return self._queue.qsize()
+
+    def get_stats(self) -> dict:
+        """آمار عملکرد بافر ذخیره تاریخچه."""
+        return {
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "rows_skipped": self.rows_skipped,
+            "rows_failed": self.rows_failed,
+            "batches_written": self.batches_written,
+        }
+
+    def _drain_nowait(self, batch: list, limit: int | None = None):
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _collect_batch(self, batch: list):
+        """جمع‌آوری یک دسته تا رسیدن به اندازه یا پایان پنجره زمانی."""
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            self._drain_nowait(batch, self.batch_size)
+            timeout = deadline - loop.time()
+            if len(batch) >= self.batch_size or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _save(self, batch: list) -> tuple[int, list]:
+        """ذخیره دسته در ترد جداگانه با تلاش مجدد خطاهای گذرا (فاصله نمایی)."""
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                return await asyncio.to_thread(database.save_trade_history_batch, batch)
+            except Exception as db_e:
+                if attempt >= HISTORY_RETRY_ATTEMPTS or not database.is_transient_error(db_e):
+                    raise
+                delay = HISTORY_RETRY_BACKOFF_MS / 1000.0 * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"Transient DB error saving trade history batch, retry {attempt} in {delay * 1000:.0f}ms: {db_e}",
+                               extra={"details": {"batch_size": len(batch), "attempt": attempt}})
+                await asyncio.sleep(delay)
+            finally:
+                metrics.DB_CALL_SECONDS.observe(time.perf_counter() - started, operation="save_trade_history_batch")
+
+    async def _flush(self, batch: list):
+        """نوشتن یک دسته در یک تراکنش؛ فقط ردیف‌های معیوب کنار گذاشته می‌شوند."""
+        try:
+            written, failed = await self._save(batch)
+            self.rows_written += written
+            self.rows_failed += len(failed)
+            self.rows_skipped += len(batch) - written - len(failed)
+            self.batches_written += 1
+            if self.latency is not None:
+                committed_at = time.perf_counter()
+                for row in batch:
+                    if row.get("received_at") is not None:
+                        self.latency.record("db_commit", "TRADE_CLOSED_COPY", row["copy_id_str"],
+                                            committed_at - row["received_at"])
+            logger.info(f"Trade history batch saved to DB ({written}/{len(batch)} rows).",
+                        extra={"details": {"batch_size": len(batch), "written": written, "failed": len(failed)}})
+            if failed and self.alert_queue:
+                await self.alert_queue.put(
+                    f"⚠️ *خطای دیتابیس*\n\n `{len(failed)}` رکورد نامعتبر تاریخچه معامله ذخیره نشد. جزئیات در لاگ سرور."
+                )
+        except Exception as db_e:
+            self.rows_failed += len(batch)
+            logger.error(f"Critical DB error saving trade history batch: {db_e}", exc_info=True,
+                         extra={"details": {"batch_size": len(batch), "rows": batch}})
+            if self.alert_queue:
+                await self.alert_queue.put(
+                    f"🚨 *خطای شدید دیتابیس*\n\n عدم موفقیت در ذخیره `{len(batch)}` رکورد تاریخچه معامله. جزئیات در لاگ سرور."
+                )
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    async def run(self):
+        """حلقه اصلی group commit؛ هنگام خاموش شدن باقی‌مانده بافر را ذخیره می‌کند."""
+        logger.info(f"Trade history writer started (batch={self.batch_size}, flush={self.flush_interval * 1000:.0f}ms).")
+        batch = []
+        try:
+            while True:
+                await self._collect_batch(batch)
+                current, batch = batch, []
+                await self._flush(current)
+        except asyncio.CancelledError:
+            self._drain_nowait(batch)
+            if batch:
+                logger.info(f"Flushing {len(batch)} pending trade history rows on shutdown...")
+                await self._flush(batch)
+            raise
@@ -0,0 +1,226 @@
+import asyncio
+import datetime
+import logging
+import os
+import platform
+import time
+import zmq
+import zmq.asyncio
+from . import database
+
+# پل‌های ارتباطی بین پروسه‌ها در حالت چندپروسه‌ای (موتور ZMQ، ربات تلگرام، ذخیره‌سازی دیتابیس)
+# ویندوز از ipc:// پشتیبانی مطمئنی ندارد و به جای آن از loopback استفاده می‌شود
+_DEFAULT_IPC_BASE = "tcp://127.0.0.1:56" if platform.system() == "Windows" else "ipc:///tmp/tradecopier-"
+IPC_BASE = os.getenv("IPC_BASE", _DEFAULT_IPC_BASE)
+_TCP_PORT_SUFFIX = {"alerts": "01", "config": "02", "status": "03", "history": "04"}
+
+# فاصله دریافت وضعیت اکسپرت‌ها از موتور توسط ربات و مهلت پاسخ (ثانیه)
+FLEET_POLL_INTERVAL = float(os.getenv("FLEET_POLL_INTERVAL", "5"))
+STATUS_TIMEOUT_MS = 2000
+# سقف پیام‌های در صف هر سوکت PUSH (پس از آن ارسال‌کننده منتظر می‌ماند)
+IPC_HWM = int(os.getenv("IPC_HWM", "10000"))
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint(name: str) -> str:
+    """آدرس کانال داخلی name ("alerts"، "config"، "status"، "history")."""
+    if IPC_BASE.startswith("tcp://"):
+        return f"{IPC_BASE}{_TCP_PORT_SUFFIX[name]}"
+    return f"{IPC_BASE}{name}"
+
+
+def _push_socket(context: zmq.asyncio.Context, name: str):
+    socket = context.socket(zmq.PUSH)
+    socket.setsockopt(zmq.SNDHWM, IPC_HWM)
+    socket.setsockopt(zmq.LINGER, 1000)
+    socket.connect(endpoint(name))
+    return socket
+
+
+async def forward_alerts(queue: asyncio.Queue, context: zmq.asyncio.Context | None = None):
+    """ارسال هشدارهای صف محلی پروسه به پروسه ربات تلگرام."""
+    context = context or zmq.asyncio.Context.instance()
+    socket = _push_socket(context, "alerts")
+    logger.info(f"Alert forwarder connected to {endpoint('alerts')}.")
+    try:
+        while True:
+            message = await queue.get()
+            try:
+                await socket.send_string(message)
+            finally:
+                queue.task_done()
+    finally:
+        socket.close()
+
+
+async def receive_alerts(queue: asyncio.Queue, context: zmq.asyncio.Context | None = None):
+    """دریافت هشدار از سایر پروسه‌ها و قرار دادن آن در صف ارسال ربات."""
+    context = context or zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.PULL)
+    socket.bind(endpoint("alerts"))
+    logger.info(f"Alert receiver listening on {endpoint('alerts')}.")
+    try:
+        while True:
+            await queue.put(await socket.recv_string())
+    finally:
+        socket.close(0)
+
+
+class ConfigChangeForwarder:
+    """
+    شنونده تغییرات تنظیمات در پروسه ربات: copy_id_strهای متاثر را برای موتور ZMQ می‌فرستد
+    تا کش تنظیمات باطل و اعلان CFG| منتشر شود. ممکن است از ترد دیگری فراخوانی شود.
+    """
+    def __init__(self, context: zmq.asyncio.Context | None = None):
+        self.context = context or zmq.asyncio.Context.instance()
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def __call__(self, copy_id_strs: set):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, sorted(copy_id_strs))
+
+    async def run(self):
+        socket = _push_socket(self.context, "config")
+        try:
+            while True:
+                copy_id_strs = await self._queue.get()
+                await socket.send_json(copy_id_strs)
+        finally:
+            socket.close()
+
+
+async def receive_config_changes(context: zmq.asyncio.Context | None = None):
+    """دریافت تغییرات تنظیمات از پروسه ربات و اجرای شنونده‌های محلی (کش، اعلان CFG|)."""
+    context = context or zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.PULL)
+    socket.bind(endpoint("config"))
+    logger.info(f"Config change receiver listening on {endpoint('config')}.")
+    try:
+        while True:
+            copy_id_strs = await socket.recv_json()
+            database.notify_config_changed(set(copy_id_strs))
+    finally:
+        socket.close(0)
+
+
+async def serve_status(handlers: dict, context: zmq.asyncio.Context | None = None):
+    """پاسخ به درخواست‌های وضعیت سایر پروسه‌ها؛ handlers نام درخواست را به تابع بدون آرگومان نگاشت می‌کند."""
+    context = context or zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.REP)
+    socket.bind(endpoint("status"))
+    logger.info(f"Status responder listening on {endpoint('status')}.")
+    try:
+        while True:
+            request = (await socket.recv()).decode("utf-8", "replace")
+            handler = handlers.get(request)
+            try:
+                reply = {"status": "OK", "data": handler()} if handler else {"status": "ERROR", "message": "unknown request"}
+            except Exception as e:
+                logger.error(f"Status handler '{request}' failed: {e}", exc_info=True)
+                reply = {"status": "ERROR", "message": str(e)}
+            await socket.send_json(reply)
+    finally:
+        socket.close(0)
+
+
+class RemoteFleetStatus:
+    """
+    جایگزین رجیستری زنده بودن در پروسه ربات: وضعیت اکسپرت‌ها را به صورت دوره‌ای از موتور
+    دریافت کرده و همان خروجی snapshot() را (با اصلاح زمان آخرین پیام) برمی‌گرداند.
+    """
+    def __init__(self, context: zmq.asyncio.Context | None = None, interval: float = FLEET_POLL_INTERVAL):
+        self.context = context or zmq.asyncio.Context.instance()
+        self.interval = interval
+        self._fleet: list[dict] = []
+        self._fetched_at = time.monotonic()
+
+    def snapshot(self) -> list[dict]:
+        age = time.monotonic() - self._fetched_at
+        return [dict(ea, last_seen_sec=ea["last_seen_sec"] + age) for ea in self._fleet]
+
+    async def _fetch(self, socket) -> bool:
+        await socket.send(b"fleet")
+        if not await socket.poll(STATUS_TIMEOUT_MS):
+            return False
+        reply = await socket.recv_json()
+        if reply.get("status") == "OK":
+            self._fleet = reply["data"]
+            self._fetched_at = time.monotonic()
+        return True
+
+    async def run(self):
+        socket = None
+        try:
+            while True:
+                if socket is None:
+                    socket = self.context.socket(zmq.REQ)
+                    socket.setsockopt(zmq.LINGER, 0)
+                    socket.connect(endpoint("status"))
+                if not await self._fetch(socket):
+                    # سوکت REQ پس از بی‌پاسخ ماندن قابل استفاده نیست و از نو ساخته می‌شود
+                    logger.warning("Engine did not answer fleet status request.")
+                    socket.close(0)
+                    socket = None
+                await asyncio.sleep(self.interval)
+        finally:
+            if socket is not None:
+                socket.close(0)
+
+
+class RemoteHistoryWriter:
+    """
+    جایگزین TradeHistoryWriter در پروسه موتور: گزارش‌ها به پروسه ذخیره‌سازی ارسال می‌شوند
+    و group commit دیتابیس آنجا انجام می‌شود (با همان رابط submit/pending/get_stats/run).
+    """
+    def __init__(self, context: zmq.asyncio.Context | None = None):
+        self.context = context or zmq.asyncio.Context.instance()
+        self._socket = _push_socket(self.context, "history")
+        self.rows_sent = 0
+
+    async def submit(self, copy_id_str: str, source_id_str: str, symbol: str, profit: float, source_ticket: int,
+                     received_at: float | None = None):
+        """ارسال یک گزارش به پروسه ذخیره‌سازی (زمان ثبت همان لحظه دریافت است)."""
+        await self._socket.send_json({
+            "copy_id_str": copy_id_str,
+            "source_id_str": source_id_str,
+            "symbol": symbol,
+            "profit": profit,
+            "source_ticket": source_ticket,
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+        })
+        self.rows_sent += 1
+
+    def pending(self) -> int:
+        return 0
+
+    def get_stats(self) -> dict:
+        return {"pending": 0, "rows_sent": self.rows_sent}
+
+    async def run(self):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._socket.close()
+
+
+async def receive_history(writer, context: zmq.asyncio.Context | None = None):
+    """دریافت گزارش‌های تاریخچه از موتور و سپردن آن‌ها به TradeHistoryWriter محلی."""
+    context = context or zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.PULL)
+    socket.setsockopt(zmq.RCVHWM, IPC_HWM)
+    socket.bind(endpoint("history"))
+    logger.info(f"History receiver listening on {endpoint('history')}.")
+    try:
+        while True:
+            row = await socket.recv_json()
+            await writer.submit(
+                copy_id_str=row["copy_id_str"],
+                source_id_str=row["source_id_str"],
+                symbol=row["symbol"],
+                profit=row["profit"],
+                source_ticket=row["source_ticket"],
+                timestamp=datetime.datetime.fromisoformat(row["timestamp"]),
+            )
+    finally:
+        socket.close(0)
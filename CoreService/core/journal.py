@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+# ژورنال append-only سیگنال‌های مستر روی سگمنت‌های memory-mapped
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "1") == "1"
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "signal_journal")
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+# [بهبود عملکرد] fsync دسته‌ای: دیسک حداکثر هر چند میلی‌ثانیه یک بار همگام می‌شود
+JOURNAL_FSYNC_MS = int(os.getenv("JOURNAL_FSYNC_MS", "20"))
+# سیاست نگهداری: حجم کل و عمر سگمنت‌های بسته شده
+JOURNAL_MAX_BYTES = int(os.getenv("JOURNAL_MAX_BYTES", str(512 * 1024 * 1024)))
+JOURNAL_MAX_AGE_HOURS = float(os.getenv("JOURNAL_MAX_AGE_HOURS", "72"))
+# فاصله (ثانیه) اعمال دوره‌ای سیاست نگهداری، مستقل از پر شدن سگمنت فعال (در ترافیک کم ممکن است روزها طول بکشد)
+JOURNAL_RETENTION_INTERVAL = float(os.getenv("JOURNAL_RETENTION_INTERVAL", "60"))
+
+# انواع رکورد
+KIND_ACCEPTED = 1   # سیگنال پذیرفته شده که هنوز منتشر نشده (فریم خام)
+KIND_PUBLISHED = 2  # پیام منتشر شده (با seq)؛ ref به رکورد ACCEPTED مربوطه اشاره می‌کند
+KIND_SKIPPED = 3    # سیگنالی که مشترک زنده یا حساب مقصدی نداشت و منتشر نشد؛ با ref بدنه خالی است، بدون آن فریم خام
+KIND_ROUTED = 4     # یک سیگنال مسیریابی شده (ROUTED_TOPICS) برای همه کپی‌ها: خط سرآیند JSON و سپس بدنه بدون seq
+# رکوردهایی که ref آن‌ها رکورد ACCEPTED را تعیین تکلیف می‌کند (منتشر یا رد شده)
+RESOLVING_KINDS = (KIND_PUBLISHED, KIND_SKIPPED, KIND_ROUTED)
+
+# body_len, crc32(body), index, ref, timestamp, kind, topic_len
+_HEADER = struct.Struct("<IIQQdBH")
+_SEGMENT_SUFFIX = ".seg"
+
+logger = logging.getLogger(__name__)
+
+
+def encode_routed(epoch: int, routes: list, body: bytes) -> bytes:
+    """
+    بدنه رکورد KIND_ROUTED؛ routes لیست [تاپیک کپی، seq، اندیس مسیر، حجم قالب‌بندی شده یا null] است
+    تا پیام مهر شده هر کپی هنگام بازپخش دقیقاً بازسازی شود.
+    """
+    header = json.dumps({"seq_epoch": epoch, "routes": routes}, separators=(",", ":")).encode("utf-8")
+    return b"%s\n%s" % (header, body)
+
+
+def decode_routed(payload: bytes) -> tuple[dict, bytes]:
+    """جدا کردن سرآیند (seq_epoch، routes) و بدنه سیگنال رکورد KIND_ROUTED."""
+    header, _, body = payload.partition(b"\n")
+    return json.loads(header), body
+
+
+class JournalRecord:
+    __slots__ = ("index", "ref", "timestamp", "kind", "topic", "payload")
+
+    def __init__(self, index: int, ref: int, timestamp: float, kind: int, topic: bytes, payload: bytes):
+        self.index = index
+        self.ref = ref
+        self.timestamp = timestamp
+        self.kind = kind
+        self.topic = topic
+        self.payload = payload
+
+
+class _Segment:
+    __slots__ = ("path", "file", "mm", "size", "position", "synced")
+
+    def __init__(self, path: str, size: int, position: int = 0):
+        self.path = path
+        self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        if os.fstat(self.file.fileno()).st_size < size:
+            self.file.truncate(size)
+        self.size = size
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.position = position
+        self.synced = position
+
+    def sync(self):
+        """همگام‌سازی بازه نوشته شده از آخرین fsync (شروع هم‌تراز با صفحه)."""
+        end = self.position
+        if end <= self.synced:
+            return
+        start = self.synced - (self.synced % mmap.ALLOCATIONGRANULARITY)
+        self.mm.flush(start, end - start)
+        self.synced = end
+
+    def close(self):
+        self.sync()
+        self.mm.close()
+        self.file.close()
+
+
+def _segment_paths(directory: str) -> list[str]:
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.endswith(_SEGMENT_SUFFIX))
+    return [os.path.join(directory, n) for n in names]
+
+
+def _scan_segment(path: str):
+    """خواندن ترتیبی رکوردهای معتبر یک سگمنت؛ در اولین رکورد خالی یا خراب متوقف می‌شود."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = 0
+            while position + _HEADER.size <= size:
+                body_len, crc, index, ref, timestamp, kind, topic_len = _HEADER.unpack_from(mm, position)
+                if body_len == 0:
+                    return
+                body_start = position + _HEADER.size
+                body_end = body_start + body_len
+                if body_end > size or topic_len > body_len:
+                    return
+                body = mm[body_start:body_end]
+                if zlib.crc32(body) != crc:
+                    logger.warning(f"Corrupt journal record at {path}:{position}, stopping scan.")
+                    return
+                yield position, JournalRecord(index, ref, timestamp, kind, body[:topic_len], body[topic_len:])
+                position = body_end
+
+
+def read_journal(directory: str = JOURNAL_DIR):
+    """پیمایش ترتیبی همه رکوردهای ژورنال (برای بازپخش هنگام راه‌اندازی و بررسی آفلاین)."""
+    for path in _segment_paths(directory):
+        for _, record in _scan_segment(path):
+            yield record
+
+
+class SignalJournal:
+    """
+    ژورنال append-only و سگمنت‌بندی شده روی فایل‌های memory-mapped.
+    نوشتن هر رکورد فقط یک کپی در حافظه نگاشت شده است و روی حلقه asyncio انجام می‌شود؛
+    همگام‌سازی با دیسک (msync) به صورت دسته‌ای در یک ترد پس‌زمینه اجرا می‌شود.
+    """
+    def __init__(self, directory: str = JOURNAL_DIR, segment_bytes: int = JOURNAL_SEGMENT_BYTES,
+                 fsync_ms: int = JOURNAL_FSYNC_MS, max_bytes: int = JOURNAL_MAX_BYTES,
+                 max_age_hours: float = JOURNAL_MAX_AGE_HOURS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_ms / 1000.0
+        self.max_bytes = max_bytes
+        self.max_age = max_age_hours * 3600
+        self._lock = threading.Lock()
+        # از همپوشانی sync در ترد پس‌زمینه با بستن فایل‌ها جلوگیری می‌کند
+        self._sync_lock = threading.Lock()
+        self._sealed: list[_Segment] = []
+        self._active: _Segment | None = None
+        self.next_index = 1
+        self.appended = 0
+        self.syncs = 0
+        self.segments_removed = 0
+
+    def open(self, horizon: float | None = None, on_expired=None) -> list[JournalRecord]:
+        """
+        باز کردن ژورنال و برگرداندن رکوردهای موجود (ترتیبی) برای بازپخش.
+        ابتدا سیاست نگهداری اعمال می‌شود؛ رکوردهای قدیمی‌تر از horizon (زمان یونیکس) در حافظه نگه داشته
+        نمی‌شوند و فقط (در صورت تعیین) به on_expired داده می‌شوند.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.enforce_retention()
+        records = []
+        expired = 0
+        last_index = 0
+        last_path, last_end = None, 0
+        for path in _segment_paths(self.directory):
+            end = 0
+            for position, record in _scan_segment(path):
+                last_index = record.index
+                end = position + _HEADER.size + len(record.topic) + len(record.payload)
+                if horizon is not None and record.timestamp < horizon:
+                    expired += 1
+                    if on_expired is not None:
+                        on_expired(record)
+                    continue
+                records.append(record)
+            last_path, last_end = path, end
+        if last_index:
+            self.next_index = last_index + 1
+        if last_path is not None and last_end + _HEADER.size < self.segment_bytes:
+            # ادامه نوشتن در آخرین سگمنت
+            self._active = _Segment(last_path, max(self.segment_bytes, os.path.getsize(last_path)), last_end)
+        else:
+            self._roll()
+        logger.info(f"Signal journal opened ({len(records)} records loaded, {expired} older than horizon, "
+                    f"next index {self.next_index}).",
+                    extra={"details": {"directory": self.directory}})
+        return records
+
+    def _roll(self):
+        if self._active is not None:
+            with self._lock:
+                self._sealed.append(self._active)
+        path = os.path.join(self.directory, f"{self.next_index:020d}{_SEGMENT_SUFFIX}")
+        self._active = _Segment(path, self.segment_bytes)
+
+    def append(self, kind: int, topic: bytes, payload, ref: int = 0) -> int:
+        """افزودن یک رکورد و برگرداندن شماره آن."""
+        payload = bytes(payload)
+        body_len = len(topic) + len(payload)
+        record_len = _HEADER.size + body_len
+        if record_len > self.segment_bytes:
+            raise ValueError("Journal record larger than segment size")
+        segment = self._active
+        if segment.position + record_len > segment.size:
+            self._roll()
+            segment = self._active
+        index = self.next_index
+        self.next_index += 1
+        position = segment.position
+        body_start = position + _HEADER.size
+        mm = segment.mm
+        mm[body_start:body_start + len(topic)] = topic
+        mm[body_start + len(topic):body_start + body_len] = payload
+        crc = zlib.crc32(payload, zlib.crc32(topic))
+        # هدر آخر نوشته می‌شود تا رکورد نیمه‌کاره هرگز معتبر دیده نشود
+        _HEADER.pack_into(mm, position, body_len, crc, index, ref, time.time(), kind, len(topic))
+        segment.position = body_start + body_len
+        self.appended += 1
+        return index
+
+    def sync(self, retention: bool = False):
+        """
+        همگام‌سازی سگمنت‌های بسته شده و فعال با دیسک (در ترد پس‌زمینه صدا زده شود).
+        سیاست نگهداری پس از بسته شدن سگمنت یا با retention (زمان‌بندی دوره‌ای run) اعمال می‌شود.
+        """
+        with self._sync_lock:
+            with self._lock:
+                sealed, self._sealed = self._sealed, []
+            for segment in sealed:
+                segment.close()
+            if self._active is not None:
+                self._active.sync()
+            self.syncs += 1
+            if sealed or retention:
+                self.enforce_retention()
+
+    def enforce_retention(self):
+        """حذف قدیمی‌ترین سگمنت‌ها تا رعایت سقف حجم و عمر (سگمنت فعال هرگز حذف نمی‌شود)."""
+        active_path = self._active.path if self._active is not None else None
+        paths = [p for p in _segment_paths(self.directory) if p != active_path]
+        total = sum(os.path.getsize(p) for p in paths) + (self.segment_bytes if active_path else 0)
+        now = time.time()
+        for path in paths:
+            if total <= self.max_bytes and now - os.path.getmtime(path) <= self.max_age:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                total -= size
+                self.segments_removed += 1
+                logger.info(f"Journal segment removed by retention policy: {os.path.basename(path)}")
+            except OSError as e:
+                logger.error(f"Failed to remove journal segment {path}: {e}")
+
+    def close(self):
+        self.sync()
+        with self._sync_lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+
+    def get_stats(self) -> dict:
+        """آمار ژورنال."""
+        return {
+            "next_index": self.next_index,
+            "appended": self.appended,
+            "syncs": self.syncs,
+            "segments_removed": self.segments_removed,
+            "active_segment": os.path.basename(self._active.path) if self._active else None,
+        }
+
+    async def run(self):
+        """حلقه fsync دسته‌ای؛ هنگام خاموش شدن باقی‌مانده را همگام کرده و فایل‌ها را می‌بندد."""
+        logger.info(f"Signal journal sync loop started (every {self.fsync_interval * 1000:.0f}ms).")
+        synced_index = self.next_index
+        loop = asyncio.get_running_loop()
+        next_retention = loop.time() + JOURNAL_RETENTION_INTERVAL
+        try:
+            while True:
+                await asyncio.sleep(self.fsync_interval)
+                retention = loop.time() >= next_retention
+                if self.next_index != synced_index or self._sealed or retention:
+                    synced_index = self.next_index
+                    await asyncio.to_thread(self.sync, retention)
+                    if retention:
+                        next_retention = loop.time() + JOURNAL_RETENTION_INTERVAL
+        except asyncio.CancelledError:
+            self.close()
+            raise
+
+
+def _inspect(args):
+    kinds = {KIND_ACCEPTED: "ACCEPTED", KIND_PUBLISHED: "PUBLISHED", KIND_SKIPPED: "SKIPPED", KIND_ROUTED: "ROUTED"}
+    records = [r for r in read_journal(args.directory)
+               if args.topic is None or r.topic.decode("utf-8", "replace") == args.topic]
+    resolved_refs = {r.ref for r in records if r.kind in RESOLVING_KINDS and r.ref}
+    pending = [r for r in records if r.kind == KIND_ACCEPTED and r.index not in resolved_refs]
+    print(f"segments: {len(_segment_paths(args.directory))}  records: {len(records)}  "
+          f"unpublished accepted: {len(pending)}")
+    for r in (pending if args.pending else records)[-args.tail:]:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r.timestamp))
+        print(f"#{r.index:<8} {stamp} {kinds.get(r.kind, r.kind):<9} ref={r.ref:<8} "
+              f"{r.topic.decode('utf-8', 'replace')}: {r.payload.decode('utf-8', 'replace')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="بررسی آفلاین ژورنال سیگنال‌ها")
+    parser.add_argument("directory", nargs="?", default=JOURNAL_DIR)
+    parser.add_argument("--tail", type=int, default=20, help="تعداد رکوردهای آخر برای نمایش")
+    parser.add_argument("--topic", help="فقط رکوردهای یک سورس")
+    parser.add_argument("--pending", action="store_true", help="فقط سیگنال‌های پذیرفته شده‌ای که منتشر نشده‌اند")
+    _inspect(parser.parse_args())
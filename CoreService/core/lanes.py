@@ -0,0 +1,158 @@
+import asyncio
+import collections
+
+# سیاست‌های هر خط هنگام پر شدن ظرفیت
+POLICY_BLOCK = "block"        # ارسال‌کننده منتظر خالی شدن جا می‌ماند (هیچ آیتمی از دست نمی‌رود)
+POLICY_DROP = "drop"          # آیتم جدید دور ریخته و شمرده می‌شود
+POLICY_COALESCE = "coalesce"  # آیتم هم‌کلید در انتظار با نسخه جدید جایگزین می‌شود؛ در غیر این صورت مثل drop
+POLICIES = (POLICY_BLOCK, POLICY_DROP, POLICY_COALESCE)
+
+
+class _Lane:
+    __slots__ = ("name", "capacity", "policy", "items", "index", "putters",
+                 "enqueued", "shed", "coalesced", "peak_depth")
+
+    def __init__(self, name: str, capacity: int, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown lane policy: {policy}")
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        # هر خانه لیست [item, key] است تا جایگزینی coalesce در همان جایگاه صف انجام شود
+        self.items: collections.deque = collections.deque()
+        self.index: dict = {}
+        self.putters: collections.deque = collections.deque()
+        self.enqueued = 0
+        self.shed = 0
+        self.coalesced = 0
+        self.peak_depth = 0
+
+
+class LaneQueue:
+    """
+    صف چندخطی با اولویت ثابت: get همیشه از بالاترین خط غیرخالی برمی‌دارد.
+    هر خط ظرفیت و سیاست پر شدن مستقل دارد، بنابراین سیل heartbeat یا خطاهای
+    تشخیصی نمی‌تواند سیگنال‌های معاملاتی را معطل یا ورودی را مسدود کند.
+    رابط qsize/get/task_done/join مشابه asyncio.Queue است.
+    """
+    def __init__(self, lanes: list[tuple[str, int, str]]):
+        # ترتیب لیست همان ترتیب اولویت است
+        self._lanes = [_Lane(name, capacity, policy) for name, capacity, policy in lanes]
+        self._by_name = {lane.name: lane for lane in self._lanes}
+        self._getters: collections.deque = collections.deque()
+        self._size = 0
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    @property
+    def maxsize(self) -> int:
+        return sum(lane.capacity for lane in self._lanes)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    @staticmethod
+    def _wake_one(waiters: collections.deque):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def put(self, item, lane_name: str, key=None) -> bool:
+        """
+        افزودن آیتم به یک خط. در صورت دور ریخته شدن False برمی‌گرداند.
+        key فقط برای خطوط coalesce معنا دارد (None یعنی قابل ادغام نیست).
+        """
+        lane = self._by_name[lane_name]
+        if lane.policy == POLICY_COALESCE and key is not None:
+            slot = lane.index.get(key)
+            if slot is not None:
+                slot[0] = item
+                lane.coalesced += 1
+                return True
+        if len(lane.items) >= lane.capacity:
+            if lane.policy != POLICY_BLOCK:
+                lane.shed += 1
+                return False
+            while len(lane.items) >= lane.capacity:
+                waiter = asyncio.get_running_loop().create_future()
+                lane.putters.append(waiter)
+                try:
+                    await waiter
+                except BaseException:
+                    waiter.cancel()
+                    # اگر این منتظر بیدار شده بود، نوبت را به بعدی بدهد
+                    if len(lane.items) < lane.capacity:
+                        self._wake_one(lane.putters)
+                    raise
+        slot = [item, key]
+        lane.items.append(slot)
+        if lane.policy == POLICY_COALESCE and key is not None:
+            lane.index[key] = slot
+        lane.enqueued += 1
+        if len(lane.items) > lane.peak_depth:
+            lane.peak_depth = len(lane.items)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._wake_one(self._getters)
+        return True
+
+    def _pop(self):
+        for lane in self._lanes:
+            if lane.items:
+                slot = lane.items.popleft()
+                key = slot[1]
+                if key is not None and lane.index.get(key) is slot:
+                    del lane.index[key]
+                self._size -= 1
+                self._wake_one(lane.putters)
+                return slot[0]
+        raise asyncio.QueueEmpty
+
+    def get_nowait(self):
+        return self._pop()
+
+    async def get(self):
+        """برداشتن آیتم از بالاترین خط اولویت غیرخالی."""
+        while not self._size:
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                if self._size:
+                    self._wake_one(self._getters)
+                raise
+        return self._pop()
+
+    def task_done(self):
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def get_stats(self) -> dict:
+        """آمار هر خط: عمق، اوج، ظرفیت، سیاست و شمارنده‌های دور ریخته/ادغام شده."""
+        return {
+            lane.name: {
+                "depth": len(lane.items),
+                "peak_depth": lane.peak_depth,
+                "capacity": lane.capacity,
+                "policy": lane.policy,
+                "enqueued": lane.enqueued,
+                "shed": lane.shed,
+                "coalesced": lane.coalesced,
+            }
+            for lane in self._lanes
+        }
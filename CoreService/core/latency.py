@@ -0,0 +1,146 @@
+import collections
+import os
+
+# دقت هیستوگرام: 2^(SUB_BUCKET_BITS-1) زیرسطل در هر توان دو (~۱.۶٪ خطای نسبی)
+SUB_BUCKET_BITS = 7
+# بیشترین مقدار قابل ثبت (میکروثانیه)؛ مقادیر بزرگ‌تر در آخرین سطل ثبت می‌شوند
+MAX_TRACKABLE_US = 1 << 36
+
+# هیستوگرام‌های تفکیک سورس (یا حساب کپی) با دقت کمتر (~۶٪، ۵۲۹ سطل به جای ۱۹۸۵) نگهداری می‌شوند
+SOURCE_SUB_BUCKET_BITS = 5
+# سقف تعداد هیستوگرام‌های (مرحله، سورس)؛ کم‌استفاده‌ترین با رسیدن به سقف حذف می‌شود (LRU)
+LATENCY_MAX_SOURCES = int(os.getenv("LATENCY_MAX_SOURCES", "512"))
+
+# ثبت تاخیر مراحل همیشه فعال است مگر اینکه صراحتاً خاموش شود
+LATENCY_TRACKING = os.getenv("LATENCY_TRACKING", "1") == "1"
+
+PERCENTILES = (50, 90, 99)
+
+# مراحل مسیر سیگنال (همه نسبت به لحظه دریافت در collector اندازه‌گیری می‌شوند)
+STAGES = (
+    "processor_dequeue",
+    "publish_enqueue",
+    "publish_send",
+    "db_commit",
+    "alert_enqueue",
+)
+
+
+def _bucket_index(value: int, bits: int = SUB_BUCKET_BITS) -> int:
+    if value < (1 << bits):
+        return value
+    shift = value.bit_length() - bits
+    half = 1 << (bits - 1)
+    return (1 << bits) + (shift - 1) * half + ((value >> shift) - half)
+
+
+def _bucket_upper(index: int, bits: int = SUB_BUCKET_BITS) -> int:
+    full = 1 << bits
+    if index < full:
+        return index
+    half = 1 << (bits - 1)
+    shift, sub = divmod(index - full, half)
+    shift += 1
+    return ((sub + half) << shift) + (1 << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    هیستوگرام لگاریتمی-خطی به سبک HDR با حافظه ثابت.
+    ثبت هر نمونه O(1) و فقط چند عملیات صحیح است؛ صدک‌ها با دقت ~۱.۶٪ (با bits پیش‌فرض) گزارش می‌شوند.
+    """
+    __slots__ = ("bits", "counts", "total", "sum_us", "max_us")
+
+    def __init__(self, bits: int = SUB_BUCKET_BITS):
+        self.bits = bits
+        self.counts = [0] * (_bucket_index(MAX_TRACKABLE_US, bits) + 1)
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, value_us: int):
+        if value_us < 0:
+            value_us = 0
+        elif value_us > MAX_TRACKABLE_US:
+            value_us = MAX_TRACKABLE_US
+        self.counts[_bucket_index(value_us, self.bits)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentile(self, pct: float) -> int:
+        """مقدار صدک (میکروثانیه، کران بالای سطل)."""
+        if not self.total:
+            return 0
+        threshold = max(1, int(self.total * pct / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= threshold:
+                    return min(_bucket_upper(index, self.bits), self.max_us)
+        return self.max_us
+
+    def summary(self) -> dict:
+        """خلاصه p50/p90/p99/max بر حسب میلی‌ثانیه."""
+        result = {"count": self.total}
+        for pct in PERCENTILES:
+            result[f"p{pct}_ms"] = self.percentile(pct) / 1000.0
+        result["max_ms"] = self.max_us / 1000.0
+        return result
+
+
+class LatencyRecorder:
+    """
+    نگهداری هیستوگرام‌های تاخیر هر مرحله به تفکیک نوع رویداد و به تفکیک سورس.
+    تعداد سورس‌ها (که حساب‌های کپی را هم در مراحل processor_dequeue و db_commit شامل می‌شود) نامحدود
+    است، پس هیستوگرام‌های تفکیک سورس درشت‌تر و با سقف LRU نگهداری می‌شوند.
+    """
+    def __init__(self, enabled: bool = LATENCY_TRACKING, max_sources: int = LATENCY_MAX_SOURCES):
+        self.enabled = enabled
+        self.max_sources = max(1, max_sources)
+        self.by_event: dict[tuple[str, str], LatencyHistogram] = {}
+        self.by_source: collections.OrderedDict[tuple[str, str], LatencyHistogram] = collections.OrderedDict()
+        self.sources_evicted = 0
+
+    def _histogram(self, table: dict, key: tuple) -> LatencyHistogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = LatencyHistogram()
+        return histogram
+
+    def _source_histogram(self, key: tuple) -> LatencyHistogram:
+        table = self.by_source
+        histogram = table.get(key)
+        if histogram is not None:
+            table.move_to_end(key)
+            return histogram
+        histogram = table[key] = LatencyHistogram(SOURCE_SUB_BUCKET_BITS)
+        if len(table) > self.max_sources:
+            table.popitem(last=False)
+            self.sources_evicted += 1
+        return histogram
+
+    def record(self, stage: str, event_type: str | None, source: str | None, seconds: float):
+        """ثبت یک نمونه تاخیر (ثانیه) برای یک مرحله."""
+        if not self.enabled:
+            return
+        value_us = int(seconds * 1_000_000)
+        self._histogram(self.by_event, (stage, event_type or "UNKNOWN")).record(value_us)
+        if source:
+            self._source_histogram((stage, source)).record(value_us)
+
+    def report(self) -> dict:
+        """گزارش صدک‌ها: {stage: {"by_event": {...}, "by_source": {...}}}."""
+        result = {}
+        for (stage, event_type), histogram in self.by_event.items():
+            result.setdefault(stage, {"by_event": {}, "by_source": {}})["by_event"][event_type] = histogram.summary()
+        for (stage, source), histogram in self.by_source.items():
+            result.setdefault(stage, {"by_event": {}, "by_source": {}})["by_source"][source] = histogram.summary()
+        return result
+
+    def reset(self):
+        self.by_event.clear()
+        self.by_source.clear()
+        self.sources_evicted = 0
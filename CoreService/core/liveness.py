@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import time
+
+# اکسپرت‌ها هر ۳۰ ثانیه پینگ می‌فرستند؛ پس از این مدت بی‌خبری، اکسپرت خاموش فرض می‌شود
+HEARTBEAT_TIMEOUT = float(os.getenv("HEARTBEAT_TIMEOUT", "95"))
+# دقت تایمر ویل (ثانیه) و تعداد خانه‌های آن
+WHEEL_TICK = float(os.getenv("HEARTBEAT_WHEEL_TICK", "1"))
+WHEEL_SLOTS = 128
+# ضریب میانگین متحرک نمایی برای فاصله پینگ، jitter و نرخ پیام
+EWMA_ALPHA = 0.2
+
+HEARTBEAT_EVENTS = ("PING", "PING_COPY")
+
+logger = logging.getLogger(__name__)
+
+# رجیستری فعال پروسه (توسط ZMQServer مقداردهی می‌شود تا ربات بتواند آن را بخواند)
+fleet_registry: "LivenessRegistry" = None
+
+
+class EAState:
+    """وضعیت زنده بودن یک اکسپرت."""
+    __slots__ = ("ea_id", "kind", "first_seen", "last_seen", "last_ping", "deadline",
+                 "messages", "pings", "interval_avg", "jitter_avg", "gap_avg", "alive")
+
+    def __init__(self, ea_id: str, kind: str, now: float):
+        self.ea_id = ea_id
+        self.kind = kind
+        self.first_seen = now
+        self.last_seen = now
+        self.last_ping = None
+        self.deadline = now
+        self.messages = 0
+        self.pings = 0
+        self.interval_avg = None
+        self.jitter_avg = 0.0
+        self.gap_avg = None
+        self.alive = True
+
+
+class TimerWheel:
+    """
+    تایمر ویل هش‌شده با حذف تنبل: زمان‌بندی O(1) است و به‌روزرسانی مهلت نیازی
+    به جابجایی ورودی ندارد؛ ورودی‌ای که مهلتش تمدید شده هنگام رسیدن نوبتش دوباره زمان‌بندی می‌شود.
+    """
+    def __init__(self, tick: float = WHEEL_TICK, slots: int = WHEEL_SLOTS):
+        self.tick = tick
+        self.slots: list[set] = [set() for _ in range(slots)]
+        self._current_tick = None
+
+    def _tick_of(self, at: float) -> int:
+        return int(at / self.tick)
+
+    def schedule(self, key, at: float):
+        tick = self._tick_of(at)
+        if self._current_tick is not None and tick <= self._current_tick:
+            tick = self._current_tick + 1
+        self.slots[tick % len(self.slots)].add(key)
+
+    def advance(self, now: float) -> list:
+        """جلو بردن ویل تا زمان now و برگرداندن کلیدهای خانه‌های عبور کرده."""
+        target = self._tick_of(now)
+        if self._current_tick is None:
+            self._current_tick = target - 1
+        # اگر حلقه بیش از یک دور عقب افتاده، همه خانه‌ها یک بار بررسی می‌شوند
+        steps = min(target - self._current_tick, len(self.slots))
+        due = []
+        for tick in range(target - steps + 1, target + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        self._current_tick = target
+        return due
+
+
+class LivenessRegistry:
+    """
+    رجیستری درون‌حافظه‌ای زنده بودن اکسپرت‌ها (کلید: source_id_str / copy_id_str).
+    ثبت هر پیام O(1) است؛ تشخیص قطع heartbeat با تایمر ویل انجام می‌شود و برای هر
+    تغییر وضعیت (خاموش شدن / بازگشت) فقط یک هشدار تلگرام ارسال می‌شود.
+    """
+    def __init__(self, alert_queue: asyncio.Queue = None, timeout: float = HEARTBEAT_TIMEOUT,
+                 tick: float = WHEEL_TICK):
+        self.alert_queue = alert_queue
+        self.timeout = timeout
+        self.wheel = TimerWheel(tick)
+        self.eas: dict[str, EAState] = {}
+
+    def touch(self, ea_id: str, kind: str, event: str | None, now: float | None = None):
+        """ثبت دریافت یک پیام از اکسپرت."""
+        if not ea_id:
+            return
+        now = time.monotonic() if now is None else now
+        state = self.eas.get(ea_id)
+        if state is None:
+            state = self.eas[ea_id] = EAState(ea_id, kind, now)
+            state.deadline = now + self.timeout
+            self.wheel.schedule(ea_id, state.deadline)
+            logger.info("EA registered in liveness registry.", extra={"ea_id": ea_id, "event_type": event})
+        else:
+            gap = now - state.last_seen
+            state.gap_avg = gap if state.gap_avg is None else state.gap_avg + EWMA_ALPHA * (gap - state.gap_avg)
+            state.last_seen = now
+            state.deadline = now + self.timeout
+            if not state.alive:
+                state.alive = True
+                # ورودی قبلی در ویل هنگام خاموشی حذف شده؛ دوباره زمان‌بندی می‌شود
+                self.wheel.schedule(ea_id, state.deadline)
+                self._alert_recovered(state, now)
+        state.messages += 1
+        if event in HEARTBEAT_EVENTS:
+            if state.last_ping is not None:
+                interval = now - state.last_ping
+                if state.interval_avg is None:
+                    state.interval_avg = interval
+                else:
+                    state.jitter_avg += EWMA_ALPHA * (abs(interval - state.interval_avg) - state.jitter_avg)
+                    state.interval_avg += EWMA_ALPHA * (interval - state.interval_avg)
+            state.last_ping = now
+            state.pings += 1
+
+    def check_expired(self, now: float | None = None) -> list[str]:
+        """بررسی خانه‌های سررسید ویل و علامت‌گذاری اکسپرت‌های خاموش."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        for ea_id in self.wheel.advance(now):
+            state = self.eas.get(ea_id)
+            if state is None or not state.alive:
+                continue
+            if state.deadline > now:
+                self.wheel.schedule(ea_id, state.deadline)
+                continue
+            state.alive = False
+            # فاصله پینگ پس از بازگشت نباید مدت قطعی را در میانگین وارد کند
+            state.last_ping = None
+            expired.append(ea_id)
+            self._alert_silent(state, now)
+        return expired
+
+    def _alert(self, msg: str):
+        if self.alert_queue is None:
+            return
+        try:
+            self.alert_queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            logger.warning("Alert queue full, liveness alert dropped.")
+
+    def _alert_silent(self, state: EAState, now: float):
+        silent_for = now - state.last_seen
+        logger.warning(f"EA went silent ({silent_for:.0f}s without messages).",
+                       extra={"ea_id": state.ea_id, "event_type": "EA_SILENT"})
+        self._alert(
+            f"📵 *اکسپرت قطع شد*\n\n"
+            f"*{state.ea_id}* ({state.kind}) به مدت `{silent_for:.0f}` ثانیه هیچ پیامی ارسال نکرده است."
+        )
+
+    def _alert_recovered(self, state: EAState, now: float):
+        logger.info("EA is back online.", extra={"ea_id": state.ea_id, "event_type": "EA_RECOVERED"})
+        self._alert(f"📶 *اکسپرت دوباره وصل شد*\n\n*{state.ea_id}* ({state.kind}) دوباره پیام ارسال می‌کند.")
+
+    def snapshot(self, now: float | None = None) -> list[dict]:
+        """وضعیت فعلی همه اکسپرت‌ها برای نمایش در ربات."""
+        now = time.monotonic() if now is None else now
+        return [
+            {
+                "ea_id": s.ea_id,
+                "kind": s.kind,
+                "alive": s.alive,
+                "last_seen_sec": now - s.last_seen,
+                "messages": s.messages,
+                "pings": s.pings,
+                "ping_interval_sec": s.interval_avg,
+                "ping_jitter_sec": s.jitter_avg,
+                "msgs_per_min": 60.0 / s.gap_avg if s.gap_avg else None,
+            }
+            for s in sorted(self.eas.values(), key=lambda s: (s.alive, s.kind, s.ea_id))
+        ]
+
+    async def run(self):
+        """حلقه تیک تایمر ویل."""
+        logger.info(f"Liveness registry started (timeout={self.timeout:.0f}s).")
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            self.check_expired()
+
+
+def get_fleet_status() -> list[dict]:
+    """وضعیت اکسپرت‌ها از رجیستری فعال پروسه (در نبود آن لیست خالی)."""
+    return fleet_registry.snapshot() if fleet_registry is not None else []
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import time
+
+# نمونه‌برداری و محدودیت نرخ لاگ‌های پرتکرار (PING، TRADE_MODIFY، GET_CONFIG) بر اساس logger و نوع رویداد
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "1") == "1"
+# سیاست به صورت JSON یا مسیر فایل JSON:
+#   {"<logger یا *>": {"<event_type>": {"sample": N, "rate": K}}}
+# sample یعنی فقط 1 از هر N رکورد و rate یعنی حداکثر K رکورد در ثانیه برای هر اکسپرت؛ هر دو اختیاری‌اند
+LOG_SAMPLING_POLICY = os.getenv("LOG_SAMPLING_POLICY", "")
+# فاصله (ثانیه) رکوردهای خلاصه تعداد لاگ‌های حذف شده
+LOG_SAMPLING_SUMMARY_INTERVAL = float(os.getenv("LOG_SAMPLING_SUMMARY_INTERVAL", "60"))
+# رکوردهای این سطح و بالاتر هرگز حذف نمی‌شوند
+LOG_SAMPLING_MIN_KEEP_LEVEL = logging.WARNING
+
+DEFAULT_SAMPLING_POLICY = {
+    "core.server": {
+        "PING": {"sample": 100},
+        "PING_COPY": {"sample": 100},
+        "TRADE_MODIFY": {"rate": 2},
+        "GET_CONFIG": {"sample": 10, "rate": 1},
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+
+def load_policy(spec: str = LOG_SAMPLING_POLICY) -> dict:
+    """خواندن سیاست از متن JSON یا فایل JSON (رشته خالی یعنی سیاست پیش‌فرض)."""
+    if not spec:
+        return DEFAULT_SAMPLING_POLICY
+    if spec.lstrip().startswith("{"):
+        return json.loads(spec)
+    with open(spec, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _Rule:
+    __slots__ = ("key", "sample", "rate", "seen", "windows")
+
+    def __init__(self, key: str, sample: int, rate: float):
+        self.key = key
+        self.sample = max(1, int(sample))
+        self.rate = rate
+        self.seen = 0
+        # شناسه اکسپرت -> (ثانیه جاری، تعداد رکوردهای عبور کرده در آن)
+        self.windows: dict[str, tuple[int, int]] = {}
+
+
+class SamplingFilter(logging.Filter):
+    """
+    فیلتر نمونه‌برداری لاگ روی هندلر root (پیش از صف لاگ، تا رکوردهای حذف شده هزینه صف و فرمت نداشته باشند).
+    نوع رویداد از فیلد event_type (یا command در درخواست‌های تنظیمات) و شناسه اکسپرت از ea_id، source_id
+    یا copy_id همان log_extra های server.py خوانده می‌شود. تعداد حذف شده‌ها به صورت دوره‌ای در یک رکورد
+    خلاصه با فیلد details گزارش می‌شود.
+    """
+    def __init__(self, policy: dict, summary_interval: float = LOG_SAMPLING_SUMMARY_INTERVAL):
+        super().__init__()
+        # (logger، event_type) -> قاعده
+        self._rules: dict[tuple[str, str], _Rule] = {}
+        for logger_name, events in policy.items():
+            for event_type, rule in events.items():
+                self._rules[(logger_name, event_type)] = _Rule(
+                    f"{logger_name}/{event_type}", rule.get("sample", 1), float(rule.get("rate", 0)))
+        self.summary_interval = summary_interval
+        self._next_summary = time.monotonic() + summary_interval
+        self._suppressed: dict[str, int] = {}
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= LOG_SAMPLING_MIN_KEEP_LEVEL:
+            return True
+        attrs = record.__dict__
+        event_type = attrs.get("event_type") or attrs.get("command")
+        if event_type is None:
+            return True
+        rule = self._rules.get((record.name, event_type)) or self._rules.get(("*", event_type))
+        if rule is None:
+            return True
+        rule.seen += 1
+        keep = (rule.seen - 1) % rule.sample == 0
+        if keep and rule.rate > 0:
+            ea_id = attrs.get("ea_id") or attrs.get("source_id") or attrs.get("copy_id") or ""
+            second = int(time.monotonic())
+            window_second, count = rule.windows.get(ea_id, (second, 0))
+            if window_second != second:
+                count = 0
+            keep = count < rule.rate
+            rule.windows[ea_id] = (second, count + 1 if keep else count)
+        if not keep:
+            self._suppressed[rule.key] = self._suppressed.get(rule.key, 0) + 1
+        return keep
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # در حالت بدون صف همین فیلتر روی چند هندلر است؛ تصمیم هر رکورد فقط یک بار گرفته می‌شود
+        keep = record.__dict__.get("_sampling_keep")
+        if keep is None:
+            keep = record._sampling_keep = self._decide(record)
+            if time.monotonic() >= self._next_summary:
+                self.flush()
+        return keep
+
+    def flush(self):
+        """ثبت رکورد خلاصه لاگ‌های حذف شده از آخرین خلاصه."""
+        self._next_summary = time.monotonic() + self.summary_interval
+        suppressed, self._suppressed = self._suppressed, {}
+        if suppressed:
+            logger.info(f"Log sampling suppressed {sum(suppressed.values())} records.", extra={"details": suppressed})
+        # پنجره‌های نرخ اکسپرت‌هایی که دیگر لاگی ندارند پاک می‌شوند
+        second = int(time.monotonic())
+        for rule in self._rules.values():
+            rule.windows = {ea: w for ea, w in rule.windows.items() if w[0] == second}
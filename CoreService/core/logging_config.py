@@ -1,10 +1,44 @@
+import atexit
+import gzip
 import logging
 import logging.handlers
 import json
+import os
+import queue
+import shutil
 import sys
+from .log_sampling import SamplingFilter, LOG_SAMPLING, load_policy
+
+# [بهبود عملکرد] نوشتن لاگ در ترد جداگانه (QueueHandler/QueueListener)؛ ترد فراخوان فقط رکورد را در صف می‌گذارد
+# و فرمت پیام (آرگومان‌های %)، ساخت JSON و I/O فایل و کنسول در ترد شنونده انجام می‌شود
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "1") == "1"
+# ظرفیت صف لاگ؛ در صورت پر بودن رکوردها دور ریخته و تعدادشان در یک رکورد WARNING گزارش می‌شود
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# فشرده‌سازی gzip فایل‌های چرخش شده (trade_copier.log.1.gz و ...)
+LOG_COMPRESS = os.getenv("LOG_COMPRESS", "1") == "1"
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"
+
+# فیلدهای extra که در خروجی JSON نوشته می‌شوند؛ با LOG_FIELDS (جدا شده با کاما) قابل تغییر است
+DEFAULT_LOG_FIELDS = (
+    'user_id', 'username', 'callback_data', 'command',
+    'input_for', 'action_attempt', 'status', 'entity_id',
+    'details', 'error',
+    'event_type', 'source_id', 'copy_id', 'position_id',
+)
+LOG_FIELDS = tuple(f.strip() for f in os.getenv("LOG_FIELDS", "").split(",") if f.strip()) or DEFAULT_LOG_FIELDS
+
+_listener: logging.handlers.QueueListener | None = None
+_sampler: SamplingFilter | None = None
+
 
 class JsonFormatter(logging.Formatter):
     """فرمت‌کننده لاگ برای خروجی JSON فشرده."""
+    def __init__(self, fields: tuple = LOG_FIELDS, **kwargs):
+        super().__init__(**kwargs)
+        self.fields = fields
+
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
             'timestamp': self.formatTime(record, self.datefmt),
@@ -14,37 +48,122 @@ class JsonFormatter(logging.Formatter):
             'funcName': record.funcName,
             'lineno': record.lineno,
         }
-        extra_keys = [
-            'user_id', 'username', 'callback_data', 'command', 
-            'input_for', 'action_attempt', 'status', 'entity_id', 
-            'details', 'error'
-        ]
-        for key in extra_keys:
-            if hasattr(record, key):
-                log_data[key] = getattr(record, key)
+        attrs = record.__dict__
+        for key in self.fields:
+            if key in attrs:
+                log_data[key] = attrs[key]
         if record.exc_info:
             log_data['exception'] = self.formatException(record.exc_info)
-        return json.dumps(log_data, separators=(',', ':'), ensure_ascii=False)
+        elif record.exc_text:
+            log_data['exception'] = record.exc_text
+        return json.dumps(log_data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler بدون فرمت کردن پیام در ترد فراخوان (برخلاف prepare پیش‌فرض).
+    آرگومان‌های پیام در ترد شنونده فرمت می‌شوند، پس پس از لاگ کردن نباید تغییر کنند.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # traceback فقط در ترد فراخوان معتبر است؛ به متن تبدیل می‌شود
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"{self.dropped} log records dropped (log queue full).",
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
-def setup_logging():
-    """پیکربندی سیستم لاگ‌نویسی برنامه."""
+class _LogListener(logging.handlers.QueueListener):
+    """QueueListener با ارسال مسدودکننده نشانه توقف تا در صف پر هم رکوردهای باقیمانده نوشته شوند."""
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def _gzip_namer(name: str) -> str:
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """فشرده‌سازی فایل چرخش شده (در ترد شنونده اجرا می‌شود، نه روی حلقه asyncio)."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def stop_logging():
+    """تخلیه صف لاگ و توقف ترد شنونده."""
+    global _listener, _sampler
+    if _sampler is not None:
+        _sampler.flush()
+        _sampler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logging(log_file: str = "trade_copier.log", queued: bool = LOG_QUEUE_ENABLED, console: bool = LOG_CONSOLE):
+    """پیکربندی سیستم لاگ‌نویسی برنامه (در حالت چندپروسه‌ای هر پروسه فایل جداگانه دارد)."""
+    global _listener, _sampler
+    stop_logging()
     json_formatter = JsonFormatter()
     file_handler = logging.handlers.RotatingFileHandler(
-        filename="trade_copier.log",
-        maxBytes=5*1024*1024,
-        backupCount=5,
+        filename=log_file,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
         encoding='utf-8'
     )
+    if LOG_COMPRESS:
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
     file_handler.setFormatter(json_formatter)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(json_formatter)
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(json_formatter)
+        handlers.append(console_handler)
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
     if root_logger.hasHandlers():
         root_logger.handlers.clear()
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    if queued:
+        _listener = _LogListener(queue.Queue(LOG_QUEUE_SIZE), *handlers, respect_handler_level=True)
+        _listener.start()
+        root_handlers = [LazyQueueHandler(_listener.queue)]
+    else:
+        root_handlers = handlers
+    policy_error = None
+    if LOG_SAMPLING:
+        try:
+            _sampler = SamplingFilter(load_policy())
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            policy_error = e
+    for handler in root_handlers:
+        if _sampler is not None:
+            handler.addFilter(_sampler)
+        root_logger.addHandler(handler)
     logging.getLogger('httpx').setLevel(logging.WARNING)
     logging.getLogger('apscheduler').setLevel(logging.WARNING)
     logging.getLogger('telegram').setLevel(logging.WARNING)
     logging.info("Logging system initialized successfully in JSON format.")
+    if policy_error is not None:
+        logging.error(f"Invalid LOG_SAMPLING_POLICY, log sampling disabled: {policy_error}")
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import os
+import platform
+import selectors
+
+# حلقه رویداد برنامه: asyncio (پیش‌فرض)، uvloop (در صورت نصب بودن) یا selector
+LOOP_BACKEND = os.getenv("LOOP_BACKEND", "asyncio")
+# نوع selector برای backend "selector" (epoll، poll، select یا default)
+LOOP_SELECTOR = os.getenv("LOOP_SELECTOR", "default")
+
+BACKENDS = ("asyncio", "uvloop", "selector")
+_SELECTORS = {
+    "default": "DefaultSelector",
+    "epoll": "EpollSelector",
+    "poll": "PollSelector",
+    "select": "SelectSelector",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """سیاست حلقه‌ای که همیشه SelectorEventLoop با selector انتخاب شده می‌سازد (روی ویندوز هم)."""
+    def __init__(self, selector_name: str = LOOP_SELECTOR):
+        super().__init__()
+        selector_cls = getattr(selectors, _SELECTORS.get(selector_name, ""), None)
+        if selector_cls is None:
+            raise ValueError(f"Selector '{selector_name}' is not available on this platform")
+        self.selector_cls = selector_cls
+
+    def new_event_loop(self):
+        return asyncio.SelectorEventLoop(self.selector_cls())
+
+
+def available_backends() -> list[str]:
+    """backendهای قابل استفاده روی این سیستم."""
+    backends = ["asyncio", "selector"]
+    if platform.system() != "Windows":
+        try:
+            import uvloop  # noqa: F401
+            backends.insert(1, "uvloop")
+        except ImportError:
+            pass
+    return backends
+
+
+def install(backend: str = LOOP_BACKEND) -> str:
+    """
+    تنظیم سیاست حلقه رویداد پیش از asyncio.run و برگرداندن backend واقعی.
+    pyzmq روی ویندوز به حلقه selector نیاز دارد، بنابراین asyncio در آنجا همان selector است.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown loop backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if backend == "uvloop":
+        if "uvloop" in available_backends():
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+        logger.warning("LOOP_BACKEND=uvloop but uvloop is not installed on this platform, using asyncio.")
+        backend = "asyncio"
+    if backend == "selector":
+        asyncio.set_event_loop_policy(SelectorEventLoopPolicy())
+        return "selector"
+    if platform.system() == "Windows":
+        from asyncio import WindowsSelectorEventLoopPolicy
+        asyncio.set_event_loop_policy(WindowsSelectorEventLoopPolicy())
+    return "asyncio"
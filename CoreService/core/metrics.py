@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+
+from .latency import LatencyHistogram, PERCENTILES
+
+# endpoint متریک‌ها اختیاری است و به صورت پیش‌فرض خاموش است
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """شمارنده افزایشی با برچسب."""
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in list(self._values.items())]
+
+
+class CallbackMetric(_Metric):
+    """
+    متریکی که مقدارش هنگام scrape از یک تابع خوانده می‌شود (مثلاً عمق صف‌ها).
+    تابع باید یک عدد یا دیکشنری {tuple برچسب‌ها: مقدار} برگرداند.
+    """
+    def __init__(self, name: str, help_text: str, func, labelnames: tuple = (), type_name: str = "gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.func = func
+        self.type_name = type_name
+
+    def samples(self) -> list[str]:
+        value = self.func()
+        if not isinstance(value, dict):
+            return [f"{self.name} {value}"]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {v}" for key, v in value.items()]
+
+
+class LatencySummary(_Metric):
+    """خلاصه صدک‌های تاخیر (ثانیه) بر پایه هیستوگرام HDR به ازای هر ترکیب برچسب."""
+    type_name = "summary"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self._histograms: dict[tuple, LatencyHistogram] = {}
+
+    def observe(self, seconds: float, **labels):
+        key = self._key(labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.record(int(seconds * 1_000_000))
+
+    def samples(self) -> list[str]:
+        return summary_samples(self.name, self.labelnames, list(self._histograms.items()))
+
+
+def summary_samples(name: str, labelnames: tuple, items: list) -> list[str]:
+    """تبدیل هیستوگرام‌های تاخیر به خطوط summary در قالب Prometheus."""
+    lines = []
+    for key, histogram in items:
+        for pct in PERCENTILES:
+            labels = _format_labels(labelnames, key, f'quantile="{pct / 100}"')
+            lines.append(f"{name}{labels} {histogram.percentile(pct) / 1_000_000}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {histogram.sum_us / 1_000_000}")
+        lines.append(f"{name}_count{labels} {histogram.total}")
+    return lines
+
+
+class Registry:
+    """ثبت متریک‌ها و تولید خروجی متنی (text exposition format)."""
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Failed to collect metric {metric.name}: {e}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SIGNALS_TOTAL = REGISTRY.register(Counter(
+    "tradecopier_signals_total", "Signals received from EAs.", ("event", "source")))
+CONFIG_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "tradecopier_config_requests_total", "Config requests handled by the responder.", ("command", "result")))
+ALERTS_SENT_TOTAL = REGISTRY.register(Counter(
+    "tradecopier_alerts_sent_total", "Telegram alerts delivered to the admin."))
+ALERT_SEND_FAILURES_TOTAL = REGISTRY.register(Counter(
+    "tradecopier_alert_send_failures_total", "Telegram alerts that failed to send."))
+DB_CALL_SECONDS = REGISTRY.register(LatencySummary(
+    "tradecopier_db_call_seconds", "Latency of database calls made from the event loop.", ("operation",)))
+
+
+async def run_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT, registry: Registry = REGISTRY):
+    """سرور HTTP سبک برای scrape متریک‌ها در مسیر /metrics."""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.split()
+            path = parts[1] if len(parts) > 1 else b"/"
+            if path.split(b"?")[0] == b"/metrics":
+                status = "200 OK"
+                body = registry.render().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
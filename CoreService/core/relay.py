@@ -0,0 +1,145 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zmq
+
+# نود رله: اکسپرت‌های کپی به جای هسته به رله وصل می‌شوند و رله پیام‌ها را از هسته دریافت و
+# برای مشترکین خود بازپخش می‌کند. درخواست‌های تنظیمات و گزارش‌ها هم به هسته منتقل می‌شوند
+# تا اکسپرت فقط با تغییر InpServerAddress به رله وصل شود.
+RELAY_UPSTREAM = os.getenv("RELAY_UPSTREAM", "127.0.0.1")
+RELAY_UPSTREAM_SIGNAL_PORT = os.getenv("RELAY_UPSTREAM_SIGNAL_PORT", "5555")
+RELAY_UPSTREAM_PUBLISH_PORT = os.getenv("RELAY_UPSTREAM_PUBLISH_PORT", "5556")
+RELAY_UPSTREAM_CONFIG_PORT = os.getenv("RELAY_UPSTREAM_CONFIG_PORT", "5557")
+RELAY_BIND = os.getenv("RELAY_BIND", "*")
+RELAY_SIGNAL_PORT = os.getenv("RELAY_SIGNAL_PORT", "5555")
+RELAY_PUBLISH_PORT = os.getenv("RELAY_PUBLISH_PORT", "5556")
+RELAY_CONFIG_PORT = os.getenv("RELAY_CONFIG_PORT", "5557")
+# سقف پیام‌های در صف هر مشترک روی رله
+RELAY_SNDHWM = int(os.getenv("RELAY_SNDHWM", "1000"))
+# صف اتصال‌های در انتظار پذیرش (پیش‌فرض ZMQ یعنی 100 برای وصل شدن همزمان هزاران اکسپرت پس از ری‌استارت کم است)
+RELAY_BACKLOG = int(os.getenv("RELAY_BACKLOG", "4096"))
+RELAY_STATS_INTERVAL = int(os.getenv("RELAY_STATS_INTERVAL", "60"))
+
+logger = logging.getLogger(__name__)
+
+_STATS_FIELDS = ("frontend_msgs_in", "frontend_bytes_in", "frontend_msgs_out", "frontend_bytes_out",
+                 "backend_msgs_in", "backend_bytes_in", "backend_msgs_out", "backend_bytes_out")
+
+
+class _Proxy:
+    """یک zmq.proxy_steerable در ترد جداگانه (حلقه انتقال در C و بدون GIL اجرا می‌شود)."""
+
+    def __init__(self, context: zmq.Context, name: str, frontend, backend):
+        self.name = name
+        self.context = context
+        self.frontend = frontend
+        self.backend = backend
+        self._control_endpoint = f"inproc://relay-control-{name}"
+        self._control = context.socket(zmq.PAIR)
+        self._control.bind(self._control_endpoint)
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=f"relay-{name}", daemon=True)
+
+    def _run(self):
+        control = self.context.socket(zmq.PAIR)
+        control.connect(self._control_endpoint)
+        try:
+            zmq.proxy_steerable(self.frontend, self.backend, None, control)
+        except zmq.ContextTerminated:
+            pass
+        finally:
+            control.close(0)
+            self.frontend.close(0)
+            self.backend.close(0)
+
+    def start(self):
+        self.thread.start()
+
+    def stats(self) -> dict:
+        """شمارنده‌های پیام و بایت دو طرف پروکسی (دستور STATISTICS)."""
+        with self._lock:
+            self._control.send(b"STATISTICS")
+            frames = self._control.recv_multipart()
+        return {field: struct.unpack("=Q", frame)[0] for field, frame in zip(_STATS_FIELDS, frames)}
+
+    def stop(self):
+        with self._lock:
+            self._control.send(b"TERMINATE")
+        self.thread.join(timeout=5)
+        self._control.close(0)
+
+
+class Relay:
+    """
+    رله fan-out: XSUB متصل به PUB هسته و XPUB برای مشترکین محلی. اشتراک‌های مشترکین از طریق
+    XPUB/XSUB به هسته منتقل می‌شوند، بنابراین هسته فقط تاپیک‌های مورد نیاز رله را می‌فرستد.
+    """
+
+    def __init__(self, upstream: str = RELAY_UPSTREAM, bind: str = RELAY_BIND):
+        self.upstream = upstream
+        self.bind = bind
+        self.context = zmq.Context()
+        self.proxies: list[_Proxy] = []
+
+    def _socket(self, kind: int, **options):
+        socket = self.context.socket(kind)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.setsockopt(zmq.BACKLOG, RELAY_BACKLOG)
+        for option, value in options.items():
+            socket.setsockopt(getattr(zmq, option), value)
+        return socket
+
+    def start(self):
+        up = f"tcp://{self.upstream}"
+        local = f"tcp://{self.bind}"
+
+        xpub = self._socket(zmq.XPUB, SNDHWM=RELAY_SNDHWM)
+        xpub.bind(f"{local}:{RELAY_PUBLISH_PORT}")
+        xsub = self._socket(zmq.XSUB)
+        xsub.connect(f"{up}:{RELAY_UPSTREAM_PUBLISH_PORT}")
+
+        # GET_CONFIG / GET_MISSED: پاکت ROUTER حفظ می‌شود و پاسخ چندفریمی به همان اکسپرت برمی‌گردد
+        router = self._socket(zmq.ROUTER)
+        router.bind(f"{local}:{RELAY_CONFIG_PORT}")
+        dealer = self._socket(zmq.DEALER)
+        dealer.connect(f"{up}:{RELAY_UPSTREAM_CONFIG_PORT}")
+
+        # گزارش‌ها و پینگ‌های اکسپرت‌های کپی
+        pull = self._socket(zmq.PULL)
+        pull.bind(f"{local}:{RELAY_SIGNAL_PORT}")
+        push = self._socket(zmq.PUSH)
+        push.connect(f"{up}:{RELAY_UPSTREAM_SIGNAL_PORT}")
+
+        self.proxies = [
+            _Proxy(self.context, "publish", xsub, xpub),
+            _Proxy(self.context, "config", router, dealer),
+            _Proxy(self.context, "signal", pull, push),
+        ]
+        for proxy in self.proxies:
+            proxy.start()
+        logger.info(f"Relay started: upstream {self.upstream}, serving on {self.bind} "
+                    f"(publish {RELAY_PUBLISH_PORT}, config {RELAY_CONFIG_PORT}, signal {RELAY_SIGNAL_PORT}).")
+
+    def get_stats(self) -> dict:
+        """آمار هر پروکسی رله."""
+        return {proxy.name: proxy.stats() for proxy in self.proxies}
+
+    def stop(self):
+        for proxy in self.proxies:
+            proxy.stop()
+        self.context.term()
+        logger.info("Relay stopped.")
+
+    def run_forever(self, stats_interval: int = RELAY_STATS_INTERVAL):
+        """اجرای رله تا Ctrl+C با لاگ دوره‌ای آمار."""
+        self.start()
+        try:
+            while True:
+                time.sleep(stats_interval)
+                logger.info("Relay statistics.", extra={"details": self.get_stats()})
+        except KeyboardInterrupt:
+            logger.info("Relay shutting down...")
+        finally:
+            self.stop()
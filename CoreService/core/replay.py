@@ -0,0 +1,179 @@
+import collections
+import json
+import os
+import re
+import time
+
+# تعداد آخرین پیام‌های نگهداری شده برای هر تاپیک سورس
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "1000"))
+# سقف کل حافظه پیام‌های بافر شده همه تاپیک‌ها (بایت)؛ با رسیدن به آن قدیمی‌ترین پیام‌ها (از هر تاپیکی)
+# حذف می‌شوند. در حالت مسیریابی تعداد تاپیک‌ها برابر تعداد حساب‌های کپی است و بدون این سقف حافظه
+# با تعداد کپی‌ها × REPLAY_BUFFER_SIZE رشد می‌کند
+REPLAY_MAX_BYTES = int(os.getenv("REPLAY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_STAMP_RE = re.compile(rb',"seq_epoch":(\d+),"seq":(\d+)}$')
+
+
+class ReplayBuffer:
+    """
+    شماره‌گذاری ترتیبی پیام‌های منتشر شده به ازای هر تاپیک سورس و نگهداری آخرین N پیام
+    (بایت‌های آماده ارسال) در یک بافر حلقوی تا اکسپرت کپی بتواند فقط پیام‌های از دست رفته را بگیرد.
+    epoch با هر راه‌اندازی سرور تغییر می‌کند تا ریست شدن شماره‌ها قابل تشخیص باشد.
+    حجم کل بافرها به max_bytes محدود است و ترتیب سراسری درج برای حذف قدیمی‌ترین پیام‌ها نگهداری می‌شود.
+    """
+    def __init__(self, size: int = REPLAY_BUFFER_SIZE, epoch: int | None = None, max_bytes: int = REPLAY_MAX_BYTES):
+        self.size = max(1, size)
+        self.max_bytes = max(1, max_bytes)
+        self.epoch = int(time.time()) if epoch is None else epoch
+        self._suffix = b',"seq_epoch":%d,"seq":' % self.epoch
+        self._seq: dict[bytes, int] = {}
+        self._rings: dict[bytes, collections.deque] = {}
+        # (تاپیک، seq) به ترتیب درج در همه تاپیک‌ها؛ ورودی‌هایی که با سقف تعداد تاپیک حذف شده‌اند
+        # هنگام حذف سراسری رد و به صورت دوره‌ای فشرده می‌شوند
+        self._order: collections.deque = collections.deque()
+        self._entries = 0
+        self._bytes = 0
+        self.replayed = 0
+        self.gaps_unrecoverable = 0
+        self.evicted = 0
+
+    @staticmethod
+    def format_stamped(body: bytes, epoch: int, seq: int) -> bytes:
+        """پیام مهر شده از JSON بدون آکولاد پایانی (همان قالب stamp)."""
+        return b'%s,"seq_epoch":%d,"seq":%d}' % (body, epoch, seq)
+
+    def _append(self, topic: bytes, seq: int, stamped: bytes):
+        ring = self._rings.get(topic)
+        if ring is None:
+            ring = self._rings[topic] = collections.deque()
+        ring.append((seq, stamped))
+        self._order.append((topic, seq))
+        self._entries += 1
+        self._bytes += len(stamped)
+        if len(ring) > self.size:
+            self._bytes -= len(ring.popleft()[1])
+            self._entries -= 1
+        while self._bytes > self.max_bytes and self._order:
+            oldest_topic, oldest_seq = self._order.popleft()
+            oldest = self._rings[oldest_topic]
+            if oldest and oldest[0][0] == oldest_seq:
+                self._bytes -= len(oldest.popleft()[1])
+                self._entries -= 1
+                self.evicted += 1
+        if len(self._order) > 2 * self._entries + 1024:
+            rings = self._rings
+            self._order = collections.deque(
+                (t, q) for t, q in self._order if rings[t] and rings[t][0][0] <= q)
+
+    def stamp(self, topic: bytes, payload) -> bytes:
+        """
+        افزودن seq و seq_epoch به انتهای JSON و ثبت آن در بافر تاپیک.
+        پیامی که با آکولاد بسته تمام نشود بدون تغییر برگردانده می‌شود.
+        """
+        body = bytes(payload).rstrip()
+        if not body.endswith(b"}"):
+            return body
+        seq = self._seq.get(topic, 0) + 1
+        self._seq[topic] = seq
+        stamped = b"%s%s%d}" % (body[:-1], self._suffix, seq)
+        self._append(topic, seq, stamped)
+        return stamped
+
+    @staticmethod
+    def parse_stamp(payload: bytes) -> tuple[int, int] | None:
+        """(seq_epoch، seq) پیام مهر شده یا None."""
+        match = _STAMP_RE.search(payload)
+        if match is None:
+            return None
+        return int(match.group(1)), int(match.group(2))
+
+    def restore(self, published: list[tuple[bytes, bytes]],
+                floor: dict[bytes, tuple[int, int]] | None = None) -> int:
+        """
+        بازسازی بافر و شمارنده‌ها از پیام‌های منتشر شده قبلی (ژورنال) تا شماره‌گذاری پس از
+        ری‌استارت با همان epoch ادامه یابد و اکسپرت‌ها شکاف زمان قطعی را هم بازیابی کنند.
+        floor آخرین (epoch، seq) هر تاپیک از پیام‌های قدیمی‌تری است که بدنه‌شان بارگذاری نشده؛
+        فقط شمارنده آن تاپیک‌ها ادامه می‌یابد تا seq در همان epoch عقب نرود.
+        """
+        stamped = []
+        for topic, payload in published:
+            stamp = self.parse_stamp(payload)
+            if stamp is not None:
+                stamped.append((topic, stamp[0], stamp[1], payload))
+        floor = floor or {}
+        if stamped:
+            epoch = stamped[-1][1]
+        elif floor:
+            epoch = max(e for e, _ in floor.values())
+        else:
+            return 0
+        self.epoch = epoch
+        self._suffix = b',"seq_epoch":%d,"seq":' % self.epoch
+        self._seq.clear()
+        self._rings.clear()
+        self._order.clear()
+        self._entries = self._bytes = 0
+        for topic, (floor_epoch, seq) in floor.items():
+            if floor_epoch == self.epoch:
+                self._seq[topic] = seq
+        restored = 0
+        for topic, epoch, seq, payload in stamped:
+            if epoch != self.epoch:
+                continue
+            self._append(topic, seq, payload)
+            self._seq[topic] = max(seq, self._seq.get(topic, 0))
+            restored += 1
+        return restored
+
+    def last_seq(self, topic: bytes) -> int:
+        return self._seq.get(topic, 0)
+
+    def missed(self, topic: bytes, last_seq: int, epoch: int | None = None) -> tuple[bool, list[bytes]]:
+        """
+        پیام‌های بعد از last_seq برای یک تاپیک. complete=False یعنی ابتدای شکاف از بافر
+        خارج شده (یا epoch متفاوت است) و بازیابی کامل ممکن نیست.
+        """
+        ring = self._rings.get(topic)
+        if epoch is not None and epoch != self.epoch:
+            complete = False
+            last_seq = 0
+        elif not ring:
+            return last_seq >= self.last_seq(topic), []
+        else:
+            complete = ring[0][0] <= last_seq + 1
+        messages = [payload for seq, payload in (ring or ()) if seq > last_seq]
+        self.replayed += len(messages)
+        if not complete:
+            self.gaps_unrecoverable += 1
+        return complete, messages
+
+    def missed_frames(self, request_data: dict) -> list[bytes]:
+        """پاسخ چندفریمی GET_MISSED: فریم اول وضعیت و سپس هر پیام در یک فریم جداگانه."""
+        source_id_str = request_data.get("source_id_str")
+        if not source_id_str:
+            raise ValueError("source_id_str is missing")
+        topic = source_id_str.encode("utf-8")
+        last_seq = int(request_data.get("last_seq", 0))
+        epoch = request_data.get("seq_epoch")
+        complete, messages = self.missed(topic, last_seq, int(epoch) if epoch is not None else None)
+        status = {
+            "status": "OK",
+            "source_id_str": source_id_str,
+            "seq_epoch": self.epoch,
+            "last_seq": self.last_seq(topic),
+            "complete": complete,
+            "count": len(messages),
+        }
+        return [json.dumps(status, separators=(",", ":")).encode("utf-8")] + messages
+
+    def get_stats(self) -> dict:
+        """آمار بافر بازپخش."""
+        return {
+            "epoch": self.epoch,
+            "topics": len(self._rings),
+            "buffered": self._entries,
+            "buffered_bytes": self._bytes,
+            "evicted": self.evicted,
+            "replayed": self.replayed,
+            "gaps_unrecoverable": self.gaps_unrecoverable,
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import re
+from . import database
+
+# حالت مسیریابی سمت سرور: هر سیگنال فقط روی تاپیک اختصاصی حساب‌های کپی که آن را اجرا می‌کنند منتشر می‌شود
+# (فیلتر copy_mode/allowed_symbols به جای اکسپرت در سرور اعمال می‌شود). همه اکسپرت‌های کپی باید نسخه‌ای
+# باشند که routed_topic را از پاسخ GET_CONFIG می‌خوانند، چون در این حالت روی تاپیک سورس چیزی منتشر نمی‌شود.
+ROUTED_TOPICS = os.getenv("ROUTED_TOPICS", "0") == "1"
+ROUTED_TOPIC_PREFIX = "R|"
+
+# قالب تاپیک سورس: در حالت پیش‌فرض تاپیک همان source_id_str است و به دلیل تطبیق پیشوندی SUB، مشترک S1
+# پیام‌های S10 تا S19 را هم دریافت و پارس می‌کند. با FRAMED_TOPICS هر سیگنال روی <source>|<symbol>| منتشر
+# می‌شود؛ اشتراک <source>| دقیقاً همان سورس و اشتراک <source>|<symbol>| فقط یک نماد آن را می‌گیرد.
+# همه اکسپرت‌های کپی باید نسخه‌ای باشند که framed_topics را از پاسخ GET_CONFIG می‌خوانند.
+FRAMED_TOPICS = os.getenv("FRAMED_TOPICS", "0") == "1"
+TOPIC_SEPARATOR = b"|"
+
+# بازه ابتدای پیام خام برای یافتن symbol (ترتیب ثابت کلیدها در CJsonBuilder اکسپرت سورس)
+ROUTING_PEEK_BYTES = 256
+_SYMBOL_RE = re.compile(rb'"symbol":"([^"\\]*)"')
+
+logger = logging.getLogger(__name__)
+
+
+def routed_topic(copy_id_str: str) -> str:
+    """تاپیک اختصاصی سیگنال‌های یک حساب کپی (با جداکننده پایانی تا C1 با C10 تطبیق پیشوندی نخورد)."""
+    return f"{ROUTED_TOPIC_PREFIX}{copy_id_str}|"
+
+
+def source_topic(source_id: bytes, symbol: bytes | None = None) -> bytes:
+    """تاپیک انتشار سیگنال یک سورس (با FRAMED_TOPICS همراه با جداکننده و سطح نماد)."""
+    if not FRAMED_TOPICS:
+        return source_id
+    if symbol is None or TOPIC_SEPARATOR in symbol:
+        return source_id + TOPIC_SEPARATOR
+    return b"%s|%s|" % (source_id, symbol)
+
+
+def peek_symbol(buf) -> bytes | None:
+    """نماد معامله از پیام خام بدون json.loads."""
+    match = _SYMBOL_RE.search(buf, 0, ROUTING_PEEK_BYTES)
+    return match.group(1) if match is not None else None
+
+
+def symbol_allowed(copy_mode: str, allowed_symbols: str | None, symbol: str) -> bool:
+    """همان قواعد فیلتر ProcessSignal در اکسپرت کپی (از جمله جستجوی زیررشته در allowed_symbols)."""
+    if copy_mode == "GOLD_ONLY":
+        return "XAU" in symbol
+    if copy_mode == "SYMBOLS":
+        return bool(allowed_symbols) and symbol in allowed_symbols
+    return True
+
+
+class RoutingTable:
+    """
+    جدول مسیریابی سورس → تاپیک حساب‌های کپی، ساخته شده از SourceCopyMapping های فعال.
+    نتیجه هر (سورس، نماد) یک بار محاسبه و نگهداری می‌شود، بنابراین مسیر انتشار فقط یک دیکشنری می‌خواند.
+    تغییرات تنظیمات فقط ردیف‌های حساب‌های متاثر را دوباره از دیتابیس می‌خوانند.
+    """
+    def __init__(self):
+        # copy_id_str -> [(source_id, copy_mode, allowed_symbols, volume_type, volume_value, max_lot_size)]
+        self._routes: dict[str, list[tuple]] = {}
+        # source_id -> [(topic, copy_mode, allowed_symbols, volume_type, volume_value, max_lot_size)]
+        self._by_source: dict[bytes, list[tuple]] = {}
+        # (source_id, symbol) -> (topics, اندیس آن‌ها در _by_source، تعداد کپی‌های فیلتر شده)
+        self._resolved: dict[tuple[bytes, bytes | None], tuple[tuple[bytes, ...], tuple[int, ...], int]] = {}
+        self._pending: set | None = set()
+        self._wakeup = asyncio.Event()
+        self.published = 0
+        self.filtered = 0
+        self.rebuilds = 0
+
+    @staticmethod
+    def fetch(copy_id_strs=None) -> list[tuple]:
+        """خواندن ردیف‌های مسیریابی از دیتابیس (در ترد جداگانه اجرا شود)."""
+        return database.get_routing_rows(copy_id_strs)
+
+    def apply(self, rows: list[tuple], copy_id_strs=None):
+        """جایگزینی مسیرهای حساب‌های داده شده (None یعنی کل جدول) با ردیف‌های خوانده شده."""
+        if copy_id_strs is None:
+            self._routes.clear()
+        else:
+            for copy_id_str in copy_id_strs:
+                self._routes.pop(copy_id_str, None)
+        for copy_id_str, source_id_str, *params in rows:
+            self._routes.setdefault(copy_id_str, []).append((source_id_str.encode("utf-8"), *params))
+        by_source: dict[bytes, list] = {}
+        for copy_id_str in sorted(self._routes):
+            topic = routed_topic(copy_id_str).encode("utf-8")
+            for source_id, *params in self._routes[copy_id_str]:
+                by_source.setdefault(source_id, []).append((topic, *params))
+        self._by_source = by_source
+        self._resolved.clear()
+        self.rebuilds += 1
+        logger.info(f"Routing table rebuilt for {len(copy_id_strs) if copy_id_strs is not None else 'all'} copy "
+                    f"accounts ({len(self._routes)} copies, {len(self._by_source)} sources).")
+
+    def resolve(self, source_id: bytes, symbol: bytes | None) -> tuple[tuple[bytes, ...], tuple[int, ...]]:
+        """
+        تاپیک‌های حساب‌های کپی که این سیگنال را اجرا می‌کنند (نماد نامشخص یعنی همه کپی‌های سورس)
+        و اندیس آن‌ها در مسیرهای سورس (برای LotSizer).
+        """
+        resolved = self._resolved.get((source_id, symbol))
+        if resolved is None:
+            routes = self._by_source.get(source_id, ())
+            name = symbol.decode("utf-8", "replace") if symbol is not None else None
+            indices = tuple(i for i, route in enumerate(routes)
+                            if name is None or symbol_allowed(route[1], route[2], name))
+            resolved = self._resolved[(source_id, symbol)] = (
+                tuple(routes[i][0] for i in indices), indices, len(routes) - len(indices))
+        self.published += len(resolved[0])
+        self.filtered += resolved[2]
+        return resolved[0], resolved[1]
+
+    def targets(self, source_id: bytes, symbol: bytes | None) -> tuple[bytes, ...]:
+        """تاپیک‌های حساب‌های کپی که این سیگنال را اجرا می‌کنند."""
+        return self.resolve(source_id, symbol)[0]
+
+    def sizing_params(self, source_id: bytes) -> list[tuple]:
+        """(volume_type, volume_value, max_lot_size) کپی‌های یک سورس به ترتیب اندیس‌های resolve."""
+        return [route[3:] for route in self._by_source.get(source_id, ())]
+
+    def mark_changed(self, copy_id_strs):
+        """ثبت حساب‌های تغییر کرده برای بازسازی (روی حلقه asyncio فراخوانی شود)."""
+        if self._pending is not None:
+            if copy_id_strs is None:
+                self._pending = None
+            else:
+                self._pending.update(copy_id_strs)
+        self._wakeup.set()
+
+    async def run(self):
+        """بازسازی تدریجی جدول پس از تغییرات تنظیمات (تغییرات پشت سر هم در یک کوئری ادغام می‌شوند)."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            changed, self._pending = self._pending, set()
+            if changed is not None and not changed:
+                continue
+            try:
+                rows = await asyncio.to_thread(self.fetch, changed)
+                self.apply(rows, changed)
+            except Exception as e:
+                logger.error(f"Routing table rebuild failed: {e}", exc_info=True)
+                self.mark_changed(changed)
+                await asyncio.sleep(5)
+
+    def get_stats(self) -> dict:
+        """آمار جدول مسیریابی."""
+        return {
+            "copies": len(self._routes),
+            "sources": len(self._by_source),
+            "published": self.published,
+            "filtered": self.filtered,
+            "rebuilds": self.rebuilds,
+        }
@@ -3,78 +3,593 @@ import zmq
 import zmq.asyncio
 import json
 import logging
+import os
+import time
+import zlib
+from telegram.helpers import escape_markdown
 from . import database
+from .history_writer import TradeHistoryWriter
+from .config_cache import ConfigCache
+from .latency import LatencyRecorder
+from . import metrics
+from .lanes import LaneQueue, POLICY_BLOCK, POLICY_COALESCE
+from . import liveness
+from .replay import ReplayBuffer
+from .journal import (SignalJournal, JOURNAL_ENABLED, KIND_ACCEPTED, KIND_PUBLISHED, KIND_SKIPPED, KIND_ROUTED,
+                      RESOLVING_KINDS, encode_routed, decode_routed)
+from .dedup import SignalDeduplicator, DEDUP_ENABLED, peek_signal_key, signal_key
+from .conflation import (ModifyConflator, MODIFY_CONFLATION_MS, CONFLATED_EVENT, CLOSING_EVENTS,
+                         peek_conflation_key, conflation_key)
+from .routing import RoutingTable, ROUTED_TOPICS, ROUTED_TOPIC_PREFIX, FRAMED_TOPICS, peek_symbol, source_topic
+from .subscriptions import SubscriptionTable, SKIP_UNSUBSCRIBED
+from .sizing import (LotSizer, SymbolSpecRegistry, CENTRAL_SIZING, SIZED_EVENT, SPEC_EVENT,
+                     peek_open_volume, format_lot)
 
 CONFIG_PORT = "5557"
 SIGNAL_PORT = "5555"
 PUBLISH_PORT = "5556"
 
+# تعداد پردازشگرهای موازی سیگنال (هر شارد صف و ترتیب مستقل خود را دارد)
+PROCESSOR_SHARDS = int(os.getenv("PROCESSOR_SHARDS", "4"))
+
+# خطوط اولویت صف پردازش هر شارد (به ترتیب اولویت): ظرفیت و سیاست پر شدن هر خط
+# trade: سیگنال‌های مستر | report: گزارش‌های اکسپرت کپی | background: heartbeat و خطاهای تشخیصی
+TRADE_LANE_SIZE = int(os.getenv("TRADE_LANE_SIZE", "1000"))
+TRADE_LANE_POLICY = os.getenv("TRADE_LANE_POLICY", POLICY_BLOCK)
+REPORT_LANE_SIZE = int(os.getenv("REPORT_LANE_SIZE", "1000"))
+REPORT_LANE_POLICY = os.getenv("REPORT_LANE_POLICY", POLICY_BLOCK)
+BACKGROUND_LANE_SIZE = int(os.getenv("BACKGROUND_LANE_SIZE", "200"))
+BACKGROUND_LANE_POLICY = os.getenv("BACKGROUND_LANE_POLICY", POLICY_COALESCE)
+REPORT_EVENTS = ("TRADE_CLOSED_COPY",)
+HEARTBEAT_EVENTS = ("PING", "PING_COPY")
+
+# رویدادهای مستر که مستقیماً برای اکسپرت‌های کپی منتشر می‌شوند
+MASTER_EVENTS = ("TRADE_OPEN", "TRADE_MODIFY", "TRADE_CLOSE_MASTER", "TRADE_PARTIAL_CLOSE_MASTER")
+MASTER_EVENTS_BYTES = frozenset(e.encode() for e in MASTER_EVENTS)
+
+# مسیر سریع: ارسال مستقیم فریم خام از PULL به PUB بدون پارس کامل JSON
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+HEADER_PEEK_BYTES = 128
+_EVENT_PREFIX = b'{"event":"'
+_SOURCE_KEY = b'","source_id_str":"'
+
+# حداکثر درخواست‌های تنظیمات که همزمان پردازش می‌شوند
+CONFIG_MAX_CONCURRENCY = int(os.getenv("CONFIG_MAX_CONCURRENCY", "64"))
+
+# تاپیک کنترلی هر حساب کپی برای اعلان فوری تغییر تنظیمات (با جداکننده پایانی
+# تا اشتراک C_A پیام‌های C_AB را دریافت نکند)
+CONFIG_TOPIC_PREFIX = "CFG|"
+
+# مرحله اثرات جانبی (هشدار، لاگ، ذخیره‌سازی) که جدا از مسیر انتشار اجرا می‌شود
+SIDE_EFFECT_QUEUE_SIZE = int(os.getenv("SIDE_EFFECT_QUEUE_SIZE", "5000"))
+
+# حالت اندازه‌گیری: لاگ دوره‌ای صدک‌های تاخیر هر مرحله (زمان تا انتشار، تا هشدار و ...)
+PIPELINE_TIMING = os.getenv("PIPELINE_TIMING", "0") == "1"
+PIPELINE_TIMING_INTERVAL = 60
+
+# سیگنال‌های پذیرفته شده و منتشر نشده ژورنال فقط اگر از این مدت (ثانیه) جوان‌تر باشند پس از ری‌استارت
+# دوباره منتشر می‌شوند؛ باز کردن معامله با قیمت قدیمی خطرناک‌تر از از دست دادن آن است
+JOURNAL_RECOVER_MAX_AGE = float(os.getenv("JOURNAL_RECOVER_MAX_AGE", "30"))
+# پیام‌های منتشر شده جوان‌تر از این مدت (ثانیه) هنگام راه‌اندازی در بافر بازپخش بارگذاری می‌شوند؛ از رکوردهای
+# قدیمی‌تر (و خارج از پنجره تکرار و بازیابی) فقط آخرین seq هر تاپیک خوانده و بدنه‌شان در حافظه نگه داشته نمی‌شود
+JOURNAL_RESTORE_HORIZON = float(os.getenv("JOURNAL_RESTORE_HORIZON", "3600"))
+
 logger = logging.getLogger(__name__)
 telegram_alert_queue: asyncio.Queue = None
 
+
+PROCESSING_LANES = [
+    ("trade", TRADE_LANE_SIZE, TRADE_LANE_POLICY),
+    ("report", REPORT_LANE_SIZE, REPORT_LANE_POLICY),
+    ("background", BACKGROUND_LANE_SIZE, BACKGROUND_LANE_POLICY),
+]
+
+
+def config_topic(copy_id_str: str) -> str:
+    """تاپیک کنترلی تنظیمات یک حساب کپی."""
+    return f"{CONFIG_TOPIC_PREFIX}{copy_id_str}|"
+
+
+class SignalMeta:
+    """متادیتای داخلی هر سیگنال که همراه آن در صف‌ها حرکت می‌کند (منتشر نمی‌شود)."""
+    __slots__ = ("received_at", "fast_published", "published_at", "event", "source", "dedup_checked",
+                 "journal_index")
+
+    def __init__(self, received_at: float | None = None):
+        self.received_at = received_at if received_at is not None else time.perf_counter()
+        self.fast_published = False
+        self.published_at = None
+        self.event = None
+        self.source = None
+        self.dedup_checked = False
+        self.journal_index = 0
+
+
+def _peek_master_header(buf) -> tuple[bytes, bytes] | None:
+    """
+    خواندن سریع event و source_id_str از ابتدای پیام خام اکسپرت مستر.
+    CJsonBuilder در اکسپرت سورس همیشه این دو کلید را اول و بدون فاصله می‌نویسد،
+    بنابراین بدون json.loads می‌توان تاپیک را تشخیص داد. در صورت عدم تطابق None برمی‌گردد.
+    """
+    head = bytes(buf[:HEADER_PEEK_BYTES])
+    if not head.startswith(_EVENT_PREFIX):
+        return None
+    event_end = head.find(b'"', len(_EVENT_PREFIX))
+    if event_end < 0:
+        return None
+    event = head[len(_EVENT_PREFIX):event_end]
+    if event not in MASTER_EVENTS_BYTES or not head.startswith(_SOURCE_KEY, event_end):
+        return None
+    source_start = event_end + len(_SOURCE_KEY)
+    source_end = head.find(b'"', source_start)
+    if source_end <= source_start:
+        return None
+    source_id = head[source_start:source_end]
+    if b"\\" in source_id:
+        return None
+    return event, source_id
+
+class _StageLatencyMetric(metrics.LatencySummary):
+    """نمایش هیستوگرام‌های تاخیر مراحل (LatencyRecorder) به صورت summary به تفکیک نوع رویداد."""
+    def __init__(self, recorder: LatencyRecorder):
+        super().__init__("tradecopier_stage_latency_seconds",
+                         "Time from collector receive to each pipeline stage.", ("stage", "event"))
+        self.recorder = recorder
+
+    def samples(self) -> list[str]:
+        return metrics.summary_samples(self.name, self.labelnames, list(self.recorder.by_event.items()))
+
+
 class ZMQServer:
     """مدیریت سرور ZMQ برای ارتباط با اکسپرت‌ها."""
-    def __init__(self, alert_queue: asyncio.Queue):
+    def __init__(self, alert_queue: asyncio.Queue, num_shards: int = PROCESSOR_SHARDS, history_writer=None):
         self.context = zmq.asyncio.Context()
         self.publish_queue = asyncio.Queue(maxsize=1000)
-        self.processing_queue = asyncio.Queue(maxsize=1000)
+        self.pub_socket = None
+        self.subscriptions = SubscriptionTable()
+        self.fast_path_forwarded = 0
+        self.deduplicator = SignalDeduplicator() if DEDUP_ENABLED else None
+        self.replay = ReplayBuffer()
+        self.journal = SignalJournal() if JOURNAL_ENABLED else None
+        self.conflator = ModifyConflator(self._emit_signal) if MODIFY_CONFLATION_MS > 0 else None
+        self.routing = RoutingTable() if ROUTED_TOPICS else None
+        if ROUTED_TOPICS and FRAMED_TOPICS:
+            logger.warning("FRAMED_TOPICS has no effect with ROUTED_TOPICS=1 (per-copy topics are already framed).")
+        self.symbol_specs = SymbolSpecRegistry()
+        self.sizer = LotSizer(self.routing, self.symbol_specs) if CENTRAL_SIZING and self.routing else None
+        if CENTRAL_SIZING and self.sizer is None:
+            logger.warning("CENTRAL_SIZING needs ROUTED_TOPICS=1 (lots are attached to per-copy topics); disabled.")
+        self.num_shards = max(1, num_shards)
+        self.processing_queues = [LaneQueue(PROCESSING_LANES) for _ in range(self.num_shards)]
+        self.lane_shed_total = 0
+        self.shard_processed = [0] * self.num_shards
+        self.shard_peak_depth = [0] * self.num_shards
+        self.side_effect_queues = [asyncio.Queue(maxsize=SIDE_EFFECT_QUEUE_SIZE) for _ in range(self.num_shards)]
+        self.side_effects_shed = 0
+        self.latency = LatencyRecorder()
+        # در حالت چندپروسه‌ای نویسنده راه دور (ارسال به پروسه ذخیره‌سازی) جایگزین می‌شود
+        self.history_writer = history_writer or TradeHistoryWriter(alert_queue=alert_queue, latency=self.latency)
+        self.config_cache = ConfigCache()
+        database.register_config_change_listener(self.config_cache.invalidate)
+        self.config_versions: dict[str, int] = {}
+        # شمارنده نسخه اعلان‌ها در حافظه است؛ epoch با هر راه‌اندازی تغییر می‌کند تا اکسپرت نسخه‌های
+        # شروع شده از 1 پس از ری‌استارت سرور را با اعلان تکراری اشتباه نگیرد
+        self.config_epoch = time.time_ns()
+        self._loop = None
+        self._background_tasks = set()
+        database.register_config_change_listener(self._on_config_changed)
+        self.liveness = liveness.LivenessRegistry(alert_queue=alert_queue)
+        liveness.fleet_registry = self.liveness
         global telegram_alert_queue
         telegram_alert_queue = alert_queue
-        logger.info("سرور ZMQ با صف هشدار تلگرام مقداردهی شد.")
+        self.register_metrics(metrics.REGISTRY)
+        logger.info(f"سرور ZMQ با صف هشدار تلگرام و {self.num_shards} شارد پردازشگر مقداردهی شد.")
 
+    def _shard_for(self, signal_data: dict) -> int:
+        """
+        انتخاب شارد پردازشگر برای یک سیگنال.
+        کلید پارتیشن (شناسه اکسپرت + position_id) تضمین می‌کند که رویدادهای
+        یک پوزیشن همیشه به یک شارد رفته و ترتیب آن‌ها حفظ شود.
+        """
+        if self.num_shards == 1:
+            return 0
+        owner = signal_data.get("copy_id_str") or signal_data.get("source_id_str") or ""
+        position_id = signal_data.get("position_id")
+        key = f"{owner}|{position_id}" if position_id is not None else owner
+        return zlib.crc32(key.encode("utf-8")) % self.num_shards
+
+    @staticmethod
+    def _lane_for(event: str | None, source: str | None) -> tuple[str, tuple | None]:
+        """
+        انتخاب خط اولویت و کلید ادغام یک سیگنال.
+        heartbeatهای پشت سر هم یک اکسپرت در خط background با آخرین نسخه جایگزین می‌شوند.
+        """
+        if event in MASTER_EVENTS:
+            return "trade", None
+        if event in REPORT_EVENTS:
+            return "report", None
+        if event in HEARTBEAT_EVENTS:
+            return "background", (event, source)
+        return "background", None
+
+    async def _dispatch(self, signal_data: dict, meta: SignalMeta | None = None):
+        """قرار دادن سیگنال (به همراه متادیتا) در خط اولویت صف شارد مربوطه."""
+        shard = self._shard_for(signal_data)
+        queue = self.processing_queues[shard]
+        meta = meta or SignalMeta()
+        meta.event = signal_data.get("event")
+        meta.source = signal_data.get("source_id_str") or signal_data.get("copy_id_str")
+        metrics.SIGNALS_TOTAL.inc(event=meta.event or "UNKNOWN", source=meta.source or "")
+        copy_id_str = signal_data.get("copy_id_str")
+        if copy_id_str:
+            self.liveness.touch(copy_id_str, "copy", meta.event)
+        else:
+            self.liveness.touch(signal_data.get("source_id_str"), "source", meta.event)
+        lane, key = self._lane_for(meta.event, meta.source)
+        if not await queue.put((signal_data, meta), lane, key):
+            # [بهبود عملکرد] خط کم‌اولویت پر است؛ سیگنال دور ریخته می‌شود تا ورودی مسدود نشود
+            self.lane_shed_total += 1
+            if self.lane_shed_total % 100 == 1:
+                logger.warning(f"Processing lane '{lane}' full on shard {shard}, shedding.",
+                               extra={"event_type": meta.event, "source_id": meta.source,
+                                      "details": self.get_lane_stats()})
+            return
+        depth = queue.qsize()
+        if depth > self.shard_peak_depth[shard]:
+            self.shard_peak_depth[shard] = depth
+
+    def get_shard_stats(self) -> list[dict]:
+        """آمار عمق صف و تعداد پردازش هر شارد."""
+        return [
+            {
+                "shard": i,
+                "depth": q.qsize(),
+                "peak_depth": self.shard_peak_depth[i],
+                "capacity": q.maxsize,
+                "processed": self.shard_processed[i],
+                "side_effects_depth": self.side_effect_queues[i].qsize(),
+                "lanes": q.get_stats(),
+            }
+            for i, q in enumerate(self.processing_queues)
+        ]
+
+    def get_lane_stats(self) -> dict:
+        """جمع شمارنده‌های هر خط اولویت روی همه شاردها (عمق، دور ریخته، ادغام شده)."""
+        totals = {}
+        for queue in self.processing_queues:
+            for lane, stats in queue.get_stats().items():
+                total = totals.setdefault(lane, {"depth": 0, "enqueued": 0, "shed": 0, "coalesced": 0,
+                                                 "policy": stats["policy"]})
+                for field in ("depth", "enqueued", "shed", "coalesced"):
+                    total[field] += stats[field]
+        return totals
+
+    def register_metrics(self, registry: metrics.Registry):
+        """ثبت متریک‌های لحظه‌ای سرور (عمق صف‌ها، کش، بافر تاریخچه و تاخیر مراحل) در رجیستری."""
+        shard_labels = lambda field: {(str(s["shard"]),): s[field] for s in self.get_shard_stats()}
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_processing_queue_depth", "Signals waiting in each processor shard queue.",
+            lambda: shard_labels("depth"), ("shard",)))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_lane_depth", "Signals waiting in each priority lane (all shards).",
+            lambda: {(lane,): stats["depth"] for lane, stats in self.get_lane_stats().items()}, ("lane",)))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_lane_shed_total", "Signals dropped because their priority lane was full.",
+            lambda: {(lane,): stats["shed"] for lane, stats in self.get_lane_stats().items()},
+            ("lane",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_lane_coalesced_total", "Signals replaced in place by a newer one with the same key.",
+            lambda: {(lane,): stats["coalesced"] for lane, stats in self.get_lane_stats().items()},
+            ("lane",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_side_effects_queue_depth", "Side-effect jobs waiting in each shard.",
+            lambda: shard_labels("side_effects_depth"), ("shard",)))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_publish_queue_depth", "Signals waiting to be published.",
+            lambda: self.publish_queue.qsize()))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_telegram_queue_depth", "Alerts waiting to be sent to Telegram.",
+            lambda: telegram_alert_queue.qsize() if telegram_alert_queue else 0))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_history_pending", "Trade history rows waiting for group commit.",
+            self.history_writer.pending))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_history_rows_total", "Trade history rows by outcome.",
+            lambda: {(k.removeprefix("rows_"),): v for k, v in self.history_writer.get_stats().items()
+                     if k.startswith("rows_")},
+            ("outcome",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_config_cache_total", "Config cache lookups by result.",
+            lambda: {(k,): v for k, v in self.config_cache.get_stats().items() if k != "entries"},
+            ("result",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_fast_path_forwarded_total", "Master signals forwarded by the collector fast path.",
+            lambda: self.fast_path_forwarded, type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_side_effects_shed_total", "Side-effect jobs dropped because the queue was full.",
+            lambda: self.side_effects_shed, type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_eas", "Known EAs by kind and liveness state.",
+            self._liveness_counts, ("kind", "state")))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_duplicates_dropped_total", "Re-sent master signals dropped by the dedup index.",
+            lambda: {(source,): n for source, n in self.deduplicator.duplicates_by_source().items()}
+            if self.deduplicator else {},
+            ("source",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_replay_messages_total", "Messages resent through GET_MISSED.",
+            lambda: self.replay.replayed, type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_journal_records_total", "Records appended to the signal journal.",
+            lambda: self.journal.appended if self.journal else 0, type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_modifies_conflated_total", "TRADE_MODIFY signals replaced by a newer one for the same position.",
+            lambda: {(source.decode("utf-8", "replace"),): n for source, n in self.conflator.conflated_by_source.items()}
+            if self.conflator else {},
+            ("source",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_routed_total", "Per-copy deliveries of routed signals by outcome (published or filtered).",
+            lambda: {("published",): self.routing.published, ("filtered",): self.routing.filtered}
+            if self.routing else {},
+            ("outcome",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_central_sizing_total", "TRADE_OPEN lot computations by outcome (sized per copy or symbol spec missing).",
+            lambda: {("sized",): self.sizer.sized, ("missing_spec",): self.sizer.missing_spec}
+            if self.sizer else {},
+            ("outcome",), type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_topic_subscribers", "Direct subscribers of each source topic prefix (control and per-copy topics excluded).",
+            lambda: {(prefix.decode("utf-8", "replace"),): n
+                     for prefix, n in self.subscriptions.subscriber_counts(
+                         (CONFIG_TOPIC_PREFIX.encode(), ROUTED_TOPIC_PREFIX.encode())).items()},
+            ("topic",)))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_publish_skipped_total", "Signal publishes skipped because the topic had no subscribers.",
+            lambda: self.subscriptions.skipped, type_name="counter"))
+        registry.register(metrics.CallbackMetric(
+            "tradecopier_publish_hwm_drops_total", "Messages dropped for at least one slow subscriber at the send high-water mark.",
+            lambda: self.subscriptions.hwm_drops, type_name="counter"))
+        registry.register(_StageLatencyMetric(self.latency))
+
+    def _liveness_counts(self) -> dict:
+        counts = {}
+        for state in self.liveness.eas.values():
+            key = (state.kind, "alive" if state.alive else "silent")
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _record_timing(self, stage: str, meta: SignalMeta, at: float):
+        """ثبت فاصله زمانی دریافت تا یک مرحله در هیستوگرام‌های تاخیر."""
+        self.latency.record(stage, meta.event, meta.source, at - meta.received_at)
+
+    def get_pipeline_timing_report(self) -> dict:
+        """گزارش p50/p90/p99/max (میلی‌ثانیه) هر مرحله به تفکیک نوع رویداد و سورس."""
+        return self.latency.report()
+
+    async def start_pipeline_timing_reporter(self):
+        """لاگ دوره‌ای گزارش زمان‌بندی مراحل در حالت اندازه‌گیری."""
+        if not PIPELINE_TIMING:
+            return
+        logger.info("Pipeline timing mode enabled.")
+        while True:
+            await asyncio.sleep(PIPELINE_TIMING_INTERVAL)
+            logger.info("Pipeline timing report.", extra={"details": self.get_pipeline_timing_report()})
 
 
-    async def start_config_responder(self):
+    def _on_config_changed(self, copy_id_strs: set):
         """
-        پاسخگویی غیرمسدود (non-blocking) به درخواست‌های تنظیمات (Config)
-        این تابع به درخواست‌های ZMQ.REP گوش می‌دهد و با فراخوانی
-        تابع دیتابیس در یک ترد جداگانه، تنظیمات را برای اکسپرت کپی ارسال می‌کند.
+        شنونده تغییرات دیتابیس (پس از commit). ممکن است از ترد دیگری فراخوانی شود،
+        بنابراین ارسال اعلان به صورت امن روی حلقه asyncio زمان‌بندی می‌شود.
         """
-        socket = self.context.socket(zmq.REP)
-        socket.bind(f"tcp://*:{CONFIG_PORT}")
-        logger.info(f"Config Responder (REP) listening on port {CONFIG_PORT}...")
-        
-        while True:
-            log_extra = {}
-            request_data = {}
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._schedule_config_notices, set(copy_id_strs))
+
+    def _schedule_config_notices(self, copy_id_strs: set):
+        if self.routing is not None:
+            self.routing.mark_changed(copy_id_strs)
+        task = asyncio.ensure_future(self._publish_config_notices(copy_id_strs))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _publish_config_notices(self, copy_id_strs: set):
+        """انتشار اعلان نسخه‌دار CONFIG_CHANGED روی تاپیک کنترلی هر حساب کپی."""
+        if self.pub_socket is None:
+            return
+        for copy_id_str in sorted(copy_id_strs):
+            version = self.config_versions.get(copy_id_str, 0) + 1
+            self.config_versions[copy_id_str] = version
+            notice = {"event": "CONFIG_CHANGED", "copy_id_str": copy_id_str,
+                      "epoch": self.config_epoch, "version": version}
             try:
-                request_raw = await socket.recv_string()
-                request_data = json.loads(request_raw)
-                copy_id_str = request_data.get("copy_id_str")
+                await self.subscriptions.send(self.pub_socket, config_topic(copy_id_str).encode("utf-8"),
+                                              json.dumps(notice, separators=(",", ":")).encode("utf-8"))
+                logger.info(f"Config change notice published (v{version}).",
+                            extra={"copy_id": copy_id_str, "event_type": "CONFIG_CHANGED"})
+            except Exception as e:
+                logger.error(f"Error publishing config change notice: {e}", extra={"copy_id": copy_id_str})
 
-                log_extra = {
-                    "component": "ConfigResponder",
-                    "command": request_data.get("command"),
-                    "copy_id": copy_id_str
-                }
+    async def _handle_config_request(self, socket, envelope: list, request_raw: bytes, semaphore: asyncio.Semaphore):
+        """پردازش یک درخواست تنظیمات و ارسال پاسخ با همان پاکت (identity) ROUTER."""
+        log_extra = {}
+        request_data = {}
+        try:
+            request_data = json.loads(request_raw)
+            copy_id_str = request_data.get("copy_id_str")
+
+            log_extra = {
+                "component": "ConfigResponder",
+                "command": request_data.get("command"),
+                "copy_id": copy_id_str
+            }
+            
+            logger.info(f"Config request received.", extra=log_extra)
+
+            if request_data.get("command") == "GET_CONFIG":
+                if not copy_id_str:
+                    raise ValueError("copy_id_str is missing")
                 
-                logger.info(f"Config request received.", extra=log_extra)
+                # [بهبود عملکرد] پاسخ از پیش سریال‌شده از کش؛ فقط در نبود آن دیتابیس (در ترد جداگانه) خوانده می‌شود
+                frames = [await self.config_cache.get(copy_id_str)]
+                metrics.CONFIG_REQUESTS_TOTAL.inc(command="GET_CONFIG", result="ok")
+                logger.info(f"Sending config for {copy_id_str} (cached).", extra=log_extra)
+            elif request_data.get("command") == "GET_MISSED":
+                # فقط پیام‌های شکاف از بافر حلقوی (بدون دریافت مجدد کل تنظیمات)
+                frames = self.replay.missed_frames(request_data)
+                metrics.CONFIG_REQUESTS_TOTAL.inc(command="GET_MISSED", result="ok")
+                logger.info(f"Replaying {len(frames) - 1} missed messages.",
+                            extra={**log_extra, "source_id": request_data.get("source_id_str"),
+                                   "details": {"last_seq": request_data.get("last_seq")}})
+            else:
+                raise ValueError("Unknown command")
+        
+        except Exception as e:
+            log_extra["error"] = str(e)
+            log_extra["raw_request"] = request_data # ثبت درخواست کامل در صورت خطا
+            logger.error(f"Config request failed: {e}", extra=log_extra)
+            metrics.CONFIG_REQUESTS_TOTAL.inc(command=str(request_data.get("command")) if isinstance(request_data, dict) else "", result="error")
+            frames = [json.dumps({"status": "ERROR", "message": str(e)}, separators=(",", ":")).encode("utf-8")]
 
-                if request_data.get("command") == "GET_CONFIG":
-                    if not copy_id_str:
-                        raise ValueError("copy_id_str is missing")
-                    
-                    # [بهبود عملکرد] فراخوانی مسدودکننده دیتابیس به یک ترد جداگانه منتقل شد
-                    config_data = await asyncio.to_thread(
-                        database.get_config_for_copy_ea, 
-                        copy_id_str
-                    )
-                    
-                    response = {"status": "OK", "config": config_data}
-                    logger.info(f"Sending config for {copy_id_str} (non-blocking).", extra=log_extra)
-                else:
-                    raise ValueError("Unknown command")
-            
-            except Exception as e:
-                log_extra["error"] = str(e)
-                log_extra["raw_request"] = request_data # ثبت درخواست کامل در صورت خطا
-                logger.error(f"Config request failed: {e}", extra=log_extra)
-                response = {"status": "ERROR", "message": str(e)}
-            
-            await socket.send_json(response)
+        try:
+            await socket.send_multipart(envelope + frames)
+        except Exception as e:
+            logger.error(f"Error sending config reply: {e}", extra=log_extra)
+        finally:
+            semaphore.release()
 
+    async def start_config_responder(self):
+        """
+        پاسخگویی همزمان (concurrent) به درخواست‌های تنظیمات (Config)
+        این تابع با سوکت ZMQ.ROUTER چندین درخواست را همزمان (تا سقف CONFIG_MAX_CONCURRENCY)
+        پردازش کرده و پاسخ هر درخواست را با identity فرستنده برمی‌گرداند؛ بنابراین
+        کندی یک درخواست بقیه اکسپرت‌ها را مسدود نمی‌کند. کلاینت‌های REQ بدون تغییر کار می‌کنند.
+        """
+        socket = self.context.socket(zmq.ROUTER)
+        socket.bind(f"tcp://*:{CONFIG_PORT}")
+        logger.info(f"Config Responder (ROUTER) listening on port {CONFIG_PORT}...")
+        semaphore = asyncio.Semaphore(CONFIG_MAX_CONCURRENCY)
 
+        try:
+            await asyncio.to_thread(self.config_cache.warm)
+        except Exception as e:
+            logger.error(f"Config cache pre-warm failed: {e}", exc_info=True)
 
+        while True:
+            try:
+                frames = await socket.recv_multipart()
+            except Exception as e:
+                logger.error(f"Error receiving config request: {e}")
+                continue
+            # پاکت REQ: [identity, b"", body]
+            if len(frames) < 2:
+                logger.warning("Malformed config request envelope dropped.")
+                continue
+            await semaphore.acquire()
+            task = asyncio.create_task(self._handle_config_request(socket, frames[:-1], frames[-1], semaphore))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+
+
+
+    def _drop_duplicate(self, key: tuple) -> bool:
+        """بررسی تکراری بودن سیگنال مستر (ارسال مجدد از صف retry اکسپرت سورس)."""
+        if not self.deduplicator.is_duplicate(key):
+            return False
+        logger.debug("Duplicate master signal dropped.",
+                     extra={"source_id": key[0].decode("utf-8", "replace"), "event_type": key[1].decode("ascii"),
+                            "position_id": key[2].decode("ascii")})
+        return True
+
+    async def _publish(self, socket, source_id: bytes, body, symbol: bytes | None, ref: int = 0,
+                       volume: float | None = None):
+        """
+        انتشار یک سیگنال مستر روی تاپیک سورس (با FRAMED_TOPICS همراه با نماد)، یا در حالت مسیریابی (ROUTED_TOPICS) روی تاپیک اختصاصی
+        هر حساب کپی که آن را اجرا می‌کند. هر تاپیک شماره seq و بافر بازپخش خود را دارد.
+        با CENTRAL_SIZING حجم هر کپی برای TRADE_OPEN (volume داده شده) به عنوان copy_volume افزوده می‌شود.
+        body می‌تواند دیکشنری سیگنال باشد که فقط در صورت وجود مشترک برای یکی از تاپیک‌ها سریال می‌شود.
+        """
+        lots = None
+        indices = ()
+        if self.routing is None:
+            topics = (source_topic(source_id, symbol),)
+        else:
+            topics, indices = self.routing.resolve(source_id, symbol)
+        if SKIP_UNSUBSCRIBED:
+            # [بهبود عملکرد] تاپیک‌های بدون مشترک نه سریال می‌شوند، نه seq می‌گیرند و نه ارسال می‌شوند
+            live = [i for i, topic in enumerate(topics) if self.subscriptions.is_live(topic)]
+            if len(live) != len(topics):
+                self.subscriptions.skipped += len(topics) - len(live)
+                topics = [topics[i] for i in live]
+                indices = [indices[i] for i in live] if indices else indices
+        if not topics:
+            # سیگنال منتشر نشده (بدون مشترک زنده یا حساب مقصد) هم در ژورنال ثبت می‌شود تا در بررسی آفلاین
+            # دیده شود و رکورد ACCEPTED آن پس از ری‌استارت منتشر نشده به حساب نیاید
+            if self.journal is not None:
+                if ref:
+                    payload = b""
+                elif isinstance(body, dict):
+                    payload = json.dumps(body).encode("utf-8")
+                else:
+                    payload = body
+                self.journal.append(KIND_SKIPPED, source_id, payload, ref=ref)
+            return
+        if isinstance(body, dict):
+            body = json.dumps(body).encode("utf-8")
+        if self.sizer is not None and volume is not None and topics:
+            lots = self.sizer.lots(source_id, symbol, volume, indices)
+        if lots is not None:
+            head = bytes(body).rstrip()
+            lots = lots if head.endswith(b"}") else None
+            head = head[:-1]
+        # [بهبود عملکرد] در حالت مسیریابی به جای یک رکورد به ازای هر کپی، یک رکورد ROUTED با لیست کپی‌ها ثبت می‌شود
+        routes = [] if self.routing is not None and self.journal is not None else None
+        if routes is not None:
+            base = bytes(body).rstrip()
+            sequenced = base.endswith(b"}")
+        for i, topic in enumerate(topics):
+            payload = body
+            lot = None
+            if lots is not None and lots[i] is not None:
+                lot = format_lot(lots[i])
+                payload = b'%s,"copy_volume":%s}' % (head, lot)
+            stamped = self.replay.stamp(topic, payload)
+            await self.subscriptions.send(socket, topic, stamped)
+            if routes is not None:
+                routes.append([topic.decode("utf-8"), self.replay.last_seq(topic) if sequenced else 0,
+                               indices[i] if indices else None, lot.decode("ascii") if lot is not None else None])
+            elif self.journal is not None:
+                self.journal.append(KIND_PUBLISHED, topic, stamped, ref=ref)
+        if routes:
+            self.journal.append(KIND_ROUTED, source_id, encode_routed(self.replay.epoch, routes, base), ref=ref)
+
+    async def _fast_publish(self, source_id: bytes, buf, meta: SignalMeta):
+        """[بهبود عملکرد] انتشار فریم اصلی بدون decode/encode مجدد (فقط با افزودن seq)."""
+        symbol = peek_symbol(buf) if self.routing is not None or FRAMED_TOPICS else None
+        volume = peek_open_volume(buf) if self.sizer is not None else None
+        await self._publish(self.pub_socket, source_id, buf, symbol, volume=volume)
+        self.fast_path_forwarded += 1
+        meta.fast_published = True
+        meta.published_at = time.perf_counter()
+
+    async def _emit_signal(self, item: tuple):
+        """
+        ادامه مسیر یک سیگنال پذیرفته شده: انتشار از مسیر سریع (در صورت امکان) یا ثبت در ژورنال،
+        و سپس ارسال به صف شارد. اصلاحات ادغام شده در پایان پنجره از همین مسیر عبور می‌کنند.
+        """
+        buf, header, signal_data, meta = item
+        if header is not None and not meta.fast_published:
+            await self._fast_publish(header[1], buf, meta)
+        # سیگنال مستری که هنوز منتشر نشده ثبت می‌شود تا در صورت کرش قابل بازیابی باشد
+        if (self.journal is not None and not meta.fast_published
+                and signal_data.get("event") in MASTER_EVENTS and signal_data.get("source_id_str")):
+            meta.journal_index = self.journal.append(
+                KIND_ACCEPTED, signal_data["source_id_str"].encode("utf-8"), buf)
+        if meta.fast_published:
+            meta.event = signal_data.get("event")
+            meta.source = signal_data.get("source_id_str")
+            self._record_timing("publish_send", meta, meta.published_at)
+        await self._dispatch(signal_data, meta)
 
     async def start_signal_collector(self):
         """جمع‌آوری سیگنال‌ها و گزارش‌ها از اکسپرت‌ها."""
@@ -83,30 +598,101 @@ class ZMQServer:
         logger.info(f"Signal Collector (PULL) listening on port {SIGNAL_PORT}...")
         while True:
             try:
-                signal_raw = await socket.recv_string()
-                signal_data = json.loads(signal_raw)
-                await self.processing_queue.put(signal_data)
+                frame = await socket.recv(copy=False)
+                meta = SignalMeta()
+                header = None
+                if FAST_PATH_ENABLED and self.pub_socket is not None:
+                    header = _peek_master_header(frame.buffer)
+                    if header is not None:
+                        if self.deduplicator is not None:
+                            key = peek_signal_key(frame.buffer, *header)
+                            if key is not None:
+                                meta.dedup_checked = True
+                                if self._drop_duplicate(key):
+                                    continue
+                        ckey = None
+                        if self.conflator is not None:
+                            ckey = peek_conflation_key(frame.buffer, header[1])
+                        if ckey is None or header[0] != b"TRADE_MODIFY":
+                            if ckey is not None:
+                                await self.conflator.barrier(ckey, header[0].decode("ascii") in CLOSING_EVENTS)
+                            await self._fast_publish(header[1], frame.buffer, meta)
+                # پارس کامل فقط برای شاخه جانبی (هشدار، لاگ، ذخیره‌سازی)
+                raw = frame.bytes
+                signal_data = json.loads(raw)
+                if self.deduplicator is not None and not meta.dedup_checked:
+                    key = signal_key(signal_data)
+                    if key is not None and self._drop_duplicate(key):
+                        continue
+                item = (raw, header, signal_data, meta)
+                if self.conflator is not None and not meta.fast_published:
+                    event = signal_data.get("event")
+                    ckey = conflation_key(signal_data) if event in MASTER_EVENTS else None
+                    if ckey is not None:
+                        if event == CONFLATED_EVENT:
+                            # [بهبود عملکرد] اصلاحات پشت سر هم یک پوزیشن فقط با آخرین SL/TP ارسال می‌شوند
+                            await self.conflator.submit(ckey, item)
+                            continue
+                        await self.conflator.barrier(ckey, event in CLOSING_EVENTS)
+                await self._emit_signal(item)
             except Exception as e:
                 logger.error(f"Error receiving signal: {e}")
 
 
 
 
-    async def start_signal_processor(self):
+    async def start_signal_processor(self, shard: int = 0):
+        """
+        مرحله انتشار (حساس به تاخیر) برای یک شارد.
+        سیگنال‌های مستر بلافاصله به صف انتشار (publish_queue) می‌روند، مگر اینکه
+        قبلاً از مسیر سریع منتشر شده باشند. سپس همه سیگنال‌ها بدون انتظار به مرحله
+        اثرات جانبی همان شارد سپرده می‌شوند؛ عقب ماندن آن مرحله هرگز انتشار را کند نمی‌کند.
+        """
+        queue = self.processing_queues[shard]
+        side_queue = self.side_effect_queues[shard]
+        logger.info(f"Signal Processor task started (shard {shard}). Waiting for signals...")
+
+        while True:
+            signal_data, meta = await queue.get()
+            self._record_timing("processor_dequeue", meta, time.perf_counter())
+            try:
+                if signal_data.get("event") in MASTER_EVENTS and not meta.fast_published:
+                    await self.publish_queue.put((signal_data, meta))
+                    self._record_timing("publish_enqueue", meta, time.perf_counter())
+                try:
+                    side_queue.put_nowait((signal_data, meta))
+                except asyncio.QueueFull:
+                    # [بهبود عملکرد] مرحله جانبی بار اضافه را دور می‌ریزد تا مسیر کپی مسدود نشود
+                    self.side_effects_shed += 1
+                    if self.side_effects_shed % 100 == 1:
+                        logger.warning(
+                            f"Side-effects stage full on shard {shard}, shedding (total shed: {self.side_effects_shed}).",
+                            extra={"event_type": signal_data.get("event"), "details": signal_data}
+                        )
+            except Exception as e:
+                logger.critical(f"Critical unhandled error in publish stage: {e}", exc_info=True,
+                                extra={"raw_signal_on_error": signal_data})
+            finally:
+                self.shard_processed[shard] += 1
+                queue.task_done()
+
+
+
+
+    async def start_side_effects_worker(self, shard: int = 0):
         """
-        پردازشگر اصلی سیگنال‌ها از صف داخلی.
-        این تابع سیگنال‌ها را از صف برداشته، نوع آن‌ها را تشخیص داده،
-        در صورت نیاز به صف انتشار (publish_queue) یا صف تلگرام (telegram_alert_queue) ارسال کرده
+        مرحله اثرات جانبی (best-effort) برای یک شارد.
+        این تابع سیگنال‌ها را پس از انتشار برداشته، لاگ و هشدار تلگرام را می‌سازد
         و گزارش‌های دریافتی را به صورت غیرمسدود (non-blocking) در دیتابیس ذخیره می‌کند.
         """
-        logger.info("Signal Processor task started. Waiting for signals...")
+        queue = self.side_effect_queues[shard]
+        logger.info(f"Side-effects worker started (shard {shard}).")
 
         while True:
-            signal_data = None
+            signal_data, meta = await queue.get()
             log_extra = {} 
 
             try:
-                signal_data = await self.processing_queue.get()
                 event_type = signal_data.get("event", "UNKNOWN_EVENT")
 
                 log_extra = {
@@ -124,10 +710,8 @@ class ZMQServer:
                     ea_type = "SourceEA" if event_type == "PING" else "CopyEA"
                     logger.info(f"{ea_type} ({log_extra['ea_id']}) is alive (PING received).", extra=log_extra)
 
-                elif event_type in ["TRADE_OPEN", "TRADE_MODIFY", "TRADE_CLOSE_MASTER", "TRADE_PARTIAL_CLOSE_MASTER"]:
+                elif event_type in MASTER_EVENTS:
                     logger.info(f"Processing Master signal: {event_type}", extra=log_extra)
-                    await self.publish_queue.put(signal_data)
-                    logger.debug(f"Signal {event_type} put on publish_queue.", extra=log_extra)
 
                     msg = None
                     if event_type == "TRADE_OPEN":
@@ -167,6 +751,7 @@ class ZMQServer:
                         
                     if msg and telegram_alert_queue:
                         await telegram_alert_queue.put(msg)
+                        self._record_timing("alert_enqueue", meta, time.perf_counter())
                         logger.debug(f"Telegram alert sent for {event_type}.", extra=log_extra)
 
                 elif event_type == "TRADE_CLOSED_COPY":
@@ -179,27 +764,16 @@ class ZMQServer:
                     })
                     
                     logger.info(f"Processing Copy close report.", extra=log_extra)
-                    
-                    try:
-                        # [بهبود عملکرد] فراخوانی مسدودکننده دیتابیس به یک ترد جداگانه منتقل شد
-                        await asyncio.to_thread(
-                            database.save_trade_history,
-                            copy_id_str=log_extra['copy_id'],
-                            source_id_str=log_extra['source_id'],
-                            symbol=log_extra['symbol'],
-                            profit=profit,
-                            source_ticket=source_ticket
-                        )
-                        logger.info("Trade history saved to DB (non-blocking).", extra=log_extra)
-                        
-                    except ValueError as ve: 
-                        logger.error(f"Failed to save trade history: {ve}", extra=log_extra)
-                        if telegram_alert_queue:
-                            await telegram_alert_queue.put(f"⚠️ *خطای ذخیره تاریخچه*\n\n{escape_markdown(str(ve), 2)}")
-                    except Exception as db_e: 
-                        logger.error(f"Critical DB error saving trade history: {db_e}", exc_info=True, extra=log_extra)
-                        if telegram_alert_queue:
-                            await telegram_alert_queue.put(f"🚨 *خطای شدید دیتابیس*\n\n عدم موفقیت در ذخیره تاریخچه معامله `{log_extra['copy_id']}` از سورس `{log_extra['source_id']}`. جزئیات در لاگ سرور.")
+
+                    # [بهبود عملکرد] ذخیره در بافر write-behind؛ ذخیره گروهی در یک تراکنش انجام می‌شود
+                    await self.history_writer.submit(
+                        copy_id_str=log_extra['copy_id'],
+                        source_id_str=log_extra['source_id'],
+                        symbol=log_extra['symbol'],
+                        profit=profit,
+                        source_ticket=source_ticket,
+                        received_at=meta.received_at
+                    )
 
                     emoji = "🔻" if profit < 0 else "✅"
                     msg = (
@@ -214,6 +788,15 @@ class ZMQServer:
                         await telegram_alert_queue.put(msg)
                         logger.debug("Telegram alert sent for TRADE_CLOSED_COPY.", extra=log_extra)
 
+                elif event_type == SPEC_EVENT:
+                    # مشخصات حجم نماد گزارش شده توسط اکسپرت کپی (برای محاسبه مرکزی حجم)
+                    self.symbol_specs.update(
+                        signal_data.get("symbol", ""),
+                        float(signal_data.get("volume_step", 0.0)),
+                        float(signal_data.get("volume_min", 0.0)),
+                        float(signal_data.get("volume_max", 0.0)),
+                    )
+
                 elif event_type == "EA_ERROR":
                     error_message = signal_data.get('message', 'No details provided.')
                     log_extra['error_message'] = error_message
@@ -249,40 +832,177 @@ class ZMQServer:
                      await telegram_alert_queue.put(f"🆘 *خطای بحرانی در پردازشگر سیگنال*\n\n خطای پیش‌بینی نشده: `{escape_markdown(str(e), 2)}`. لطفاً لاگ‌های سرور را فوراً بررسی کنید.")
 
             finally:
-                if self.processing_queue:
-                     self.processing_queue.task_done()
+                queue.task_done()
 
 
 
 
     async def start_signal_publisher(self):
-        """انتشار سیگنال‌ها برای اکسپرت‌های اسلیو."""
-        socket = self.context.socket(zmq.PUB)
+        """
+        انتشار سیگنال‌ها برای اکسپرت‌های اسلیو.
+        هر پیام با seq افزایشی تاپیک خود مهر شده و در بافر بازپخش نگهداری می‌شود (GET_MISSED).
+        """
+        socket = self.context.socket(zmq.XPUB)
+        self.subscriptions.configure(socket)
         socket.bind(f"tcp://*:{PUBLISH_PORT}")
-        logger.info(f"Signal Publisher (PUB) listening on port {PUBLISH_PORT}...")
+        self.pub_socket = socket
+        # جدول اشتراک‌ها از فریم‌های subscribe/unsubscribe همین سوکت ساخته می‌شود
+        reader = asyncio.ensure_future(self.subscriptions.run(socket))
+        self._background_tasks.add(reader)
+        reader.add_done_callback(self._background_tasks.discard)
+        logger.info(f"Signal Publisher (XPUB) listening on port {PUBLISH_PORT}...")
         while True:
             try:
-                signal_data = await self.publish_queue.get()
+                signal_data, meta = await self.publish_queue.get()
                 topic = signal_data.get("source_id_str")
                 if not topic:
                     logger.warning(f"Signal has no 'source_id_str' to use as topic: {signal_data}")
                     continue
-                logger.info(f"Publishing on topic '{topic}': {signal_data}")
-                await socket.send_string(topic, flags=zmq.SNDMORE)
-                await socket.send_json(signal_data)
+                # [بهبود عملکرد] فرمت دیکشنری سیگنال به ترد لاگ (یا در صورت غیرفعال بودن سطح، هرگز) موکول می‌شود
+                logger.info("Publishing on topic '%s': %s", topic, signal_data)
+                # ارسال اتمیک چندبخشی تا با پیام‌های مسیر سریع در هم نیامیزد
+                symbol = signal_data.get("symbol")
+                await self._publish(socket, topic.encode("utf-8"), signal_data,
+                                    symbol.encode("utf-8") if isinstance(symbol, str) else None,
+                                    ref=meta.journal_index,
+                                    volume=signal_data.get("volume") if signal_data.get("event") == SIZED_EVENT else None)
+                meta.published_at = time.perf_counter()
+                self._record_timing("publish_send", meta, meta.published_at)
             except Exception as e:
                 logger.error(f"Error publishing signal: {e}")
             finally:
                 self.publish_queue.task_done()
 
+    @staticmethod
+    def _journal_payload(record) -> bytes:
+        """بدنه سیگنال یک رکورد ژورنال (بدون سرآیند رکوردهای ROUTED)."""
+        if record.kind == KIND_ROUTED:
+            return decode_routed(record.payload)[1]
+        return record.payload
+
+    @staticmethod
+    def _published_messages(records: list):
+        """پیام‌های مهر شده منتشر شده به ترتیب ژورنال؛ رکوردهای ROUTED به پیام هر کپی باز می‌شوند."""
+        for record in records:
+            if record.kind == KIND_PUBLISHED:
+                yield record.topic, record.payload
+            elif record.kind == KIND_ROUTED:
+                try:
+                    header, base = decode_routed(record.payload)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                head = base[:-1]
+                for topic, seq, _, lot in header["routes"]:
+                    if not seq:
+                        continue
+                    payload = b'%s,"copy_volume":%s' % (head, lot.encode("ascii")) if lot is not None else head
+                    yield topic.encode("utf-8"), ReplayBuffer.format_stamped(payload, header["seq_epoch"], seq)
+
+    @staticmethod
+    def _note_sequences(floor: dict, record):
+        """ثبت آخرین (epoch، seq) تاپیک‌های یک رکورد منتشر شده قدیمی (بدون نگهداری بدنه)."""
+        if record.kind == KIND_PUBLISHED:
+            stamp = ReplayBuffer.parse_stamp(record.payload)
+            if stamp is not None:
+                floor[record.topic] = stamp
+        elif record.kind == KIND_ROUTED:
+            try:
+                header = decode_routed(record.payload)[0]
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return
+            for topic, seq, _, _ in header["routes"]:
+                if seq:
+                    floor[topic.encode("utf-8")] = (header["seq_epoch"], seq)
+
+    def _journal_horizon(self) -> float:
+        """زمان یونیکس قدیمی‌ترین رکوردی که برای بازپخش، تکرار یا بازیابی لازم است."""
+        window = self.deduplicator.window if self.deduplicator is not None else 0
+        return time.time() - max(JOURNAL_RESTORE_HORIZON, JOURNAL_RECOVER_MAX_AGE, window)
+
+    def _restore_from_journal(self, records: list, floor: dict | None = None) -> list:
+        """
+        بازپخش ترتیبی ژورنال هنگام راه‌اندازی (پیش از شروع انتشار): بازسازی بافر بازپخش (seq/epoch)
+        و ایندکس تکرار از پیام‌های منتشر شده، و برگرداندن سیگنال‌های پذیرفته شده‌ای که منتشر نشده بودند.
+        floor آخرین seq تاپیک‌هایی است که رکوردهایشان قدیمی‌تر از افق بارگذاری بوده‌اند (_note_sequences).
+        """
+        restored = self.replay.restore(list(self._published_messages(records)), floor)
+        if self.deduplicator is not None:
+            # کلیدها با زمان دریافت اصلی و بدون شمارش در آمار تکرار بازسازی می‌شوند
+            now = time.time()
+            monotonic_now = time.monotonic()
+            horizon = now - self.deduplicator.window
+            for record in records:
+                if record.timestamp < horizon or not record.payload:
+                    continue
+                try:
+                    key = signal_key(json.loads(self._journal_payload(record)))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if key is not None:
+                    self.deduplicator.seed(key, monotonic_now - (now - record.timestamp))
+        resolved_refs = {r.ref for r in records if r.kind in RESOLVING_KINDS and r.ref}
+        pending = [r for r in records if r.kind == KIND_ACCEPTED and r.index not in resolved_refs]
+        logger.info(f"Journal replay: {restored} published messages restored (epoch {self.replay.epoch}), "
+                    f"{len(pending)} accepted signals were never published.")
+        return pending
+
+    async def _republish_pending(self, pending: list):
+        """انتشار مجدد سیگنال‌های منتشر نشده پیش از کرش (فقط سیگنال‌های تازه)."""
+        now = time.time()
+        recovered = expired = 0
+        for record in pending:
+            if now - record.timestamp > JOURNAL_RECOVER_MAX_AGE:
+                expired += 1
+                continue
+            try:
+                signal_data = json.loads(record.payload)
+            except json.JSONDecodeError:
+                continue
+            meta = SignalMeta()
+            meta.journal_index = record.index
+            meta.dedup_checked = True
+            await self._dispatch(signal_data, meta)
+            recovered += 1
+        if pending:
+            logger.info(f"{recovered} unpublished signals re-dispatched from journal, {expired} too old to resend.")
+        if expired and telegram_alert_queue:
+            await telegram_alert_queue.put(
+                f"⚠️ *سیگنال‌های منتشر نشده*\n\n `{expired}` سیگنال مستر پیش از ری‌استارت سرور منتشر نشده "
+                f"و به دلیل قدیمی بودن دوباره ارسال نشد. جزئیات با ابزار بررسی ژورنال قابل مشاهده است."
+            )
+
     async def run(self):
         """اجرای همزمان تسک‌های سرور ZMQ."""
         logger.info("ZMQ Core Service Starting...")
+        self._loop = asyncio.get_running_loop()
+        journal_tasks = []
+        if self.journal is not None:
+            floor = {}
+            records = await asyncio.to_thread(self.journal.open, self._journal_horizon(),
+                                              lambda record: self._note_sequences(floor, record))
+            pending = self._restore_from_journal(records, floor)
+            journal_tasks = [self.journal.run(), self._republish_pending(pending)]
+        conflation_tasks = [self.conflator.run()] if self.conflator is not None else []
+        routing_tasks = []
+        if self.routing is not None:
+            # جدول پیش از شروع انتشار ساخته می‌شود تا هیچ سیگنالی بدون مسیر منتشر نشود
+            self.routing.apply(await asyncio.to_thread(self.routing.fetch))
+            routing_tasks = [self.routing.run()]
+        if self.sizer is not None:
+            await asyncio.to_thread(self.symbol_specs.load)
+            routing_tasks.append(self.symbol_specs.run())
         try:
             await asyncio.gather(
+                *journal_tasks,
+                *conflation_tasks,
+                *routing_tasks,
                 self.start_config_responder(),
                 self.start_signal_collector(),
-                self.start_signal_processor(),
+                *(self.start_signal_processor(i) for i in range(self.num_shards)),
+                *(self.start_side_effects_worker(i) for i in range(self.num_shards)),
+                self.start_pipeline_timing_reporter(),
+                self.history_writer.run(),
+                self.liveness.run(),
                 self.start_signal_publisher()
             )
         except (KeyboardInterrupt, asyncio.CancelledError):
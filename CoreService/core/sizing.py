@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+
+try:
+    import numpy as np
+except ImportError:  # numpy اختیاری است؛ بدون آن محاسبه با حلقه پایتون (با نتیجه یکسان) انجام می‌شود
+    np = None
+
+# محاسبه مرکزی حجم هر حساب کپی برای سیگنال‌های TRADE_OPEN (نیازمند ROUTED_TOPICS)؛
+# حجم محاسبه شده با کلید copy_volume به پیام تاپیک اختصاصی هر کپی افزوده می‌شود.
+CENTRAL_SIZING = os.getenv("CENTRAL_SIZING", "0") == "1"
+SIZED_EVENT = "TRADE_OPEN"
+SPEC_EVENT = "SYMBOL_SPEC"
+# فایل نگهداری مشخصات نمادها بین ری‌استارت‌ها
+SYMBOL_SPEC_FILE = os.getenv("SYMBOL_SPEC_FILE", "symbol_specs.json")
+SYMBOL_SPEC_SAVE_INTERVAL = 5
+# برای سورس‌هایی با کپی کمتر از این تعداد، سربار numpy از حلقه ساده بیشتر است
+SIZING_NUMPY_MIN_ROUTES = int(os.getenv("SIZING_NUMPY_MIN_ROUTES", "32"))
+
+_OPEN_PREFIX = b'{"event":"%s"' % SIZED_EVENT.encode()
+# بازه ابتدای پیام خام برای یافتن volume (ترتیب ثابت کلیدها در CJsonBuilder اکسپرت سورس)
+SIZING_PEEK_BYTES = 256
+_VOLUME_RE = re.compile(rb'"volume":([0-9.eE+-]+)[,}]')
+
+logger = logging.getLogger(__name__)
+
+
+def peek_open_volume(buf) -> float | None:
+    """حجم مستر از پیام خام TRADE_OPEN بدون json.loads (برای سایر رویدادها None)."""
+    if bytes(buf[:len(_OPEN_PREFIX)]) != _OPEN_PREFIX:
+        return None
+    match = _VOLUME_RE.search(buf, 0, SIZING_PEEK_BYTES)
+    return float(match.group(1)) if match is not None else None
+
+
+def format_lot(lot: float) -> bytes:
+    """نمایش کوتاه و دقیق حجم در JSON (مثلاً 0.3 به جای 0.30000000000000004)."""
+    return b"%.8g" % round(lot, 8)
+
+
+class SymbolSpecRegistry:
+    """
+    کش مشخصات حجم نمادها (گام، حداقل و حداکثر لات) که اکسپرت‌های کپی با رویداد SYMBOL_SPEC گزارش می‌کنند.
+    آخرین گزارش هر نماد معتبر است و تغییرات به صورت دوره‌ای در فایل ذخیره می‌شوند.
+    """
+    def __init__(self, path: str = SYMBOL_SPEC_FILE):
+        self.path = path
+        # symbol -> (volume_step, volume_min, volume_max)
+        self._specs: dict[str, tuple[float, float, float]] = {}
+        self._dirty = False
+        self.updates = 0
+
+    def load(self) -> int:
+        """بارگذاری مشخصات ذخیره شده (در صورت وجود فایل)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load symbol specs from {self.path}: {e}")
+            return 0
+        for symbol, spec in data.items():
+            self._specs[symbol] = (float(spec[0]), float(spec[1]), float(spec[2]))
+        logger.info(f"{len(self._specs)} symbol specs loaded from {self.path}.")
+        return len(self._specs)
+
+    def update(self, symbol: str, volume_step: float, volume_min: float, volume_max: float) -> bool:
+        """ثبت مشخصات گزارش شده؛ مقادیر نامعتبر نادیده گرفته می‌شوند. True یعنی مقدار تغییر کرد."""
+        if not symbol or volume_step <= 0 or volume_min < 0 or volume_max < volume_min:
+            return False
+        spec = (volume_step, volume_min, volume_max)
+        if self._specs.get(symbol) == spec:
+            return False
+        self._specs[symbol] = spec
+        self._dirty = True
+        self.updates += 1
+        logger.info(f"Symbol spec updated for {symbol}: step={volume_step} min={volume_min} max={volume_max}.")
+        return True
+
+    def get(self, symbol: str) -> tuple[float, float, float] | None:
+        return self._specs.get(symbol)
+
+    def save(self):
+        """ذخیره اتمیک مشخصات در فایل (در ترد جداگانه اجرا شود)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._specs, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    async def run(self):
+        """ذخیره دوره‌ای تغییرات."""
+        while True:
+            await asyncio.sleep(SYMBOL_SPEC_SAVE_INTERVAL)
+            if not self._dirty:
+                continue
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError as e:
+                self._dirty = True
+                logger.error(f"Could not save symbol specs to {self.path}: {e}")
+
+    def get_stats(self) -> dict:
+        return {"symbols": len(self._specs), "updates": self.updates}
+
+
+class _SizingBook:
+    """پارامترهای حجم تمام کپی‌های یک سورس به صورت آرایه (به ترتیب مسیرهای RoutingTable)."""
+    __slots__ = ("fixed", "valid", "value", "max_lot", "size")
+
+    def __init__(self, routes: list[tuple]):
+        self.size = len(routes)
+        fixed = [volume_type == "FIXED" for volume_type, _, _ in routes]
+        valid = [volume_type in ("FIXED", "MULTIPLIER") for volume_type, _, _ in routes]
+        value = [float(volume_value) for _, volume_value, _ in routes]
+        max_lot = [float(max_lot_size or 0.0) for _, _, max_lot_size in routes]
+        if np is not None and self.size >= SIZING_NUMPY_MIN_ROUTES:
+            self.fixed, self.valid = np.array(fixed, dtype=bool), np.array(valid, dtype=bool)
+            self.value, self.max_lot = np.array(value, dtype=np.float64), np.array(max_lot, dtype=np.float64)
+        else:
+            self.fixed, self.valid, self.value, self.max_lot = fixed, valid, value, max_lot
+
+
+class LotSizer:
+    """
+    محاسبه حجم هدف همه کپی‌های یک سیگنال مستر در یک گذر (numpy در صورت نصب بودن).
+    قواعد همان ProcessSignal اکسپرت کپی است: ضریب یا حجم ثابت، گرد کردن به گام لات (نیم به بالا مانند
+    NormalizeDouble)، محدود کردن به حداقل/حداکثر نماد و سپس به max_lot_size اتصال.
+    """
+    def __init__(self, routing, specs: SymbolSpecRegistry):
+        self.routing = routing
+        self.specs = specs
+        self._books: dict[bytes, _SizingBook] = {}
+        self._generation = -1
+        self.sized = 0
+        self.missing_spec = 0
+
+    def _book(self, source_id: bytes) -> _SizingBook:
+        if self._generation != self.routing.rebuilds:
+            self._books.clear()
+            self._generation = self.routing.rebuilds
+        book = self._books.get(source_id)
+        if book is None:
+            book = self._books[source_id] = _SizingBook(self.routing.sizing_params(source_id))
+        return book
+
+    def lots(self, source_id: bytes, symbol: bytes | None, volume: float, indices) -> list[float | None] | None:
+        """
+        حجم هر کپی (به ترتیب indices از RoutingTable.resolve)؛ None برای کپی با volume_type نامعتبر.
+        اگر مشخصات نماد هنوز گزارش نشده None برمی‌گردد و محاسبه به اکسپرت واگذار می‌شود.
+        """
+        spec = self.specs.get(symbol.decode("utf-8", "replace")) if symbol is not None else None
+        if spec is None:
+            self.missing_spec += 1
+            return None
+        step, volume_min, volume_max = spec
+        book = self._book(source_id)
+        self.sized += len(indices)
+        if isinstance(book.value, list):
+            result = []
+            for i in indices:
+                if not book.valid[i]:
+                    result.append(None)
+                    continue
+                lot = book.value[i] if book.fixed[i] else volume * book.value[i]
+                lot = min(max(math.floor(lot / step + 0.5) * step, volume_min), volume_max)
+                if 0 < book.max_lot[i] < lot:
+                    lot = book.max_lot[i]
+                result.append(lot)
+            return result
+        # [بهبود عملکرد] یک گذر برداری روی همه کپی‌های سورس و سپس انتخاب کپی‌های مقصد
+        lot = np.where(book.fixed, book.value, volume * book.value)
+        lot = np.clip(np.floor(lot / step + 0.5) * step, volume_min, volume_max)
+        lot = np.where((book.max_lot > 0) & (lot > book.max_lot), book.max_lot, lot)
+        selected = list(indices)
+        return [float(v) if ok else None for v, ok in zip(lot[selected].tolist(), book.valid[selected].tolist())]
+
+    def get_stats(self) -> dict:
+        return {"sized": self.sized, "missing_spec": self.missing_spec, "numpy": np is not None}
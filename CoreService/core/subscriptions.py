@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+
+import zmq
+
+# سقف صف ارسال هر مشترک روی سوکت انتشار؛ پیام‌های مازاد برای مشترک کند دور ریخته و شمرده می‌شوند
+PUBLISH_SNDHWM = int(os.getenv("PUBLISH_SNDHWM", "1000"))
+# رد کردن سیگنال تاپیک‌هایی که هیچ مشترکی ندارند (بدون سریال‌سازی، seq و ارسال)
+SKIP_UNSUBSCRIBED = os.getenv("SKIP_UNSUBSCRIBED", "1") == "1"
+# تاپیکی که مشترکش را از دست داده تا این مدت (ثانیه) همچنان منتشر می‌شود تا اکسپرتی که پس از قطعی کوتاه
+# دوباره وصل می‌شود شکاف را با GET_MISSED از بافر بازپخش بگیرد؛ پس از راه‌اندازی سرور هم تا این مدت
+# همه تاپیک‌ها منتشر می‌شوند تا اکسپرت‌ها فرصت اتصال مجدد داشته باشند
+SUBSCRIPTION_GRACE = float(os.getenv("SUBSCRIPTION_GRACE", "300"))
+
+_SUBSCRIBE = 1
+_UNSUBSCRIBE = 0
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionTable:
+    """
+    جدول زنده اشتراک‌های سوکت XPUB انتشار، ساخته شده از فریم‌های subscribe/unsubscribe مشترکین.
+    با XPUB_VERBOSER هر اشتراک و لغو اشتراک (از جمله قطع اتصال) هر مشترک گزارش می‌شود، بنابراین
+    شمارش هر پیشوند برابر تعداد مشترکین مستقیم آن است (پشت رله، هر رله یک مشترک حساب می‌شود).
+    """
+    def __init__(self, grace: float = SUBSCRIPTION_GRACE):
+        self.grace = grace
+        self.started_at = time.monotonic()
+        # پیشوند اشتراک -> تعداد مشترکین
+        self._counts: dict[bytes, int] = {}
+        # پیشوند -> زمان صفر شدن تعداد مشترکین
+        self._released: dict[bytes, float] = {}
+        # نتیجه is_live برای هر تاپیک تا تغییر بعدی اشتراک‌ها (فقط نتایج بدون وابستگی به زمان)
+        self._live_cache: dict[bytes, bool] = {}
+        self.subscribes = 0
+        self.unsubscribes = 0
+        self.skipped = 0
+        self.hwm_drops = 0
+
+    @staticmethod
+    def configure(socket):
+        """تنظیم سوکت XPUB: گزارش همه اشتراک‌ها و خطای EAGAIN به جای دور ریختن بی‌صدا در HWM."""
+        socket.setsockopt(zmq.SNDHWM, PUBLISH_SNDHWM)
+        socket.setsockopt(zmq.XPUB_VERBOSER, 1)
+        socket.setsockopt(zmq.XPUB_NODROP, 1)
+
+    def handle(self, frame: bytes):
+        """اعمال یک فریم اشتراک (بایت اول 1 برای subscribe و 0 برای unsubscribe، سپس پیشوند)."""
+        if not frame or frame[0] not in (_SUBSCRIBE, _UNSUBSCRIBE):
+            return
+        prefix = frame[1:]
+        self._live_cache.clear()
+        if frame[0] == _SUBSCRIBE:
+            self.subscribes += 1
+            self._counts[prefix] = self._counts.get(prefix, 0) + 1
+            self._released.pop(prefix, None)
+            return
+        self.unsubscribes += 1
+        count = self._counts.get(prefix, 0) - 1
+        if count > 0:
+            self._counts[prefix] = count
+        else:
+            self._counts.pop(prefix, None)
+            self._released[prefix] = time.monotonic()
+
+    def is_live(self, topic: bytes) -> bool:
+        """آیا پیامی روی این تاپیک به مشترکی می‌رسد (تطبیق پیشوندی مانند فیلتر ZMQ، با احتساب مهلت)."""
+        live = self._live_cache.get(topic)
+        if live is not None:
+            return live
+        counts = self._counts
+        for end in range(len(topic) + 1):
+            if topic[:end] in counts:
+                self._live_cache[topic] = True
+                return True
+        now = time.monotonic()
+        if now - self.started_at < self.grace:
+            return True
+        released = self._released
+        for end in range(len(topic) + 1):
+            if now - released.get(topic[:end], -self.grace) < self.grace:
+                return True
+        self._live_cache[topic] = False
+        return False
+
+    async def send(self, socket, topic: bytes, payload) -> bool:
+        """
+        ارسال یک پیام روی XPUB. اگر صف یکی از مشترکین پر باشد (EAGAIN به دلیل XPUB_NODROP)، یک دور ریختن
+        شمرده شده و پیام با حالت عادی PUB ارسال می‌شود تا فقط به مشترکین کند نرسد و بقیه معطل نشوند.
+        """
+        try:
+            await socket.send_multipart([topic, payload], flags=zmq.DONTWAIT, copy=False)
+            return True
+        except zmq.Again:
+            self.hwm_drops += 1
+            logger.debug(f"Publish HWM reached on topic '{topic.decode('utf-8', 'replace')}'; "
+                         f"message dropped for slow subscribers.")
+        socket.setsockopt(zmq.XPUB_NODROP, 0)
+        try:
+            await socket.send_multipart([topic, payload], flags=zmq.DONTWAIT, copy=False)
+        finally:
+            socket.setsockopt(zmq.XPUB_NODROP, 1)
+        return False
+
+    async def run(self, socket):
+        """خواندن فریم‌های اشتراک از سوکت XPUB (در صورت نخواندن، این فریم‌ها در سوکت انباشته می‌شوند)."""
+        while True:
+            try:
+                self.handle(await socket.recv())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading subscription frame: {e}")
+                await asyncio.sleep(1)
+
+    def subscriber_counts(self, exclude_prefixes: tuple = ()) -> dict[bytes, int]:
+        """تعداد مشترکین هر پیشوند (پیشوندهای کنترلی مانند CFG| قابل حذف هستند)."""
+        return {p: n for p, n in self._counts.items() if not p.startswith(exclude_prefixes)}
+
+    def get_stats(self) -> dict:
+        """آمار جدول اشتراک."""
+        return {
+            "prefixes": len(self._counts),
+            "subscribers": sum(self._counts.values()),
+            "subscribes": self.subscribes,
+            "unsubscribes": self.unsubscribes,
+            "skipped": self.skipped,
+            "hwm_drops": self.hwm_drops,
+        }
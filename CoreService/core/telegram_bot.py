@@ -10,6 +10,8 @@ from telegram.error import TelegramError, BadRequest
 from functools import wraps
 from telegram.helpers import escape_markdown 
 from . import database 
+from . import metrics
+from . import liveness
 from sqlalchemy.orm import joinedload
 import traceback
 import json
@@ -2105,6 +2107,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             message += "\n"
 
         keyboard = [
+            [InlineKeyboardButton("🛰️ وضعیت اتصال اکسپرت‌ها", callback_data="status:fleet")],
             [InlineKeyboardButton("🔄 به‌روزرسانی", callback_data="status:main")],
             [InlineKeyboardButton("🔙 بازگشت به منو", callback_data="main_menu")]
         ]
@@ -2128,6 +2131,54 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
         
+# /******************************************************************
+#  * نمایش وضعیت اتصال اکسپرت‌ها (رجیستری زنده بودن درون‌حافظه‌ای)
+#  * داده‌ها مستقیماً از حافظه سرور خوانده می‌شوند و به دیتابیس نیازی نیست.
+#  ******************************************************************/
+@admin_only
+async def fleet_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    log_extra = {'user_id': update.effective_user.id, 'action': 'fleet_status_command'}
+    await query.answer()
+
+    fleet = liveness.get_fleet_status()
+    keyboard = [
+        [InlineKeyboardButton("🔄 به‌روزرسانی", callback_data="status:fleet")],
+        [InlineKeyboardButton("🔙 بازگشت به وضعیت", callback_data="status:main")]
+    ]
+
+    if not fleet:
+        message = "🛰️ *وضعیت اتصال اکسپرت‌ها*\n\nهنوز هیچ پیامی از اکسپرت‌ها دریافت نشده است\\."
+    else:
+        alive_count = sum(1 for ea in fleet if ea['alive'])
+        message = f"🛰️ *وضعیت اتصال اکسپرت‌ها* \\(`{alive_count}/{len(fleet)}` آنلاین\\)\n\n"
+        for ea in fleet:
+            icon = "🟢" if ea['alive'] else "🔴"
+            kind = "سورس" if ea['kind'] == "source" else "کپی"
+            ea_id = escape_markdown(ea['ea_id'], 2)
+            last_seen = escape_markdown(f"{ea['last_seen_sec']:.0f}", 2)
+            message += f"{icon} *{ea_id}* \\({kind}\\) \\- آخرین پیام: `{last_seen}` ثانیه پیش\n"
+            if ea['ping_interval_sec'] is not None:
+                interval = escape_markdown(f"{ea['ping_interval_sec']:.1f}", 2)
+                jitter = escape_markdown(f"{ea['ping_jitter_sec']:.1f}", 2)
+                message += f"      پینگ هر `{interval}`s \\(jitter `{jitter}`s\\)"
+                if ea['msgs_per_min'] is not None:
+                    rate = escape_markdown(f"{ea['msgs_per_min']:.1f}", 2)
+                    message += f" \\| `{rate}` پیام/دقیقه"
+                message += "\n"
+
+    if len(message) > 4000:
+        message = message[:4000] + "\n\\.\\.\\."
+
+    try:
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN_V2,
+                                      reply_markup=InlineKeyboardMarkup(keyboard))
+        logger.info("Fleet status displayed successfully.", extra=log_extra)
+    except BadRequest as e:
+        if "Message is not modified" not in str(e):
+            logger.error(f"خطا در نمایش وضعیت اکسپرت‌ها: {e}", extra=log_extra)
+
+
 async def alert_sender_task(bot: Application):
     """ارسال هشدارهای دریافتی از صف ZMQ به ادمین."""
     logger.info("تسک ارسال‌کننده هشدار راه‌اندازی شد.")
@@ -2140,9 +2191,12 @@ async def alert_sender_task(bot: Application):
             if not alert_message:
                 continue
             await bot.bot.send_message(chat_id=ADMIN_ID, text=alert_message, parse_mode=ParseMode.MARKDOWN)
+            metrics.ALERTS_SENT_TOTAL.inc()
         except TelegramError as e:
+            metrics.ALERT_SEND_FAILURES_TOTAL.inc()
             logger.error(f"خطا در ارسال هشدار تلگرام: {e}")
         except Exception as e:
+            metrics.ALERT_SEND_FAILURES_TOTAL.inc()
             logger.error(f"خطای پیش‌بینی نشده در تسک هشدار: {e}")
         finally:
             if alert_queue:
@@ -2285,6 +2339,7 @@ async def run(queue: asyncio.Queue):
     # CallbackQuery Handlers (Menus & Actions)
     application.add_handler(CallbackQueryHandler(main_menu, pattern="^main_menu$"))
     application.add_handler(CallbackQueryHandler(status_command, pattern="^status:main$"))
+    application.add_handler(CallbackQueryHandler(fleet_status_command, pattern="^status:fleet$"))
 
     # Source Handlers
     application.add_handler(CallbackQueryHandler(sources_main_menu, pattern="^sources:main$"))
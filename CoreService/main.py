@@ -1,38 +1,67 @@
 import asyncio
 import logging
+import multiprocessing
+import os
 import platform
+import signal
+import time
+import zmq
+import zmq.asyncio
 from core import database
 from core import server
 from core import telegram_bot
+from core import metrics
+from core import ipc
+from core import liveness
+from core import loop_backend
+from core.history_writer import TradeHistoryWriter
 from core.logging_config import setup_logging
 
+# حالت اجرا: single (همه در یک حلقه asyncio) یا multi (موتور ZMQ، ربات و ذخیره‌سازی در پروسه‌های جدا)
+DEPLOY_MODE = os.getenv("DEPLOY_MODE", "single")
+# پروسه‌ای که پیش از این مدت (ثانیه) از کار بیفتد ناپایدار حساب شده و تاخیر ری‌استارت آن دو برابر می‌شود
+SUPERVISOR_STABLE_SECONDS = 60
+SUPERVISOR_MAX_BACKOFF = 30
+SUPERVISOR_POLL_INTERVAL = 1
+
 logger = logging.getLogger(__name__)
 
 async def main():
     """راه‌اندازی و اجرای برنامه اصلی."""
     setup_logging()
-    logger.info("Application starting...")
+    logger.info(f"Application starting (event loop: {type(asyncio.get_running_loop()).__name__})...")
     try:
         database.init_db()
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.critical(f"FATAL: Database initialization failed: {e}")
         return
+    if DEPLOY_MODE == "multi":
+        await supervise()
+        return
     alert_queue = asyncio.Queue()
     zmq_server = server.ZMQServer(alert_queue=alert_queue)
     server_task = None
     telegram_task = None
+    metrics_task = None
     try:
         logger.info("Starting ZMQ Server task...")
         server_task = asyncio.create_task(zmq_server.run())
         logger.info("Starting Telegram Bot task...")
         telegram_task = asyncio.create_task(telegram_bot.run(queue=alert_queue))
-        await asyncio.gather(server_task, telegram_task)
+        tasks = [server_task, telegram_task]
+        if metrics.METRICS_ENABLED:
+            logger.info("Starting metrics endpoint task...")
+            metrics_task = asyncio.create_task(metrics.run_metrics_server())
+            tasks.append(metrics_task)
+        await asyncio.gather(*tasks)
     except KeyboardInterrupt:
         logger.info("Application shutting down by user request (Ctrl+C).")
     except Exception as e:
         logger.critical(f"Application encountered a fatal error: {e}", exc_info=True)
     finally:
+        if metrics_task and not metrics_task.done():
+            metrics_task.cancel()
         if telegram_task and not telegram_task.done():
             logger.info("Cancelling Telegram Bot task...")
             telegram_task.cancel()
@@ -42,11 +71,141 @@ async def main():
         await asyncio.sleep(1)
         logger.info("Application shutdown complete.")
 
+
+# /******************************************************************
+#  * حالت چندپروسه‌ای: هر بخش در پروسه و GIL جداگانه اجرا می‌شود تا
+#  * کارهای سنگین ربات (گزارش‌ها و آمار) زمان CPU مسیر سیگنال را نگیرند.
+#  ******************************************************************/
+async def run_engine():
+    """پروسه موتور ZMQ: دریافت، انتشار و پردازش سیگنال‌ها."""
+    alert_queue = asyncio.Queue()
+    zmq_server = server.ZMQServer(alert_queue=alert_queue, history_writer=ipc.RemoteHistoryWriter())
+    tasks = [
+        zmq_server.run(),
+        ipc.forward_alerts(alert_queue),
+        ipc.receive_config_changes(),
+        ipc.serve_status({"fleet": zmq_server.liveness.snapshot}),
+    ]
+    if metrics.METRICS_ENABLED:
+        tasks.append(metrics.run_metrics_server())
+    await asyncio.gather(*tasks)
+
+
+async def run_bot():
+    """پروسه ربات تلگرام: هشدارها از سایر پروسه‌ها و وضعیت اکسپرت‌ها از موتور دریافت می‌شوند."""
+    alert_queue = asyncio.Queue()
+    fleet = ipc.RemoteFleetStatus()
+    liveness.fleet_registry = fleet
+    config_forwarder = ipc.ConfigChangeForwarder()
+    database.register_config_change_listener(config_forwarder)
+    await asyncio.gather(
+        telegram_bot.run(queue=alert_queue),
+        ipc.receive_alerts(alert_queue),
+        fleet.run(),
+        config_forwarder.run(),
+    )
+
+
+async def run_ingest():
+    """پروسه ذخیره‌سازی: group commit گزارش‌های بسته شدن معاملات کپی در دیتابیس."""
+    alert_queue = asyncio.Queue()
+    writer = TradeHistoryWriter(alert_queue=alert_queue)
+    await asyncio.gather(
+        writer.run(),
+        ipc.receive_history(writer),
+        ipc.forward_alerts(alert_queue),
+    )
+
+
+COMPONENTS = {
+    "engine": run_engine,
+    "bot": run_bot,
+    "ingest": run_ingest,
+}
+
+
+def run_component(name: str):
+    """نقطه ورود هر پروسه فرزند (باید در سطح ماژول باشد تا با spawn قابل اجرا باشد)."""
+    setup_logging(log_file=f"trade_copier.{name}.log")
+    loop_backend.install()
+    logger.info(f"Component process '{name}' starting (pid {os.getpid()}).")
+    try:
+        asyncio.run(COMPONENTS[name]())
+    except KeyboardInterrupt:
+        pass
+
+
+class _Child:
+    __slots__ = ("name", "process", "started_at", "failures", "restart_at")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.process = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = None
+
+
+async def supervise():
+    """اجرای پروسه‌های موتور، ربات و ذخیره‌سازی؛ پروسه‌ای که از کار بیفتد با تاخیر افزایشی دوباره اجرا می‌شود."""
+    mp = multiprocessing.get_context("spawn")
+    children = [_Child(name) for name in COMPONENTS]
+    alert_socket = zmq.asyncio.Context.instance().socket(zmq.PUSH)
+    alert_socket.setsockopt(zmq.LINGER, 0)
+    alert_socket.connect(ipc.endpoint("alerts"))
+
+    def start(child: _Child):
+        child.process = mp.Process(target=run_component, args=(child.name,), name=f"tradecopier-{child.name}")
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        logger.info(f"Started '{child.name}' process (pid {child.process.pid}).")
+
+    logger.info(f"Supervisor starting components: {', '.join(COMPONENTS)}")
+    for child in children:
+        start(child)
+    try:
+        while True:
+            await asyncio.sleep(SUPERVISOR_POLL_INTERVAL)
+            now = time.monotonic()
+            for child in children:
+                if child.restart_at is not None:
+                    if now >= child.restart_at:
+                        start(child)
+                    continue
+                if child.process.is_alive():
+                    continue
+                exitcode = child.process.exitcode
+                child.failures = 1 if now - child.started_at >= SUPERVISOR_STABLE_SECONDS else child.failures + 1
+                delay = min(SUPERVISOR_MAX_BACKOFF, 2 ** (child.failures - 1))
+                child.restart_at = now + delay
+                logger.error(f"Process '{child.name}' exited with code {exitcode}; restarting in {delay}s.")
+                try:
+                    await alert_socket.send_string(
+                        f"🔁 *پروسه {child.name} متوقف شد*\n\n کد خروج `{exitcode}`؛ "
+                        f"پروسه تا `{delay}` ثانیه دیگر دوباره اجرا می‌شود.", zmq.NOBLOCK)
+                except zmq.Again:
+                    pass
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("Supervisor shutting down...")
+    finally:
+        # ابتدا توقف مرتب (KeyboardInterrupt در فرزند تا finally ها اجرا شوند) و در صورت نیاز terminate
+        for child in children:
+            if child.process is not None and child.process.is_alive() and platform.system() != "Windows":
+                os.kill(child.process.pid, signal.SIGINT)
+        for child in children:
+            if child.process is not None:
+                child.process.join(timeout=10)
+                if child.process.is_alive():
+                    child.process.terminate()
+                    child.process.join(timeout=5)
+        alert_socket.close()
+        logger.info("All component processes stopped.")
+
+
 if __name__ == "__main__":
-    """اجرای برنامه با تنظیمات حلقه asyncio."""
-    if platform.system() == "Windows":
-        from asyncio import WindowsSelectorEventLoopPolicy
-        asyncio.set_event_loop_policy(WindowsSelectorEventLoopPolicy())
+    """اجرای برنامه با حلقه رویداد انتخاب شده (LOOP_BACKEND)."""
+    loop_backend.install()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
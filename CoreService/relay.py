@@ -0,0 +1,10 @@
+import logging
+from core.logging_config import setup_logging
+from core.relay import Relay
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    """اجرای نود رله fan-out (تنظیمات با RELAY_UPSTREAM و پورت‌های RELAY_*)."""
+    setup_logging(log_file="trade_copier.relay.log")
+    Relay().run_forever()